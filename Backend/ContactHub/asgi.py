@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ContactHub.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up; serves the /contacts/stream/ SSE endpoint.
+from hubspot_contacts.events import ContactEventsMiddleware  # noqa: E402
+
+application = ContactEventsMiddleware(django_application)
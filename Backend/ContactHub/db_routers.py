@@ -0,0 +1,77 @@
+"""
+Database router for the primary/replica PostgreSQL setup.
+
+Reads of the contact mirror (``REPLICA_MODELS``) go to the "replica" alias
+when one is configured; every other read, and every write, goes to "default".
+Accounts, sessions and job rows are read right after they are written
+(register then log in, poll a job), so replica lag must never apply to them.
+Code that must see its own contact writes (the HubSpot sync and the contact
+mutations) wraps itself in ``use_primary()`` so its reads stay on the primary.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+PRIMARY_DB = "default"
+REPLICA_DB = "replica"
+
+# Read-mostly contact data behind the list, detail, change-feed, facet and
+# statistics endpoints.
+REPLICA_MODELS = frozenset({
+    "hubspot_contacts.contact",
+    "hubspot_contacts.contacttombstone",
+    "hubspot_contacts.contactrollup",
+    "hubspot_contacts.contactfacetcount",
+    "hubspot_contacts.changecounter",
+})
+
+_pinned_to_primary = ContextVar("pinned_to_primary", default=False)
+
+
+@contextmanager
+def use_primary():
+    """Route every query made inside the block to the primary database."""
+    token = _pinned_to_primary.set(True)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(token)
+
+
+def primary_only(func):
+    """Decorator form of ``use_primary()``."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with use_primary():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def replica_available():
+    return REPLICA_DB in settings.DATABASES
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            model._meta.label_lower in REPLICA_MODELS
+            and replica_available()
+            and not _pinned_to_primary.get()
+        ):
+            return REPLICA_DB
+        return PRIMARY_DB
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases point at the same data, so relations are always fine.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY_DB
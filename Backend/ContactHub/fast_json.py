@@ -0,0 +1,62 @@
+"""
+orjson-backed JSON encoding for the API and for decoding HubSpot responses.
+
+Types orjson does not handle natively (lazy strings, Decimal, QuerySet, ...)
+are handed to DRF's own encoder, and dates and UTC datetimes are written in
+the same ISO 8601 form DRF uses, so the rendered output matches
+``rest_framework.renderers.JSONRenderer``.
+"""
+
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_default = JSONEncoder().default
+
+DUMPS_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(data):
+    return orjson.dumps(data, default=_default, option=DUMPS_OPTIONS)
+
+
+def loads(data):
+    return orjson.loads(data)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """Compact JSON via orjson; pretty-printed output falls back to DRF."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = dumps(data)
+        # Keep DRF's guarantee that the output is a strict JavaScript subset.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            data = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                data = data.decode(encoding)
+            return loads(data)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
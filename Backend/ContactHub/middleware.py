@@ -0,0 +1,90 @@
+"""
+Response compression for API payloads.
+
+Django's ``GZipMiddleware`` compresses everything and knows nothing about
+brotli. This variant only touches JSON bodies above ``COMPRESSION_MIN_SIZE``
+bytes, prefers brotli when the client accepts it and the optional ``brotli``
+package is installed, and leaves streaming responses (the exports compress
+themselves) alone.
+"""
+
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+DEFAULT_MIN_SIZE = 1024
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson')
+
+_accepts = _lazy_re_compile(r'(?:^|,)\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?')
+
+
+def accepted_encodings(header):
+    """Codings the client accepts, ignoring any with ``q=0``."""
+    encodings = set()
+    for coding, quality in _accepts.findall(header or ''):
+        try:
+            if quality and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        encodings.add(coding.lower())
+    return encodings
+
+
+def gzip_compress(content):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    return compressor.compress(content) + compressor.flush()
+
+
+def brotli_compress(content):
+    # Quality 5 is close to gzip -6 in speed but noticeably smaller on JSON.
+    return brotli.compress(content, mode=brotli.MODE_TEXT, quality=5)
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.should_compress(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if brotli is not None and 'br' in accepted:
+            encoding, compress = 'br', brotli_compress
+        elif 'gzip' in accepted or '*' in accepted:
+            encoding, compress = 'gzip', gzip_compress
+        else:
+            return response
+
+        compressed = compress(response.content)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The encoded bytes differ from the identity representation, so only a
+        # weak validator still holds; If-None-Match uses weak comparison.
+        etag = response.get('ETag')
+        if etag and not etag.startswith('W/'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    def should_compress(self, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return False
+        min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', DEFAULT_MIN_SIZE)
+        if response.status_code != 200 or len(response.content) < min_size:
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        return content_type in COMPRESSIBLE_TYPES
@@ -0,0 +1,242 @@
+"""
+Opt-in per-request profiling.
+
+``ProfilingMiddleware`` profiles a request when ``PROFILE_REQUESTS`` is on, or
+when the client sends ``X-Profile: 1`` and ``PROFILE_HEADER_ENABLED`` (off by
+default) allows it. A profiled request records:
+
+- a cProfile of the whole request
+- every SQL query on every database alias, with its timing and the project
+  line that issued it
+- every HubSpot call reported through ``record_external()``, with its timing
+
+Queries are grouped by shape, with ``IN (...)`` lists collapsed. A shape
+repeated ``PROFILE_N_PLUS_ONE_THRESHOLD`` times or more is flagged as an N+1
+suspect.
+
+The response carries a ``Server-Timing`` header (``db``, ``hubspot``,
+``total``) and ``X-Profile-Id``. The full report and the ``.prof`` file are
+written to ``PROFILE_DIR``. Staff can download them from
+``/profiles/<id>/``, adding ``?artifact=prof`` for the pstats file, which
+opens in snakeviz or ``python -m pstats``.
+
+HubSpot calls made on other threads, such as the concurrent sync's fetch
+pool, are not attributed to the request. Only one request is profiled at a
+time, since Python 3.12 allows a single active cProfile per process; a
+request asking for a profile while another is being taken is served without
+one.
+"""
+
+import cProfile
+import contextvars
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.http import FileResponse, Http404
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import fast_json
+
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5
+# Reports kept in PROFILE_DIR; older ones are pruned.
+DEFAULT_KEEP = 50
+TOP_FUNCTIONS = 30
+
+_active = contextvars.ContextVar('request_profile', default=None)
+_in_list = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_profile_id = re.compile(r'^[0-9a-f]{32}$')
+_this_file = str(Path(__file__).resolve())
+# Held while a request is profiled.
+_profiling = threading.Lock()
+
+
+def query_shape(sql):
+    """``sql`` with parameter lists of any length collapsed, so batches group together."""
+    return _in_list.sub('(%s, ...)', sql)
+
+
+def _caller():
+    """``file:line in function`` of the innermost project frame outside this module."""
+    base = str(settings.BASE_DIR)
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base) and filename != _this_file and 'site-packages' not in filename:
+            return f"{Path(filename).relative_to(base)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def record_external(service, method, url, status, seconds):
+    """Attribute an outbound call to the request being profiled, if any."""
+    profile = _active.get()
+    if profile is not None:
+        profile.external.append({
+            'service': service, 'method': method, 'url': url, 'status': status,
+            'ms': round(seconds * 1000, 3), 'caller': _caller(),
+        })
+
+
+def profile_dir():
+    return Path(getattr(settings, 'PROFILE_DIR', settings.BASE_DIR / 'profiles'))
+
+
+class RequestProfile:
+    def __init__(self, request):
+        self.id = uuid.uuid4().hex
+        self.method = request.method
+        self.path = request.get_full_path()
+        self.queries = []
+        self.external = []
+        self.profiler = cProfile.Profile()
+
+    def __call__(self, execute, sql, params, many, context):
+        """``execute_wrapper`` hook: time the query and note where it came from."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'many': many,
+                'ms': round((time.perf_counter() - started) * 1000, 3),
+                'caller': _caller(),
+            })
+
+    def n_plus_one(self, threshold):
+        groups = defaultdict(list)
+        for query in self.queries:
+            groups[(query['alias'], query_shape(query['sql']))].append(query)
+        suspects = [
+            {
+                'alias': alias,
+                'shape': shape,
+                'count': len(queries),
+                'ms': round(sum(query['ms'] for query in queries), 3),
+                'callers': sorted({query['caller'] for query in queries if query['caller']}),
+            }
+            for (alias, shape), queries in groups.items() if len(queries) >= threshold
+        ]
+        return sorted(suspects, key=lambda suspect: -suspect['count'])
+
+    def top_functions(self):
+        stats = pstats.Stats(self.profiler).stats
+        rows = sorted(stats.items(), key=lambda item: -item[1][3])[:TOP_FUNCTIONS]
+        return [
+            {
+                'function': f"{filename}:{line}({name})",
+                'calls': calls,
+                'tottime_ms': round(tottime * 1000, 3),
+                'cumtime_ms': round(cumtime * 1000, 3),
+            }
+            for (filename, line, name), (_, calls, tottime, cumtime, _) in rows
+        ]
+
+    def report(self, response, seconds):
+        threshold = getattr(settings, 'PROFILE_N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD)
+        hubspot = [call for call in self.external if call['service'] == 'hubspot']
+        return {
+            'id': self.id,
+            'method': self.method,
+            'path': self.path,
+            'status': response.status_code,
+            'total_ms': round(seconds * 1000, 3),
+            'db': {'count': len(self.queries), 'ms': round(sum(q['ms'] for q in self.queries), 3)},
+            'hubspot': {'count': len(hubspot), 'ms': round(sum(c['ms'] for c in hubspot), 3)},
+            'n_plus_one': self.n_plus_one(threshold),
+            'queries': self.queries,
+            'external': self.external,
+            'top_functions': self.top_functions(),
+        }
+
+    def save(self, report):
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        self.profiler.dump_stats(directory / f'{self.id}.prof')
+        (directory / f'{self.id}.json').write_bytes(fast_json.dumps(report))
+        keep = getattr(settings, 'PROFILE_KEEP', DEFAULT_KEEP)
+        reports = sorted(directory.glob('*.json'), key=lambda path: path.stat().st_mtime, reverse=True)
+        for old in reports[keep:]:
+            old.unlink(missing_ok=True)
+            old.with_suffix('.prof').unlink(missing_ok=True)
+
+
+def server_timing(report):
+    db, hubspot = report['db'], report['hubspot']
+    metrics = [
+        f'db;dur={db["ms"]};desc="{db["count"]} queries"',
+        f'hubspot;dur={hubspot["ms"]};desc="{hubspot["count"]} calls"',
+        f'total;dur={report["total_ms"]}',
+    ]
+    if report['n_plus_one']:
+        metrics.append(f'n_plus_one;desc="{len(report["n_plus_one"])} repeated query shapes"')
+    return ', '.join(metrics)
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.should_profile(request) or not _profiling.acquire(blocking=False):
+            return self.get_response(request)
+
+        profile = RequestProfile(request)
+        token = _active.set(profile)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(profile))
+                profile.profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profile.profiler.disable()
+        finally:
+            _active.reset(token)
+            _profiling.release()
+
+        report = profile.report(response, time.perf_counter() - started)
+        profile.save(report)
+        response['Server-Timing'] = server_timing(report)
+        response['X-Profile-Id'] = profile.id
+        return response
+
+    def should_profile(self, request):
+        if getattr(settings, 'PROFILE_REQUESTS', False):
+            return True
+        return (
+            getattr(settings, 'PROFILE_HEADER_ENABLED', False)
+            and request.headers.get('X-Profile', '').lower() in ('1', 'true')
+        )
+
+
+class ProfileArtifactView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, profile_id):
+        """The JSON report of a profiled request, or its pstats file with ``?artifact=prof``."""
+        if not _profile_id.match(profile_id):
+            raise Http404
+        if request.query_params.get('artifact') == 'prof':
+            path = profile_dir() / f'{profile_id}.prof'
+            if not path.exists():
+                raise Http404
+            return FileResponse(path.open('rb'), as_attachment=True, filename=path.name)
+        path = profile_dir() / f'{profile_id}.json'
+        if not path.exists():
+            raise Http404
+        return Response(fast_json.loads(path.read_bytes()))
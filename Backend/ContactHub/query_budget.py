@@ -0,0 +1,132 @@
+"""
+Query-budget assertions for endpoint tests.
+
+``QueryBudgetMixin.assertConstantCost`` seeds the database at several sizes
+and runs the same request against each. It fails if the number of SQL
+queries or HubSpot calls changes with the size. That catches endpoints whose
+round trips grow O(N) with the data instead of staying O(1). The failure
+message lists the query shapes whose counts changed, and every query issued
+at the larger size.
+
+Work that pages through HubSpot necessarily costs a few round trips per
+page. With ``budget_page_size`` set, sizes spanning more pages may cost
+more, but only by the same fixed step for every extra page, so the largest
+sizes (several pages) still catch anything that grows per row.
+
+Each size is seeded and measured inside a transaction that is then rolled
+back, so measurements never see each other's rows. A discarded warm-up run
+comes first, so per-process caches (content types, sites, ...) don't count
+against the smallest size.
+"""
+
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .profiling import query_shape
+
+
+@dataclass
+class Measurement:
+    size: int
+    status: int = 0
+    hubspot_calls: int = 0
+    queries: list = field(default_factory=list)
+
+    def shapes(self):
+        return Counter((alias, query_shape(sql)) for alias, sql in self.queries)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class _Recorder:
+    def __init__(self, alias, queries):
+        self.alias = alias
+        self.queries = queries
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((self.alias, sql))
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMixin:
+    """For ``TestCase`` subclasses; see the module docstring."""
+
+    budget_sizes = (2, 20, 60, 150, 250)
+    # Rows per HubSpot page, or None when every size must cost the same.
+    budget_page_size = None
+
+    def _budget_aliases(self):
+        databases = getattr(self, 'databases', {DEFAULT_DB_ALIAS})
+        return [alias for alias in connections if databases == '__all__' or alias in databases]
+
+    def measure(self, seed, call, size, hubspot=None):
+        """
+        Seed ``size`` rows with ``seed(size)``, then record the queries made by
+        ``call(context)``, where ``context`` is whatever ``seed`` returned.
+        ``hubspot`` is a ``FakeHubSpot`` whose calls are counted too.
+        """
+        measurement = Measurement(size)
+        try:
+            with transaction.atomic():
+                context = seed(size)
+                calls_before = hubspot.total_calls() if hubspot is not None else 0
+                with ExitStack() as stack:
+                    for alias in self._budget_aliases():
+                        stack.enter_context(connections[alias].execute_wrapper(_Recorder(alias, measurement.queries)))
+                    response = call(context)
+                    if getattr(response, 'streaming', False):
+                        b''.join(response.streaming_content)
+                measurement.status = response.status_code
+                if hubspot is not None:
+                    measurement.hubspot_calls = hubspot.total_calls() - calls_before
+                raise _Rollback
+        except _Rollback:
+            pass
+        return measurement
+
+    def assertConstantCost(self, seed, call, label, sizes=None, hubspot=None):
+        sizes = sizes or self.budget_sizes
+        self.measure(seed, call, sizes[0], hubspot)
+        results = [self.measure(seed, call, size, hubspot) for size in sizes]
+        for result in results:
+            if result.status >= 500:
+                self.fail(f"{label} failed with {result.status} at size {result.size}")
+        base = results[0]
+        step = None
+        for result in results[1:]:
+            extra_pages = self._budget_pages(result.size) - self._budget_pages(base.size)
+            growth = (len(result.queries) - len(base.queries), result.hubspot_calls - base.hubspot_calls)
+            if extra_pages and step is None:
+                # The first multi-page size sets the per-page cost the rest must match.
+                step = (growth[0] / extra_pages, growth[1] / extra_pages)
+            expected = (step[0] * extra_pages, step[1] * extra_pages) if extra_pages else (0, 0)
+            if growth != expected or result.status != base.status:
+                self.fail(self._budget_report(label, base, result, per_page=self.budget_page_size is not None))
+
+    def _budget_pages(self, size):
+        if self.budget_page_size is None:
+            return 1
+        return max(1, -(-size // self.budget_page_size))
+
+    @staticmethod
+    def _budget_report(label, base, result, per_page=False):
+        lines = [
+            f"{label} is not O(1) {'per HubSpot page ' if per_page else ''}in round trips:",
+            f"  size {base.size}: {len(base.queries)} queries, {base.hubspot_calls} HubSpot calls, status {base.status}",
+            f"  size {result.size}: {len(result.queries)} queries, {result.hubspot_calls} HubSpot calls, "
+            f"status {result.status}",
+            "Query shapes whose count changed:",
+        ]
+        before, after = base.shapes(), result.shapes()
+        for key in sorted(set(before) | set(after), key=lambda key: -abs(after[key] - before[key])):
+            if before[key] != after[key]:
+                alias, shape = key
+                lines.append(f"  {before[key]} -> {after[key]}  [{alias}] {shape}")
+        lines.append(f"Queries at size {result.size}:")
+        lines.extend(f"  {n}. [{alias}] {sql}" for n, (alias, sql) in enumerate(result.queries, 1))
+        return '\n'.join(lines)
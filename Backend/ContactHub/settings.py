@@ -13,10 +13,13 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 import os 
 from pathlib import Path
 from datetime import timedelta
+from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+load_dotenv(BASE_DIR / ".env")
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -68,6 +71,34 @@ REST_FRAMEWORK = {
     (
       'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': [
+      'ContactHub.fast_json.ORJSONRenderer',
+      'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+      'ContactHub.fast_json.ORJSONParser',
+      'rest_framework.parsers.FormParser',
+      'rest_framework.parsers.MultiPartParser',
+    ],
+    # Budgets of HubSpot API calls per user; see hubspot_contacts/throttling.py.
+    # "hubspot.<action>" scopes (e.g. "hubspot.advanced.search") get their own
+    # bucket when set here.
+    'DEFAULT_THROTTLE_RATES': {
+      'hubspot': os.getenv('HUBSPOT_USER_RATE', '600/min'),
+      'hubspot.advanced.search': os.getenv('HUBSPOT_SEARCH_RATE', '60/min'),
+    },
+}
+
+# Per-user overrides of the "hubspot" rate, keyed by email.
+HUBSPOT_THROTTLE_USER_RATES = {}
+
+# Throttle history lives in the cache, so with several workers this must be
+# a shared backend (e.g. DatabaseCache after `manage.py createcachetable`).
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "contacthub"),
+    }
 }
 
 SIMPLE_JWT = {
@@ -79,7 +110,9 @@ SIMPLE_JWT = {
 
 
 MIDDLEWARE = [
+    "ContactHub.profiling.ProfilingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
+    "ContactHub.middleware.CompressionMiddleware",
     "allauth.account.middleware.AccountMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -90,6 +123,19 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# JSON responses smaller than this are sent uncompressed.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+# Request profiling (ContactHub/profiling.py): PROFILE_REQUESTS profiles every
+# request; otherwise an "X-Profile: 1" request header does, when
+# PROFILE_HEADER_ENABLED=1. Off by default: any client could otherwise make the
+# server profile its requests and fill PROFILE_DIR.
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0") == "1"
+PROFILE_HEADER_ENABLED = os.getenv("PROFILE_HEADER_ENABLED", "0") == "1"
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", BASE_DIR / "profiles"))
+# A query shape repeated this often in one request is reported as an N+1 suspect.
+PROFILE_N_PLUS_ONE_THRESHOLD = int(os.getenv("PROFILE_N_PLUS_ONE_THRESHOLD", "5"))
+
 ROOT_URLCONF = "ContactHub.urls"
 
 TEMPLATES = [
@@ -114,12 +160,65 @@ WSGI_APPLICATION = "ContactHub.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# DATABASE_ENGINE=postgres switches to PostgreSQL, configured from the
+# DATABASE_* environment variables. Setting DATABASE_REPLICA_HOST adds a
+# "replica" alias that reads of the contact mirror tables are routed to
+# (see ContactHub.db_routers.REPLICA_MODELS); everything else stays on the
+# primary.
+
+DATABASE_ENGINE = os.getenv("DATABASE_ENGINE", "sqlite")
+
+if DATABASE_ENGINE == "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.getenv("DATABASE_NAME", "contacthub"),
+            "USER": os.getenv("DATABASE_USER", "contacthub"),
+            "PASSWORD": os.getenv("DATABASE_PASSWORD", ""),
+            "HOST": os.getenv("DATABASE_HOST", "localhost"),
+            "PORT": os.getenv("DATABASE_PORT", "5432"),
+            # Keep connections open between requests instead of reconnecting
+            # on every request, and check them before reuse.
+            "CONN_MAX_AGE": int(os.getenv("DATABASE_CONN_MAX_AGE", "600")),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "connect_timeout": 5,
+            },
+        }
     }
-}
+
+    if os.getenv("DATABASE_REPLICA_HOST"):
+        DATABASES["replica"] = {
+            **DATABASES["default"],
+            "HOST": os.getenv("DATABASE_REPLICA_HOST"),
+            "PORT": os.getenv("DATABASE_REPLICA_PORT", DATABASES["default"]["PORT"]),
+            # Tests run against a single local Postgres; the replica alias
+            # points at the test copy of "default".
+            "TEST": {"MIRROR": "default"},
+        }
+else:
+    # Single-node SQLite: WAL lets readers keep reading while the sync writes,
+    # IMMEDIATE transactions take the write lock up front so writers queue on
+    # the busy timeout instead of failing with "database is locked".
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+            "OPTIONS": {
+                "timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", "20")),
+                "transaction_mode": "IMMEDIATE",
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                    f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', 134217728))};"
+                    f"PRAGMA cache_size=-{int(os.getenv('SQLITE_CACHE_KB', 20000))};"
+                    "PRAGMA temp_store=MEMORY;"
+                ),
+            },
+        }
+    }
+
+DATABASE_ROUTERS = ["ContactHub.db_routers.PrimaryReplicaRouter"]
 
 
 # Password validation
@@ -19,9 +19,12 @@ from django.urls import path , include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from .profiling import ProfileArtifactView
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("accounts/", include("accounts.urls")),
+    path("profiles/<str:profile_id>/", ProfileArtifactView.as_view(), name="profile-artifact"),
     path("", include("hubspot_contacts.urls")),
 ]
 
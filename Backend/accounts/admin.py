@@ -1,11 +1,18 @@
 from django.contrib import admin
 from .models import CustomUser
 from django.contrib.auth.admin import UserAdmin
+from ContactHub.admin_tools import EstimatedCountPaginator, PrefixSearchMixin
 # Register your models here.
 
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(PrefixSearchMixin, UserAdmin):
 
   list_display = ['id', "email", 'username', "first_name", "last_name", "is_staff"]
+  # email and username are unique, hence indexed: search them by prefix.
+  search_fields = ("email", "username")
+  search_help_text = "Email or username prefix."
+  prefix_search_fields = (("email", str), ("email", str.lower), ("username", str))
+  paginator = EstimatedCountPaginator
+  ordering = ("-id",)
 
   fieldsets = (
         (None, {"fields": ("username", "password")}),
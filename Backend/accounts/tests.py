@@ -1,3 +1,94 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.test import TestCase, override_settings
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from ContactHub.query_budget import QueryBudgetMixin
+
+
+class CustomUserAdminTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", username="admin", password="secret", first_name="A", last_name="D"
+        )
+        for name in ("alice", "albert", "bob"):
+            User.objects.create_user(
+                email=f"{name}@example.com", username=name, password="secret", first_name=name, last_name="X"
+            )
+        self.client.force_login(self.admin)
+
+    def test_search_is_a_prefix_match(self):
+        response = self.client.get("/admin/accounts/customuser/", {"q": "al"})
+        self.assertEqual(response.status_code, 200)
+        found = sorted(user.username for user in response.context["cl"].result_list)
+        self.assertEqual(found, ["albert", "alice"])
+
+    def test_changelist_skips_the_full_count(self):
+        response = self.client.get("/admin/accounts/customuser/")
+        self.assertFalse(response.context["cl"].show_full_result_count)
+        self.assertEqual(response.context["cl"].result_count, 4)
+
+
+def account_scenarios():
+    """``(url name, label, call)`` for every route in urls.py; ``call(client, ctx)`` makes the request."""
+    return [
+        ("user-actions", "POST /accounts/register/", lambda client, ctx: client.post("/accounts/register/", {
+            "email": "newcomer@gmail.com", "username": "newcomer", "first_name": "New", "last_name": "Comer",
+            "password": "Secret#123", "password2": "Secret#123",
+        }, format="json")),
+        ("user-actions", "POST /accounts/login/", lambda client, ctx: client.post(
+            "/accounts/login/", {"email": "owner@example.com", "password": "Secret#123"}, format="json",
+        )),
+        ("user-actions", "POST /accounts/reset-password/", lambda client, ctx: client.post(
+            "/accounts/reset-password/", {"email": "owner@example.com"}, format="json",
+        )),
+        ("user-actions", "POST /accounts/change-password/", lambda client, ctx: client.post(
+            "/accounts/change-password/",
+            {"old_password": "Secret#123", "new_password": "Other#456", "confirm_password": "Other#456"},
+            format="json",
+        )),
+        ("user-actions-with-token", "GET /accounts/verify-email/<token>/",
+         lambda client, ctx: client.get(f"/accounts/verify-email/{ctx['verification_token']}/")),
+        ("user-reset-with-token", "POST /accounts/reset-password-confirm/<uid>/<token>/",
+         lambda client, ctx: client.post(
+             f"/accounts/reset-password-confirm/{ctx['uid']}/{ctx['reset_token']}/",
+             {"new_password": "Other#456", "confirm_password": "Other#456"}, format="json",
+         )),
+    ]
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class AccountQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Account endpoints make the same number of queries however many users exist."""
+
+    def seed(self, size):
+        User = get_user_model()
+        User.objects.bulk_create(
+            User(email=f"user{n}@example.com", username=f"user{n}", first_name="U", last_name=str(n))
+            for n in range(size)
+        )
+        owner = User.objects.create_user(
+            email="owner@example.com", username="owner", password="Secret#123", first_name="O", last_name="W",
+            email_verification_token="verify-me",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(owner)
+        return {
+            "verification_token": owner.email_verification_token,
+            "uid": urlsafe_base64_encode(force_bytes(owner.pk)),
+            "reset_token": PasswordResetTokenGenerator().make_token(owner),
+        }
+
+    def test_every_route_has_a_scenario(self):
+        from .urls import urlpatterns
+
+        covered = {name for name, _, _ in account_scenarios()}
+        self.assertEqual({pattern.name for pattern in urlpatterns} - covered, set())
+
+    def test_round_trips_do_not_grow_with_the_data(self):
+        for _, label, call in account_scenarios():
+            with self.subTest(label):
+                self.assertConstantCost(self.seed, lambda ctx, call=call: call(self.client, ctx), label)
@@ -1,8 +1,161 @@
+from array import array
+
 from django.contrib import admin
-from .models import Contact
+from django.db.models.functions import Trim
+
+from ContactHub.admin_tools import EstimatedCountPaginator, PrefixSearchMixin
+from .bulk import delete_contacts, resync_contacts
+from .facets import COMPANY, EMAIL_DOMAIN, STATE, top_values
+from .jobs import start_background_job
+from .models import Contact, ContactRollup, DuplicateSuggestion, SyncJob
+from .normalize import name_token
+from .rollups import LIFECYCLE_STAGE, total_contacts
+
+# Values offered by each sidebar filter; the rest are reachable via search.
+FILTER_CHOICES = 20
+
+
+class ContactPaginator(EstimatedCountPaginator):
+    def estimate(self):
+        # The rollups keep an exact total for free.
+        return total_contacts()
+
+
+class FacetListFilter(admin.SimpleListFilter):
+    """Sidebar filter whose choices come from the facet index, not SELECT DISTINCT."""
+
+    facet = None
+    field = None
+    # The facet index stores stripped values (facets.facet_values), so raw
+    # columns are compared stripped too.
+    stripped = True
+
+    def lookups(self, request, model_admin):
+        return [(value, f"{value} ({count})") for value, count in top_values(self.facet, top=FILTER_CHOICES)]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        if self.stripped:
+            return queryset.alias(facet_value=Trim(self.field)).filter(facet_value=self.value())
+        return queryset.filter(**{self.field: self.value()})
+
+
+class StateFilter(FacetListFilter):
+    title = 'state'
+    parameter_name = 'state'
+    facet = field = STATE
+
+
+class CompanyFilter(FacetListFilter):
+    title = 'company'
+    parameter_name = 'company'
+    facet = field = COMPANY
+
+
+class EmailDomainFilter(FacetListFilter):
+    title = 'email domain'
+    parameter_name = 'email_domain'
+    facet = field = EMAIL_DOMAIN
+    # Already normalized by Contact.set_normalized_fields().
+    stripped = False
+
+
+class LifecycleStageFilter(admin.SimpleListFilter):
+    title = 'lifecycle stage'
+    parameter_name = 'lifecyclestage'
+
+    def lookups(self, request, model_admin):
+        rows = (
+            ContactRollup.objects.filter(metric=LIFECYCLE_STAGE, count__gt=0).exclude(bucket='')
+            .order_by('-count').values_list('bucket', 'count')[:FILTER_CHOICES]
+        )
+        return [(stage, f"{stage} ({count})") for stage, count in rows]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(lifecyclestage=self.value())
+        return queryset
 
-class ContactAdmin(admin.ModelAdmin):
+
+def _email_prefix(term):
+    return term.lower()
+
+
+def _name_prefix(term):
+    # name_key is "first last" with each part reduced to [a-z0-9].
+    return ' '.join(token for token in (name_token(part) for part in term.split()) if token)
+
+
+class ContactAdmin(PrefixSearchMixin, admin.ModelAdmin):
     list_display = ('id', 'email', 'first_name', 'last_name', 'hubspot_id')  # Fields to display in the admin list view
-    search_fields = ('email', 'first_name', 'last_name')  # Fields to enable search functionality
-    list_filter = ('first_name', 'last_name')  # Fields to filter by in the admin list view
-admin.site.register(Contact , ContactAdmin )
\ No newline at end of file
+    # Prefix matches on the indexed lookup columns: "ann" finds ann@..., "Ann Le" finds Ann Lee.
+    search_fields = ('email_lower', 'name_key')
+    search_help_text = "Email or name prefix, or an exact HubSpot id."
+    prefix_search_fields = (('email_lower', _email_prefix), ('name_key', _name_prefix))
+    exact_search_fields = ('hubspot_id',)
+    list_filter = (StateFilter, CompanyFilter, EmailDomainFilter, LifecycleStageFilter)
+    paginator = ContactPaginator
+    ordering = ('-pk',)
+    actions = ('resync_from_hubspot', 'delete_in_background')
+
+    # Read-only: the stock add/change/delete views would write the row without
+    # touching HubSpot or sending contacts_changed, leaving the change feed,
+    # rollups, facets and dedup keys stale. Edits go through the API; bulk
+    # work through the actions below.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def has_bulk_delete_permission(self, request):
+        # delete_contacts() pushes to HubSpot and signals like the API does.
+        return request.user.has_perm(f"{self.opts.app_label}.delete_{self.opts.model_name}")
+
+    def get_actions(self, request):
+        # The stock action renders every selected object and its relations.
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def _start(self, request, queryset, job, verb):
+        pks = array('q', queryset.order_by().values_list('pk', flat=True).iterator(chunk_size=10000))
+        start_background_job(job, pks, name=f"admin-{job.__name__}")
+        self.message_user(request, f"{verb} {len(pks)} contacts in the background.")
+
+    @admin.action(description="Resync selected contacts from HubSpot (background)")
+    def resync_from_hubspot(self, request, queryset):
+        self._start(request, queryset, resync_contacts, "Resyncing")
+
+    @admin.action(description="Delete selected contacts here and in HubSpot (background)", permissions=['bulk_delete'])
+    def delete_in_background(self, request, queryset):
+        self._start(request, queryset, delete_contacts, "Deleting")
+
+
+class DuplicateSuggestionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'contact_a', 'contact_b', 'score', 'status', 'updated_at')
+    list_filter = ('status',)
+    list_select_related = ('contact_a', 'contact_b')
+    raw_id_fields = ('contact_a', 'contact_b')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-score',)
+
+
+class SyncJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'triggered_by', 'fetched', 'started_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = [field.name for field in SyncJob._meta.fields]
+    ordering = ('-started_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+
+admin.site.register(Contact , ContactAdmin )
+admin.site.register(DuplicateSuggestion, DuplicateSuggestionAdmin)
+admin.site.register(SyncJob, SyncJobAdmin)
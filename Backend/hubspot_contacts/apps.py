@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class HubspotContactsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "hubspot_contacts"
+
+    def ready(self):
+        from . import receivers  # noqa: F401
@@ -0,0 +1,71 @@
+"""
+Chunked bulk operations on selected contacts, run as background jobs from
+the admin so a "select all" over a large changelist never holds a request.
+
+Both take primary keys rather than a queryset; the caller collects them once
+into a compact ``array('q')``.
+"""
+
+import logging
+
+import requests
+from django.db import transaction
+
+from ContactHub.db_routers import primary_only
+from .hubspot_service import HubSpotService
+from .models import Contact
+from .signals import SNAPSHOT_FIELDS, send_contacts_changed
+from .sync import save_contacts
+
+logger = logging.getLogger(__name__)
+
+RESYNC_CHUNK_SIZE = 100
+DELETE_CHUNK_SIZE = 500
+
+
+def _chunks(pks, size):
+    for start in range(0, len(pks), size):
+        yield list(pks[start:start + size])
+
+
+@primary_only
+def resync_contacts(pks, chunk_size=RESYNC_CHUNK_SIZE):
+    """Re-fetch the given contacts from HubSpot in batch calls and save them."""
+    stats = {'fetched': 0, 'created': 0, 'updated': 0, 'skipped': 0}
+    for chunk in _chunks(pks, chunk_size):
+        vids = list(Contact.objects.filter(pk__in=chunk).values_list('hubspot_id', flat=True))
+        if not vids:
+            continue
+        found = HubSpotService.get_contacts_by_vids(vids) or {}
+        stats['fetched'] += len(found)
+        for name, value in save_contacts(list(found.values())).items():
+            stats[name] += value
+    logger.info("Resynced contacts: %s", stats)
+    return stats
+
+
+@primary_only
+def delete_contacts(pks, chunk_size=DELETE_CHUNK_SIZE):
+    """
+    Delete the given contacts from HubSpot, then locally. A contact HubSpot
+    refuses to delete is kept locally so the two stay consistent.
+    """
+    stats = {'deleted': 0, 'failed': 0}
+    for chunk in _chunks(pks, chunk_size):
+        rows = list(Contact.objects.filter(pk__in=chunk).values(*SNAPSHOT_FIELDS))
+        deletable = []
+        for row in rows:
+            try:
+                HubSpotService.delete_contact(row['hubspot_id'])
+            except requests.RequestException as exc:
+                logger.warning("Could not delete contact %s from HubSpot: %s", row['hubspot_id'], exc)
+                stats['failed'] += 1
+                continue
+            deletable.append(row)
+
+        with transaction.atomic():
+            Contact.objects.filter(pk__in=[row['id'] for row in deletable]).delete()
+            send_contacts_changed([(row, None) for row in deletable])
+        stats['deleted'] += len(deletable)
+    logger.info("Deleted contacts: %s", stats)
+    return stats
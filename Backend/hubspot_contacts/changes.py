@@ -0,0 +1,73 @@
+"""
+Incremental change feed for clients that keep a local copy of the contacts.
+
+Every Contact write moves the row to a fresh ``change_seq`` and every delete
+leaves a ``ContactTombstone`` with its own sequence number (see
+receivers.py). A page of changes after cursor ``since`` is then two indexed
+range scans merged by sequence number; the last sequence number returned is
+the client's next cursor. ``since=0`` walks the whole table, which is how a
+client bootstraps its copy.
+"""
+
+from .models import ChangeCounter, Contact, ContactTombstone
+from .serializers import ContactRowSerializer
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+
+def contact_changes(since=0, limit=DEFAULT_LIMIT, fields=None):
+    serializer = ContactRowSerializer(fields=fields)
+    rows = list(
+        Contact.objects.filter(change_seq__gt=since)
+        .order_by('change_seq')
+        .values_list('change_seq', 'id', *serializer.sources)[:limit + 1]
+    )
+    tombstones = list(
+        ContactTombstone.objects.filter(change_seq__gt=since)
+        .order_by('change_seq')
+        .values_list('change_seq', 'contact_id')[:limit + 1]
+    )
+
+    events = sorted(
+        [(row[0], row) for row in rows] + [(seq, contact_id) for seq, contact_id in tombstones],
+        key=lambda event: event[0],
+    )
+    has_more = len(events) > limit
+    events = events[:limit]
+
+    contacts, deleted = [], []
+    for seq, payload in events:
+        if isinstance(payload, tuple):
+            contacts.append({'id': payload[1], **serializer.to_representation(payload[2:])})
+        else:
+            deleted.append(payload)
+
+    return {
+        'cursor': events[-1][0] if events else since,
+        'has_more': has_more,
+        'contacts': contacts,
+        'deleted': deleted,
+    }
+
+
+def changed_ids(since, limit):
+    """
+    Ids changed and deleted in ``(since, head]``, where ``head`` is the current
+    counter value. Returns ``None`` when nothing changed, and ``None`` in place
+    of the id lists when there are more than ``limit`` changes.
+    """
+    head = ChangeCounter.current('contacts').value
+    if head <= since:
+        return None
+    updated = list(
+        Contact.objects.filter(change_seq__gt=since, change_seq__lte=head)
+        .values_list('id', flat=True)[:limit + 1]
+    )
+    deleted = list(
+        ContactTombstone.objects.filter(change_seq__gt=since, change_seq__lte=head)
+        .values_list('contact_id', flat=True)[:limit + 1]
+    )
+    if len(updated) + len(deleted) > limit:
+        return head, None, None
+    return head, updated, deleted
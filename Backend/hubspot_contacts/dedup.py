@@ -0,0 +1,242 @@
+"""
+Duplicate contact detection.
+
+Comparing every pair of contacts is quadratic, so each contact gets a few
+*blocking keys* (normalized email, normalized phone, phonetic last name plus
+first initial plus zip, phonetic last name plus first name plus company)
+stored in ``ContactBlockingKey``. Only contacts that share a key are
+compared, and blocks larger than ``MAX_BLOCK_SIZE`` (a shared switchboard
+number, say) are skipped, which keeps candidate generation near-linear.
+Candidate pairs are scored and those at or above ``SUGGESTION_THRESHOLD``
+are written to ``DuplicateSuggestion``.
+
+``scan_duplicates`` rebuilds everything in ``chunk_size`` slices and is meant
+for a background job or the ``find_duplicates`` command;
+``refresh_contacts`` is the incremental path run for every
+``contacts_changed`` batch.
+
+Scans hold a ``SyncJob`` lease of kind ``duplicate_scan``, so only one runs
+at a time. A scan replaces each chunk's keys in one transaction, so a
+``refresh_contacts`` running alongside always sees every contact keyed.
+Pending suggestions the scan did not score again are dropped at the end.
+"""
+
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from ContactHub.db_routers import primary_only
+from . import sync_jobs
+from .models import Contact, ContactBlockingKey, DuplicateSuggestion, SyncJob
+from .normalize import name_key, name_token, normalize_email, normalize_phone, soundex
+
+CHUNK_SIZE = 2000
+MAX_BLOCK_SIZE = 50
+SUGGESTION_THRESHOLD = 0.6
+
+MATCH_FIELDS = ['id', 'first_name', 'last_name', 'email', 'phone', 'zip', 'company']
+
+WEIGHTS = {
+    'email': 0.6,
+    'phone': 0.5,
+    'name': 0.4,
+    'similar_name': 0.2,
+    'zip': 0.1,
+    'company': 0.1,
+}
+
+
+def blocking_keys(row):
+    keys = set()
+    email = normalize_email(row.get('email'))
+    if email:
+        keys.add('e:' + email)
+    phone = normalize_phone(row.get('phone'))
+    if phone:
+        keys.add('p:' + phone)
+
+    last, first = soundex(row.get('last_name')), name_token(row.get('first_name'))
+    if last and first:
+        zip_code = name_token(row.get('zip'))[:5]
+        if zip_code:
+            keys.add(f'nz:{last}:{first[0]}:{zip_code}')
+        company = name_token(row.get('company'))
+        if company:
+            keys.add(f'nc:{last}:{first}:{company}')
+    return [key[:255] for key in keys]
+
+
+def score_pair(a, b):
+    """``(score, reasons)`` for two contact rows, score clipped to 1.0."""
+    reasons = []
+    email = normalize_email(a['email'])
+    if email and email == normalize_email(b['email']):
+        reasons.append('email')
+    phone = normalize_phone(a['phone'])
+    if phone and phone == normalize_phone(b['phone']):
+        reasons.append('phone')
+
+    name_a = name_key(a['first_name'], a['last_name'])
+    name_b = name_key(b['first_name'], b['last_name'])
+    if name_a and name_b:
+        if SequenceMatcher(None, name_a, name_b).ratio() >= 0.9:
+            reasons.append('name')
+        elif (soundex(a['last_name']) == soundex(b['last_name'])
+              and name_token(a['first_name'])[:1] == name_token(b['first_name'])[:1]):
+            reasons.append('similar_name')
+
+    for field in ('zip', 'company'):
+        value = name_token(a[field])
+        if value and value == name_token(b[field]):
+            reasons.append(field)
+    return min(sum(WEIGHTS[reason] for reason in reasons), 1.0), reasons
+
+
+def _pairs(members, only=None):
+    pairs = set()
+    for ids in members.values():
+        if not 2 <= len(ids) <= MAX_BLOCK_SIZE:
+            continue
+        ids = sorted(ids)
+        for index, a in enumerate(ids):
+            for b in ids[index + 1:]:
+                if only is None or a in only or b in only:
+                    pairs.add((a, b))
+    return pairs
+
+
+def suggest(pairs):
+    """Score ``(a_id, b_id)`` pairs and upsert suggestions; returns how many were kept."""
+    ids = {contact_id for pair in pairs for contact_id in pair}
+    rows = {row['id']: row for row in Contact.objects.filter(pk__in=ids).values(*MATCH_FIELDS)}
+    suggestions = []
+    for a, b in pairs:
+        if a in rows and b in rows:
+            score, reasons = score_pair(rows[a], rows[b])
+            if score >= SUGGESTION_THRESHOLD:
+                suggestions.append(
+                    DuplicateSuggestion(contact_a_id=a, contact_b_id=b, score=round(score, 3), reasons=reasons)
+                )
+    # Reviewed pairs keep their status; only the score is refreshed.
+    DuplicateSuggestion.objects.bulk_create(
+        suggestions,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['contact_a', 'contact_b'],
+        update_fields=['score', 'reasons', 'updated_at'],
+    )
+    return len(suggestions)
+
+
+class ScanAlreadyRunning(Exception):
+    pass
+
+
+def _store_keys(rows):
+    keys = [ContactBlockingKey(contact_id=row['id'], key=key) for row in rows for key in blocking_keys(row)]
+    # A concurrent refresh_contacts() may have stored the same key already.
+    ContactBlockingKey.objects.bulk_create(keys, batch_size=1000, ignore_conflicts=True)
+    return keys
+
+
+def _suggest_in_chunks(pairs, chunk_size):
+    pairs = sorted(pairs)
+    return sum(suggest(pairs[start:start + chunk_size]) for start in range(0, len(pairs), chunk_size))
+
+
+@primary_only
+def scan_duplicates(chunk_size=CHUNK_SIZE, job=None, triggered_by=''):
+    """
+    Rebuild blocking keys and pending suggestions for the whole table. Runs
+    under ``job`` when the caller already acquired a ``DUPLICATE_SCAN`` job;
+    otherwise takes the lock itself and raises ``ScanAlreadyRunning`` if
+    another scan holds it.
+    """
+    if job is None:
+        job = sync_jobs.acquire(SyncJob.DUPLICATE_SCAN, triggered_by=triggered_by)
+        if job is None:
+            raise ScanAlreadyRunning("A duplicate scan is already running")
+    try:
+        stats = _scan(job, chunk_size)
+    except Exception as exc:
+        sync_jobs.release(job, SyncJob.FAILED, message=str(exc) or type(exc).__name__)
+        raise
+    sync_jobs.release(job, SyncJob.COMPLETED, message=', '.join(f"{name}={value}" for name, value in stats.items()))
+    return stats
+
+
+def _scan(job, chunk_size):
+    stats = {'contacts': 0, 'keys': 0, 'blocks': 0, 'pairs': 0, 'suggestions': 0}
+    started = timezone.now()
+
+    last_pk = 0
+    while True:
+        rows = list(Contact.objects.filter(pk__gt=last_pk).order_by('pk').values(*MATCH_FIELDS)[:chunk_size])
+        if not rows:
+            break
+        with transaction.atomic():
+            ContactBlockingKey.objects.filter(contact_id__in=[row['id'] for row in rows]).delete()
+            stats['keys'] += len(_store_keys(rows))
+        last_pk = rows[-1]['id']
+        stats['contacts'] += len(rows)
+        sync_jobs.heartbeat(job)
+
+    last_key = ''
+    while True:
+        blocks = list(
+            ContactBlockingKey.objects.filter(key__gt=last_key)
+            .values('key').annotate(size=Count('id')).order_by('key')
+            .values_list('key', 'size')[:chunk_size]
+        )
+        if not blocks:
+            break
+        last_key = blocks[-1][0]
+        keys = [key for key, size in blocks if 2 <= size <= MAX_BLOCK_SIZE]
+        members = defaultdict(set)
+        for key, contact_id in ContactBlockingKey.objects.filter(key__in=keys).values_list('key', 'contact_id'):
+            members[key].add(contact_id)
+        pairs = _pairs(members)
+        stats['blocks'] += len(keys)
+        stats['pairs'] += len(pairs)
+        stats['suggestions'] += _suggest_in_chunks(pairs, chunk_size)
+        sync_jobs.heartbeat(job)
+
+    # Every pair still suggested was upserted above (or by a concurrent
+    # refresh); what is left over no longer scores.
+    DuplicateSuggestion.objects.filter(status=DuplicateSuggestion.PENDING, updated_at__lt=started).delete()
+    return stats
+
+
+def refresh_contacts(rows):
+    """Re-key ``rows`` (contact snapshots) and re-score them against their blocks."""
+    ids = {row['id'] for row in rows}
+    if not ids:
+        return 0
+    ContactBlockingKey.objects.filter(contact_id__in=ids).delete()
+    DuplicateSuggestion.objects.filter(
+        Q(contact_a_id__in=ids) | Q(contact_b_id__in=ids), status=DuplicateSuggestion.PENDING
+    ).delete()
+    keys = {key.key for key in _store_keys(rows)}
+    if not keys:
+        return 0
+
+    small = (
+        ContactBlockingKey.objects.filter(key__in=keys)
+        .values('key').annotate(size=Count('id')).filter(size__gte=2, size__lte=MAX_BLOCK_SIZE)
+        .order_by().values_list('key', flat=True)
+    )
+    members = defaultdict(set)
+    for key, contact_id in ContactBlockingKey.objects.filter(key__in=list(small)).values_list('key', 'contact_id'):
+        members[key].add(contact_id)
+    return suggest(_pairs(members, only=ids))
+
+
+def changed_rows(changes):
+    """``after`` snapshots whose matching fields differ from ``before``."""
+    return [
+        after for before, after in changes
+        if after is not None and (before is None or any(before[f] != after[f] for f in MATCH_FIELDS))
+    ]
@@ -0,0 +1,212 @@
+"""
+Server-sent events for contact changes, mounted in front of Django in
+``ContactHub/asgi.py`` at ``/contacts/stream/``.
+
+One ``ChangeBroadcaster`` per process polls the change feed (see changes.py)
+every ``CONTACT_EVENTS_POLL_INTERVAL`` seconds while anyone is listening, so
+a bulk sync that writes thousands of rows in that window reaches clients as a
+single event. Each event is encoded once and the same bytes are queued for
+every subscriber; an idle connection costs one coroutine and a small bounded
+queue, with no Django request, middleware or DB connection of its own.
+
+Events look like::
+
+    id: 1042
+    event: contacts
+    data: {"since":1040,"cursor":1042,"contacts":[7,9],"deleted":[3]}
+
+When a batch is larger than ``CONTACT_EVENTS_MAX_IDS`` the id lists are
+replaced by ``"truncated":true``. Either way clients fetch the rows from
+``/contacts/changes/?since=<since>``. Browsers pass the JWT as ``?token=``
+since ``EventSource`` cannot set headers, and resume with ``Last-Event-ID``.
+"""
+
+import asyncio
+import logging
+import os
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from ContactHub import fast_json
+from .changes import changed_ids
+from .models import ChangeCounter
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = '/contacts/stream/'
+POLL_INTERVAL = float(os.getenv('CONTACT_EVENTS_POLL_INTERVAL', 1.0))
+HEARTBEAT_INTERVAL = float(os.getenv('CONTACT_EVENTS_HEARTBEAT', 15.0))
+MAX_IDS = int(os.getenv('CONTACT_EVENTS_MAX_IDS', 200))
+# Events a slow client may fall behind by before it is told to resync.
+QUEUE_SIZE = 8
+
+
+def encode_event(since, head, updated, deleted):
+    data = {'since': since, 'cursor': head}
+    if updated is None:
+        data['truncated'] = True
+    else:
+        data['contacts'] = updated
+        data['deleted'] = deleted
+    return b'id: %d\nevent: contacts\ndata: %s\n\n' % (head, fast_json.dumps(data))
+
+
+def _poll(since):
+    close_old_connections()
+    changes = changed_ids(since, MAX_IDS)
+    if changes is None:
+        return since, None
+    head, updated, deleted = changes
+    return head, encode_event(since, head, updated, deleted)
+
+
+def _head():
+    close_old_connections()
+    return ChangeCounter.current('contacts').value
+
+
+class ChangeBroadcaster:
+    def __init__(self, poll_interval=POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.subscribers = set()
+        self.cursor = None
+        self._task = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(QUEUE_SIZE)
+        self.subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    async def run(self):
+        try:
+            self.cursor = await sync_to_async(_head, thread_sensitive=False)()
+            while self.subscribers:
+                await asyncio.sleep(self.poll_interval)
+                await self.poll()
+        except Exception:
+            logger.exception("Contact change broadcaster stopped")
+
+    async def poll(self):
+        self.cursor, message = await sync_to_async(_poll, thread_sensitive=False)(self.cursor)
+        if message is not None:
+            self.publish(message)
+
+    def publish(self, message):
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Drop the backlog; the resync tells the client to catch up
+                # from its last event id through the changes endpoint.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(b'event: resync\ndata: {}\n\n')
+
+
+broadcaster = ChangeBroadcaster()
+
+
+def _authenticate(raw_token):
+    close_old_connections()
+    auth = JWTAuthentication()
+    try:
+        return auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def _cors_headers(headers):
+    origin = headers.get(b'origin', b'').decode('latin-1')
+    allowed = getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False) or origin in getattr(
+        settings, 'CORS_ALLOWED_ORIGINS', []
+    )
+    if not origin or not allowed:
+        return []
+    return [(b'access-control-allow-origin', origin.encode('latin-1')), (b'vary', b'Origin')]
+
+
+async def contact_events(scope, receive, send, broadcaster=broadcaster):
+    headers = dict(scope.get('headers', []))
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+
+    token = query.get('token', [None])[0]
+    authorization = headers.get(b'authorization', b'').decode('latin-1')
+    if authorization.lower().startswith('bearer '):
+        token = authorization[7:]
+    user = await sync_to_async(_authenticate)(token) if token else None
+    if user is None:
+        await send({
+            'type': 'http.response.start',
+            'status': 401,
+            'headers': [(b'content-type', b'application/json'), *_cors_headers(headers)],
+        })
+        await send({'type': 'http.response.body', 'body': b'{"detail":"Authentication required."}'})
+        return
+
+    last_event_id = headers.get(b'last-event-id', b'').decode('latin-1') or query.get('since', [''])[0]
+    queue = broadcaster.subscribe()
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+                *_cors_headers(headers),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+        if last_event_id.isdigit():
+            _, message = await sync_to_async(_poll, thread_sensitive=False)(int(last_event_id))
+            if message is not None:
+                await send({'type': 'http.response.body', 'body': message, 'more_body': True})
+
+        while not disconnected.done():
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {getter, disconnected}, timeout=HEARTBEAT_INTERVAL, return_when=asyncio.FIRST_COMPLETED
+            )
+            if getter in done:
+                body = getter.result()
+            else:
+                getter.cancel()
+                if disconnected in done:
+                    break
+                body = b': ping\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        broadcaster.unsubscribe(queue)
+        disconnected.cancel()
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+class ContactEventsMiddleware:
+    """ASGI wrapper that serves ``STREAM_PATH`` and hands everything else on."""
+
+    def __init__(self, application, path=STREAM_PATH):
+        self.application = application
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == self.path and scope['method'] == 'GET':
+            await contact_events(scope, receive, send)
+        else:
+            await self.application(scope, receive, send)
@@ -0,0 +1,70 @@
+"""
+Constant-memory streaming of the local ``Contact`` table as NDJSON or CSV.
+
+Rows are read through ``iterator()`` (a server-side cursor on PostgreSQL),
+encoded one at a time and flushed in ``BUFFER_SIZE`` chunks, optionally
+through a streaming gzip compressor.
+"""
+
+import csv
+import zlib
+
+from ContactHub import fast_json
+from .serializers import ContactRowSerializer
+
+CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'contacts.ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'contacts.csv'),
+}
+
+
+class _LineBuffer:
+    """File-like target for ``csv.writer`` that just hands back the line."""
+
+    def write(self, value):
+        return value
+
+
+def _ndjson_lines(serializer, queryset):
+    dumps = fast_json.dumps
+    for row in serializer.iter_rows(queryset, chunk_size=CHUNK_SIZE):
+        yield dumps(row) + b'\n'
+
+
+def _csv_lines(serializer, queryset):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(serializer.names).encode()
+    for values in serializer.iter_values(queryset, chunk_size=CHUNK_SIZE):
+        yield writer.writerow(values).encode()
+
+
+def _buffered(lines):
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_contacts(queryset, export_format='ndjson', fields=None, gzip=False):
+    """Return a generator of encoded byte chunks for ``queryset``."""
+    serializer = ContactRowSerializer(fields=fields)
+    lines = _csv_lines if export_format == 'csv' else _ndjson_lines
+    chunks = _buffered(lines(serializer, queryset.order_by('pk')))
+    return _gzipped(chunks) if gzip else chunks
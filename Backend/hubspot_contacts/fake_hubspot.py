@@ -0,0 +1,269 @@
+"""
+In-memory HubSpot portal for tests, benchmarks and load tests.
+
+``FakeHubSpot`` answers the v1 contacts endpoints that ``HubSpotService``
+calls, with the same response shapes, and counts every call. It replaces
+``HubSpotService._request`` rather than the public methods, so the real
+paging, batching and decoding code runs unchanged against it:
+
+    portal = FakeHubSpot(total=500)
+    with portal.installed():
+        sync_contacts()
+    portal.calls  # Counter of route name -> calls
+
+Pass ``latency`` to simulate HubSpot's response time, and ``history`` to add
+that many version entries per property, as HubSpot returns them.
+"""
+
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from unittest import mock
+from urllib.parse import urlsplit
+
+import requests
+
+from ContactHub import fast_json
+from .hubspot_service import HubSpotService
+
+LIFECYCLE_STAGES = ('subscriber', 'lead', 'marketingqualifiedlead', 'opportunity', 'customer')
+STATES = ('CA', 'NY', 'TX', 'WA', 'IL')
+# 2025-01-04, in HubSpot's millisecond timestamps.
+BASE_TIMESTAMP = 1736000000000
+
+
+class FakeResponse:
+    """The subset of ``requests.Response`` that ``HubSpotService`` uses."""
+
+    def __init__(self, status_code, payload=None, url=''):
+        self.status_code = status_code
+        self.url = url
+        self.content = b'' if payload is None else fast_json.dumps(payload)
+        self.headers = {'Content-Type': 'application/json'}
+
+    def json(self):
+        return fast_json.loads(self.content)
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error for {self.url}", response=self)
+
+
+class FakeHubSpot:
+    def __init__(self, total=0, page_size=HubSpotService.PAGE_SIZE, latency=0.0, history=0):
+        self.page_size = page_size
+        self.latency = latency
+        self.history = history
+        self.lock = threading.RLock()
+        self.reset(total)
+
+    def reset(self, total=0):
+        """Replace the portal with ``total`` generated contacts and zero the call counts."""
+        self.calls = Counter()
+        # vid -> {"email": ..., "added_at": ..., "properties": {name: value}}
+        self.contacts = {}
+        self.next_vid = 1
+        for _ in range(total):
+            self.add_contact()
+
+    def add_contact(self, email=None, **properties):
+        with self.lock:
+            vid = self.next_vid
+            self.next_vid += 1
+        defaults = {
+            'firstname': f'First{vid}',
+            'lastname': f'Last{vid}',
+            'company': f'Company{vid % 7}',
+            'website': f'https://company{vid % 7}.example.com',
+            'phone': f'+1 555 {vid:07d}',
+            'address': f'{vid} Main St',
+            'state': STATES[vid % len(STATES)],
+            'zip': f'{10000 + vid % 90000}',
+            'lifecyclestage': LIFECYCLE_STAGES[vid % len(LIFECYCLE_STAGES)],
+            'lastmodifieddate': str(BASE_TIMESTAMP),
+        }
+        self.contacts[vid] = {
+            'email': email or f'contact{vid}@example.com',
+            'added_at': BASE_TIMESTAMP,
+            'properties': defaults | properties,
+        }
+        return vid
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    # -- response shapes ---------------------------------------------------
+
+    def profile(self, vid, properties=None):
+        stored = self.contacts[vid]
+        values = stored['properties']
+        names = values if properties is None else [name for name in properties if name in values]
+        rendered = {}
+        for name in names:
+            entry = {'value': values[name]}
+            if self.history:
+                entry['versions'] = [
+                    {'value': values[name], 'source-type': 'CRM_UI', 'source-id': None,
+                     'timestamp': BASE_TIMESTAMP - n * 1000, 'selected': n == 0}
+                    for n in range(self.history)
+                ]
+            rendered[name] = entry
+        return {
+            'vid': vid,
+            'canonical-vid': vid,
+            'addedAt': stored['added_at'],
+            'portal-id': 1,
+            'properties': rendered,
+            'identity-profiles': [{
+                'vid': vid,
+                'identities': [
+                    {'type': 'EMAIL', 'value': stored['email'], 'timestamp': stored['added_at']},
+                    {'type': 'LEAD_GUID', 'value': f'guid-{vid}', 'timestamp': stored['added_at']},
+                ],
+            }],
+        }
+
+    def _vid_for_email(self, email):
+        email = email.lower()
+        return next((vid for vid, stored in self.contacts.items() if stored['email'].lower() == email), None)
+
+    @staticmethod
+    def _properties(data):
+        return {item['property']: item['value'] for item in data.get('properties', [])}
+
+    # -- routes --------------------------------------------------------------
+
+    def list_all(self, params, json):
+        vids = sorted(self.contacts)
+        offset = int(params.get('vidOffset') or 0)
+        count = int(params.get('count') or self.page_size)
+        page = [vid for vid in vids if vid > offset][:count]
+        has_more = bool(page) and page[-1] < vids[-1]
+        return 200, {
+            'contacts': [self.profile(vid, params.get('property')) for vid in page],
+            'has-more': has_more,
+            'vid-offset': page[-1] if page else offset,
+        }
+
+    def recent(self, params, json):
+        vids = sorted(self.contacts, reverse=True)[:int(params.get('count') or 100)]
+        return 200, {'contacts': [self.profile(vid, params.get('property')) for vid in vids], 'has-more': False}
+
+    def by_vids(self, params, json):
+        wanted = [int(vid) for vid in params.get('vid', [])]
+        return 200, {str(vid): self.profile(vid, params.get('property')) for vid in wanted if vid in self.contacts}
+
+    def by_emails(self, params, json):
+        found = {}
+        for email in params.get('email', []):
+            vid = self._vid_for_email(email)
+            if vid is not None:
+                found[str(vid)] = self.profile(vid, params.get('property'))
+        return 200, found
+
+    def profile_route(self, params, json, vid):
+        vid = int(vid)
+        if vid not in self.contacts:
+            return 404, {'status': 'error', 'message': 'contact does not exist'}
+        return 200, self.profile(vid, params.get('property'))
+
+    def static_lists(self, params, json):
+        return 200, {'lists': [], 'has-more': False, 'offset': 0}
+
+    def statistics(self, params, json):
+        return 200, {'contacts': len(self.contacts), 'lastNewContactAt': BASE_TIMESTAMP}
+
+    def search(self, params, json):
+        query = (params.get('q') or '').lower()
+        vids = [
+            vid for vid, stored in self.contacts.items()
+            if query in stored['email'].lower()
+            or query in stored['properties']['firstname'].lower()
+            or query in stored['properties']['lastname'].lower()
+        ][:20]
+        return 200, {'contacts': [self.profile(vid) for vid in vids], 'has-more': False, 'total': len(vids)}
+
+    def create(self, params, json):
+        values = self._properties(json)
+        email = values.pop('email', '') or None
+        if email and self._vid_for_email(email) is not None:
+            return 409, {'status': 'error', 'message': 'Contact already exists'}
+        vid = self.add_contact(email=email, **values)
+        return 200, self.profile(vid)
+
+    def batch_upsert(self, params, json):
+        for item in json:
+            values = self._properties(item)
+            vid = self._vid_for_email(item['email'])
+            if vid is None:
+                self.add_contact(email=item['email'], **values)
+            else:
+                self.contacts[vid]['properties'].update(values)
+        return 202, None
+
+    def update(self, params, json, vid):
+        vid = int(vid)
+        if vid not in self.contacts:
+            return 404, {'status': 'error', 'message': 'contact does not exist'}
+        values = self._properties(json)
+        email = values.pop('email', None)
+        if email:
+            self.contacts[vid]['email'] = email
+        self.contacts[vid]['properties'].update(values)
+        return 204, None
+
+    def delete(self, params, json, vid):
+        if self.contacts.pop(int(vid), None) is None:
+            return 404, {'status': 'error', 'message': 'contact does not exist'}
+        return 200, {'vid': int(vid), 'deleted': True}
+
+    ROUTES = [
+        ('GET', r'/lists/all/contacts/all', 'list_all'),
+        ('GET', r'/lists/recently_updated/contacts/recent', 'recent'),
+        ('GET', r'/lists/all/contacts/recent', 'recent'),
+        ('GET', r'/contact/vids/batch', 'by_vids'),
+        ('GET', r'/contact/emails/batch', 'by_emails'),
+        ('GET', r'/contact/vid/(\d+)/profile', 'profile_route'),
+        ('GET', r'/lists/static', 'static_lists'),
+        ('GET', r'/contacts/statistics', 'statistics'),
+        ('GET', r'/search/query', 'search'),
+        ('POST', r'/contact', 'create'),
+        ('POST', r'/contact/batch/?', 'batch_upsert'),
+        ('POST', r'/contact/vid/(\d+)/profile', 'update'),
+        ('DELETE', r'/contact/vid/(\d+)', 'delete'),
+    ]
+
+    def request(self, method, endpoint, params=None, json=None, **kwargs):
+        """Drop-in replacement for ``HubSpotService._request``."""
+        path = urlsplit(endpoint).path.removeprefix(urlsplit(HubSpotService.BASE_URL).path)
+        for route_method, pattern, name in self.ROUTES:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                break
+        else:
+            return FakeResponse(404, {'status': 'error', 'message': f'No route for {method} {path}'}, endpoint)
+
+        if self.latency:
+            time.sleep(self.latency)
+        params = {
+            key: value if isinstance(value, list) or key not in ('vid', 'email', 'property') else [value]
+            for key, value in (params or {}).items()
+        }
+        with self.lock:
+            self.calls[name] += 1
+            status, payload = getattr(self, name)(params, json, *match.groups())
+        return FakeResponse(status, payload, endpoint)
+
+    @contextmanager
+    def installed(self):
+        with mock.patch.object(HubSpotService, '_request', self.request):
+            yield self
@@ -1,6 +1,33 @@
 import requests
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from ContactHub import fast_json, profiling
+from .streaming import CHUNK_SIZE, decode_contact_page
+
+
+class RateLimiter:
+    """Thread-safe token bucket shared by every HubSpot call in the process."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
 
 
 class HubSpotService:
@@ -14,97 +41,194 @@ class HubSpotService:
 
     HEADERS = {"Authorization": f"Bearer {api_key}"}
 
+    # HubSpot allows 100 requests per 10 seconds for private apps; every
+    # thread in the process draws from the same bucket.
+    rate_limiter = RateLimiter(float(os.getenv('HUBSPOT_MAX_REQUESTS_PER_SECOND', 10)))
+    MAX_RETRIES = 3
+    REQUEST_TIMEOUT = 30
+    PAGE_SIZE = 100
+    _local = threading.local()
+
+    @staticmethod
+    def _session():
+        session = getattr(HubSpotService._local, "session", None)
+        if session is None:
+            session = HubSpotService._local.session = requests.Session()
+            session.headers.update(HubSpotService.HEADERS)
+        return session
+
+    @staticmethod
+    def _request(method, endpoint, **kwargs):
+        """Send a request through the shared rate limiter, retrying on 429."""
+        for attempt in range(HubSpotService.MAX_RETRIES + 1):
+            HubSpotService.rate_limiter.acquire()
+            started = time.perf_counter()
+            response = None
+            try:
+                response = HubSpotService._session().request(
+                    method, endpoint, timeout=HubSpotService.REQUEST_TIMEOUT, **kwargs
+                )
+            finally:
+                profiling.record_external(
+                    'hubspot', method, endpoint, response.status_code if response is not None else None,
+                    time.perf_counter() - started,
+                )
+            if response.status_code != 429 or attempt == HubSpotService.MAX_RETRIES:
+                return response
+            time.sleep(float(response.headers.get("Retry-After", 2 ** attempt)))
+
+    @staticmethod
+    def _with_properties(params, properties):
+        """Ask HubSpot for only ``properties``; ``None`` keeps its default of all."""
+        if properties is not None:
+            params["property"] = list(properties)
+        return params
+
+    @staticmethod
+    def get_all_contacts(properties=None):
+        contacts = []
+        for page in HubSpotService.iter_contact_pages(properties=properties):
+            contacts.extend(page.get("contacts", []))
+        return contacts
+
     @staticmethod
-    def get_all_contacts():
+    def get_contacts_page(vid_offset=None, count=None, properties=None, keep=None):
+        """
+        Fetch one page of the all-contacts list, including its offset cursor.
+        With ``keep`` (property names), the body is streamed and decoded
+        incrementally into slim contacts carrying only those properties'
+        current values; see streaming.py.
+        """
         endpoint = f"{HubSpotService.BASE_URL}/lists/all/contacts/all"
-        response = requests.get(endpoint, headers=HubSpotService.HEADERS)
-        if response.status_code == 200:
-            return response.json().get("contacts", [])
-        response.raise_for_status()
+        params = HubSpotService._with_properties({"count": count or HubSpotService.PAGE_SIZE}, properties)
+        if vid_offset:
+            params["vidOffset"] = vid_offset
+        if keep is None:
+            response = HubSpotService._request("GET", endpoint, params=params)
+            if response.status_code == 200:
+                return fast_json.loads(response.content)
+            response.raise_for_status()
+        else:
+            response = HubSpotService._request("GET", endpoint, params=params, stream=True)
+            try:
+                if response.status_code == 200:
+                    return decode_contact_page(response.iter_content(CHUNK_SIZE), set(keep))
+                response.raise_for_status()
+            finally:
+                response.close()
+
+    @staticmethod
+    def iter_contact_pages(vid_offset=None, count=None, properties=None, keep=None):
+        """Follow the vid-offset cursor, yielding each page as HubSpot returns it."""
+        while True:
+            page = HubSpotService.get_contacts_page(vid_offset, count, properties, keep)
+            yield page
+            if not page.get("has-more"):
+                return
+            vid_offset = page.get("vid-offset")
         
     @staticmethod
-    def get_recently_updated_contacts(count=100):
+    def iter_contact_vids(count=None):
+        """Yield every contact vid, asking HubSpot for as little else as possible."""
+        for page in HubSpotService.iter_contact_pages(count=count, properties=["lastmodifieddate"], keep=()):
+            for contact in page.get("contacts", []):
+                yield contact["vid"]
+
+    @staticmethod
+    def get_recently_updated_contacts(count=100, properties=None):
         endpoint = f"{HubSpotService.BASE_URL}/lists/recently_updated/contacts/recent"
-        params = {"count": count}
-        response = requests.get(endpoint, headers=HubSpotService.HEADERS, params=params)
+        params = HubSpotService._with_properties({"count": count}, properties)
+        response = HubSpotService._request("GET", endpoint, params=params)
         if response.status_code == 200:
-            return response.json().get("contacts", [])
+            return fast_json.loads(response.content).get("contacts", [])
         response.raise_for_status()
 
     @staticmethod
-    def get_recently_created_contacts(count=100):
+    def get_recently_created_contacts(count=100, properties=None):
         endpoint = f"{HubSpotService.BASE_URL}/lists/all/contacts/recent"
-        params = {"count": count}
-        response = requests.get(endpoint, headers=HubSpotService.HEADERS, params=params)
+        params = HubSpotService._with_properties({"count": count}, properties)
+        response = HubSpotService._request("GET", endpoint, params=params)
         if response.status_code == 200:
-            return response.json().get("contacts", [])
+            return fast_json.loads(response.content).get("contacts", [])
         response.raise_for_status()
 
     @staticmethod
-    def get_contact_by_vid(contact_id):
+    def get_contact_by_vid(contact_id, properties=None):
         endpoint = f"{HubSpotService.BASE_URL}/contact/vid/{contact_id}/profile"
-        response = requests.get(endpoint, headers=HubSpotService.HEADERS)
+        params = HubSpotService._with_properties({}, properties)
+        response = HubSpotService._request("GET", endpoint, params=params)
         if response.status_code == 200:
-            return response.json()
+            return fast_json.loads(response.content)
         response.raise_for_status()
 
     @staticmethod
-    def get_contacts_by_vids(contact_ids):
+    def get_contacts_by_vids(contact_ids, properties=None):
         endpoint = f"{HubSpotService.BASE_URL}/contact/vids/batch"
-        params = {"vid": contact_ids}
-        response = requests.get(endpoint, headers=HubSpotService.HEADERS, params=params)
+        params = HubSpotService._with_properties({"vid": contact_ids}, properties)
+        response = HubSpotService._request("GET", endpoint, params=params)
         if response.status_code == 200:
-            return response.json()
+            return fast_json.loads(response.content)
         response.raise_for_status()
 
-
-
     @staticmethod
-    def get_contacts_by_emails(emails):
+    def get_contacts_by_emails(emails, properties=None):
         endpoint = f"{HubSpotService.BASE_URL}/contact/emails/batch"
-        params = {"email": emails}
-        response = requests.get(endpoint, headers=HubSpotService.HEADERS, params=params)
+        params = HubSpotService._with_properties({"email": emails}, properties)
+        response = HubSpotService._request("GET", endpoint, params=params)
         if response.status_code == 200:
-            return response.json()
+            return fast_json.loads(response.content)
         response.raise_for_status()
 
     @staticmethod
     def get_lifecycle_stage_metrics():
         endpoint = f"{HubSpotService.BASE_URL}/lists/static"
-        response = requests.get(endpoint, headers=HubSpotService.HEADERS)
+        response = HubSpotService._request("GET", endpoint)
         if response.status_code == 200:
-            return response.json()
+            return fast_json.loads(response.content)
         response.raise_for_status()
 
     @staticmethod
     def get_contact_statistics():
         endpoint = f"{HubSpotService.BASE_URL}/contacts/statistics"
-        response = requests.get(endpoint, headers=HubSpotService.HEADERS)
+        response = HubSpotService._request("GET", endpoint)
         if response.status_code == 200:
-            return response.json()
+            return fast_json.loads(response.content)
         response.raise_for_status()
 
     @staticmethod
     def search_contacts(query):
         endpoint = f"{HubSpotService.BASE_URL}/search/query"
         params = {"q": query}
-        response = requests.get(endpoint, headers=HubSpotService.HEADERS, params=params)
+        response = HubSpotService._request("GET", endpoint, params=params)
         if response.status_code == 200:
-            return response.json().get("contacts", [])
+            return fast_json.loads(response.content).get("contacts", [])
         response.raise_for_status()
 
     @staticmethod
     def create_contact(data):
         endpoint = f"{HubSpotService.BASE_URL}/contact"
-        response = requests.post(endpoint, json=data, headers=HubSpotService.HEADERS)
+        response = HubSpotService._request("POST", endpoint, json=data)
         if response.status_code == 200:
-            return response.json()
+            return fast_json.loads(response.content)
+        response.raise_for_status()
+
+    @staticmethod
+    def create_or_update_contacts(contacts):
+        """
+        Batch create-or-update by email. ``contacts`` is a list of
+        ``{"email": ..., "properties": [...]}``; HubSpot processes the batch
+        asynchronously and returns no vids.
+        """
+        endpoint = f"{HubSpotService.BASE_URL}/contact/batch/"
+        response = HubSpotService._request("POST", endpoint, json=contacts)
+        if response.status_code == 202:
+            return {"message": "Contacts accepted"}
         response.raise_for_status()
 
     @staticmethod
     def update_contact(contact_id, data):
         endpoint = f"{HubSpotService.BASE_URL}/contact/vid/{contact_id}/profile"
-        response = requests.post(endpoint, json=data, headers=HubSpotService.HEADERS)
+        response = HubSpotService._request("POST", endpoint, json=data)
         if response.status_code == 204:
             return {"message": "Contact updated successfully"}
         response.raise_for_status()
@@ -113,7 +237,7 @@ class HubSpotService:
     @staticmethod
     def delete_contact(contact_id):
         endpoint = f"{HubSpotService.BASE_URL}/contact/vid/{contact_id}"
-        response = requests.delete(endpoint, headers=HubSpotService.HEADERS)
+        response = HubSpotService._request("DELETE", endpoint)
         if response.status_code == 200:
             return {"message": "Contact deleted successfully"}
         response.raise_for_status()
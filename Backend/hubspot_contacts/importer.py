@@ -0,0 +1,216 @@
+"""
+Bulk CSV import of contacts.
+
+The file is parsed as a stream and handled ``chunk_size`` rows at a time:
+rows are validated column by column, deduplicated by email within the chunk
+and against the database with a single query, pushed to HubSpot through the
+batch endpoint, then inserted locally with one ``bulk_create``.
+"""
+
+import csv
+import io
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ContactHub.db_routers import primary_only
+from .hubspot_service import HubSpotService
+from .models import Contact, ContactImportJob
+from .resolver import resolve_emails
+from .signals import contact_snapshot, send_contacts_changed
+from .sync import HUBSPOT_PROPERTIES
+
+CHUNK_SIZE = 1000
+HUBSPOT_BATCH_SIZE = 100
+
+IMPORT_FIELDS = [*HUBSPOT_PROPERTIES, 'email']
+REQUIRED_FIELDS = ['first_name', 'last_name', 'email']
+MAX_LENGTHS = {name: Contact._meta.get_field(name).max_length for name in IMPORT_FIELDS}
+
+# Accept HubSpot property names as column headers too.
+HEADER_ALIASES = {hubspot: local for local, hubspot in HUBSPOT_PROPERTIES.items()}
+
+
+class CSVImportError(Exception):
+    pass
+
+
+def _is_email(value):
+    try:
+        validate_email(value)
+    except ValidationError:
+        return False
+    return True
+
+
+def normalize_header(name):
+    name = (name or '').strip().lower().replace(' ', '_')
+    return HEADER_ALIASES.get(name, name)
+
+
+def count_lines(fileobj, block_size=1024 * 1024):
+    """Count data lines without decoding the file; used for progress only."""
+    lines = 0
+    for block in iter(lambda: fileobj.read(block_size), b''):
+        lines += block.count(b'\n')
+    fileobj.seek(0)
+    return max(lines - 1, 0)
+
+
+def iter_chunks(fileobj, chunk_size=CHUNK_SIZE):
+    """Yield lists of ``(line_number, row)`` with normalized column names."""
+    reader = csv.reader(io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline=''))
+    header = [normalize_header(name) for name in next(reader, [])]
+    missing = [name for name in REQUIRED_FIELDS if name not in header]
+    if missing:
+        raise CSVImportError(f"Missing required column(s): {', '.join(missing)}")
+
+    columns = [(index, name) for index, name in enumerate(header) if name in IMPORT_FIELDS]
+    rows = (
+        (reader.line_num, {name: (cells[index].strip() if index < len(cells) else '') for index, name in columns})
+        for cells in reader
+        if any(cell.strip() for cell in cells)
+    )
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validate_chunk(chunk):
+    """
+    Validate a chunk column by column. Returns the valid rows and a list of
+    ``{"line": ..., "errors": {...}}`` for the rest.
+    """
+    problems = {}
+
+    def flag(line, field, message):
+        problems.setdefault(line, {})[field] = message
+
+    for field in IMPORT_FIELDS:
+        column = [(line, row.get(field, '')) for line, row in chunk]
+        if field in REQUIRED_FIELDS:
+            for line, value in column:
+                if not value:
+                    flag(line, field, "This field is required.")
+        limit = MAX_LENGTHS[field]
+        for line, value in column:
+            if len(value) > limit:
+                flag(line, field, f"Ensure this field has no more than {limit} characters.")
+
+    for line, row in chunk:
+        row['email'] = row.get('email', '').lower()
+        if row['email'] and not _is_email(row['email']):
+            flag(line, 'email', "Enter a valid email address.")
+
+    valid = [(line, row) for line, row in chunk if line not in problems]
+    errors = [{"line": line, "errors": fields} for line, fields in problems.items()]
+    return valid, errors
+
+
+def dedupe_chunk(rows):
+    """Drop rows whose email repeats within the chunk or already exists locally."""
+    unique = {}
+    for line, row in rows:
+        unique.setdefault(row['email'], (line, row))
+    existing = set(Contact.objects.filter(email_lower__in=unique).values_list('email_lower', flat=True))
+    kept = [pair for email, pair in unique.items() if email not in existing]
+    return kept, len(rows) - len(kept)
+
+
+def hubspot_payload(row):
+    # The batch endpoint upserts by email: a property sent empty would clear
+    # it on an existing HubSpot contact, so send only the values the CSV has.
+    return {
+        "email": row['email'],
+        "properties": [
+            {"property": hubspot, "value": row[local]}
+            for local, hubspot in HUBSPOT_PROPERTIES.items()
+            if row.get(local)
+        ],
+    }
+
+
+def push_to_hubspot(rows):
+    """Batch-upsert ``rows`` into HubSpot and return ``{email: vid}`` for them."""
+    for start in range(0, len(rows), HUBSPOT_BATCH_SIZE):
+        batch = rows[start:start + HUBSPOT_BATCH_SIZE]
+        HubSpotService.create_or_update_contacts([hubspot_payload(row) for _, row in batch])
+
+    resolved = resolve_emails([row['email'] for _, row in rows])
+    return {email: match['hubspot_id'] for email, match in resolved.items() if match}
+
+
+def _record(job, errors, **counts):
+    updates = {name: F(name) + value for name, value in counts.items() if value}
+    if updates:
+        ContactImportJob.objects.filter(pk=job.pk).update(**updates)
+    if errors:
+        job.refresh_from_db(fields=['errors'])
+        room = ContactImportJob.MAX_STORED_ERRORS - len(job.errors)
+        if room > 0:
+            job.errors.extend(errors[:room])
+            job.save(update_fields=['errors'])
+
+
+def import_chunk(job, chunk):
+    valid, errors = validate_chunk(chunk)
+    rows, duplicates = dedupe_chunk(valid)
+
+    vids = push_to_hubspot(rows) if rows else {}
+    found = [(line, row) for line, row in rows if row['email'] in vids]
+    pending = len(rows) - len(found)
+
+    with transaction.atomic():
+        known = set(
+            Contact.objects.filter(hubspot_id__in=[vids[row['email']] for _, row in found])
+            .values_list('hubspot_id', flat=True)
+        )
+        contacts = [
+            Contact(hubspot_id=vids[row['email']], **{field: row.get(field) or None for field in IMPORT_FIELDS})
+            for _, row in found
+            if vids[row['email']] not in known
+        ]
+        for contact in contacts:
+            contact.set_normalized_fields()
+        created = Contact.objects.bulk_create(contacts)
+        send_contacts_changed([(None, contact_snapshot(contact)) for contact in created])
+    duplicates += len(found) - len(created)
+
+    _record(
+        job,
+        errors,
+        processed_rows=len(chunk),
+        created_count=len(created),
+        duplicate_count=duplicates,
+        failed_count=len(errors),
+        pending_count=pending,
+    )
+
+
+@primary_only
+def run_import(job_id, chunk_size=CHUNK_SIZE):
+    job = ContactImportJob.objects.get(pk=job_id)
+    job.status = ContactImportJob.RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+
+    try:
+        with job.file.open('rb') as fileobj:
+            job.total_rows = count_lines(fileobj)
+            job.save(update_fields=['total_rows'])
+            for chunk in iter_chunks(fileobj, chunk_size):
+                import_chunk(job, chunk)
+    except Exception as exc:
+        job.status = ContactImportJob.FAILED
+        job.message = str(exc)
+    else:
+        job.status = ContactImportJob.COMPLETED
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'message', 'finished_at'])
+    return job
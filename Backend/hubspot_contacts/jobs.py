@@ -0,0 +1,28 @@
+"""
+Minimal in-process background jobs.
+
+There is no task queue in this project, so long-running work started from a
+request runs on a daemon thread that owns (and closes) its own DB connection.
+"""
+
+import logging
+import threading
+
+from django.db import close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+
+def start_background_job(target, *args, name=None, **kwargs):
+    def run():
+        close_old_connections()
+        try:
+            target(*args, **kwargs)
+        except Exception:
+            logger.exception("Background job %s failed", name or target.__name__)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run, name=name or target.__name__, daemon=True)
+    thread.start()
+    return thread
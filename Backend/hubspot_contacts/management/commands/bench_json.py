@@ -0,0 +1,135 @@
+import json
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from ContactHub import fast_json
+from ContactHub.fast_json import ORJSONRenderer
+
+
+def hubspot_page(count, versions):
+    """A v1 all-contacts page shaped like HubSpot's, with property history."""
+    def prop(value, i):
+        return {
+            "value": value,
+            "versions": [
+                {
+                    "value": value,
+                    "source-type": "CRM_UI",
+                    "source-id": "user@example.com",
+                    "source-label": None,
+                    "timestamp": 1736000000000 + n,
+                    "selected": False,
+                }
+                for n in range(versions)
+            ],
+        }
+
+    return {
+        "contacts": [
+            {
+                "addedAt": 1736000000000 + i,
+                "vid": i,
+                "canonical-vid": i,
+                "merged-vids": [],
+                "portal-id": 123456,
+                "is-contact": True,
+                "properties": {
+                    "firstname": prop(f"First{i}", i),
+                    "lastname": prop(f"Last{i}", i),
+                    "company": prop("ContactHub", i),
+                    "website": prop("https://example.com", i),
+                    "phone": prop(f"+1 555 {i:07d}", i),
+                    "address": prop(f"{i} Main Street", i),
+                    "state": prop("CA", i),
+                    "zip": prop("94105", i),
+                    "lastmodifieddate": prop(str(1736000000000 + i), i),
+                },
+                "identity-profiles": [
+                    {
+                        "vid": i,
+                        "identities": [
+                            {"type": "EMAIL", "value": f"contact{i}@example.com", "timestamp": 1736000000000},
+                            {"type": "LEAD_GUID", "value": f"guid-{i}", "timestamp": 1736000000000},
+                        ],
+                    }
+                ],
+            }
+            for i in range(count)
+        ],
+        "has-more": True,
+        "vid-offset": count,
+    }
+
+
+def contact_list(count):
+    """The ContactListView response body for ``count`` contacts."""
+    return [
+        {
+            "first_name": f"First{i}",
+            "last_name": f"Last{i}",
+            "company": "ContactHub" if i % 3 else None,
+            "website": "https://example.com",
+            "phone": f"+1 555 {i:07d}",
+            "address": f"{i} Main Street",
+            "state": "CA",
+            "zip": "94105",
+            "email": f"contact{i}@example.com",
+            "added_at": date(2025, 1, 1 + i % 28),
+            "lastmodifieddate": date(2025, 2, 1 + i % 28),
+        }
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Compare stdlib json with orjson on realistic HubSpot pages and contact listings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--contacts", type=int, default=10000)
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--versions", type=int, default=3)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.repeat = options["repeat"]
+
+        listing = contact_list(options["contacts"])
+        drf, fast = JSONRenderer(), ORJSONRenderer()
+        if drf.render(listing) != fast.render(listing):
+            raise CommandError("ORJSONRenderer output differs from JSONRenderer")
+
+        body = json.dumps(hubspot_page(options["page_size"], options["versions"])).encode()
+        rendered = fast.render(listing)
+
+        self.stdout.write(f"{'payload':<42} {'stdlib':>10} {'orjson':>10} {'speedup':>8}")
+        self.compare(
+            f"render {len(listing)} contacts ({len(rendered) // 1024} KiB)",
+            lambda: drf.render(listing),
+            lambda: fast.render(listing),
+        )
+        self.compare(
+            f"parse {len(listing)} contacts request body",
+            lambda: json.loads(rendered),
+            lambda: fast_json.loads(rendered),
+        )
+        self.compare(
+            f"decode HubSpot page of {options['page_size']} ({len(body) // 1024} KiB)",
+            lambda: json.loads(body),
+            lambda: fast_json.loads(body),
+        )
+
+    def compare(self, label, baseline, candidate):
+        slow, quick = self.best_of(baseline), self.best_of(candidate)
+        self.stdout.write(f"{label:<42} {slow * 1000:>8.2f}ms {quick * 1000:>8.2f}ms {slow / quick:>7.1f}x")
+
+    def best_of(self, func):
+        best = None
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,65 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ContactHub import fast_json
+from hubspot_contacts import streaming
+from hubspot_contacts.fake_hubspot import FakeHubSpot
+from hubspot_contacts.hubspot_service import HubSpotService
+from hubspot_contacts.sync import MAPPED_PROPERTIES, contact_defaults
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare peak memory and time of decoding one HubSpot contact page whole "
+        "(orjson) against the incremental decoder the sync uses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=HubSpotService.PAGE_SIZE)
+        parser.add_argument("--versions", type=int, default=20, help="History entries per property.")
+        parser.add_argument("--chunk-size", type=int, default=streaming.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        portal = FakeHubSpot(total=options["page_size"], history=options["versions"])
+        response = portal.request(
+            "GET", f"{HubSpotService.BASE_URL}/lists/all/contacts/all", params={"count": options["page_size"]}
+        )
+        chunk_size = options["chunk_size"]
+
+        whole, whole_stats = self.measure(
+            lambda: fast_json.loads(b"".join(response.iter_content(chunk_size)))
+        )
+        slim, slim_stats = self.measure(
+            lambda: streaming.decode_contact_page(response.iter_content(chunk_size), MAPPED_PROPERTIES)
+        )
+        if [contact_defaults(c) for c in whole["contacts"]] != [contact_defaults(c) for c in slim["contacts"]]:
+            raise CommandError("The incremental decoder maps contacts differently from the full decode")
+
+        backend = streaming.ijson.backend if streaming.ijson else "orjson fallback (ijson not installed)"
+        self.stdout.write(
+            f"Page of {options['page_size']} contacts, {options['versions']} versions per property: "
+            f"{len(response.content) / 1024:.0f} KiB body, {chunk_size // 1024} KiB chunks, decoder {backend}"
+        )
+        self.stdout.write(f"{'decoder':<12} {'peak':>10} {'retained':>10} {'time':>10}")
+        for label, (peak, retained, seconds) in (("orjson", whole_stats), ("streaming", slim_stats)):
+            self.stdout.write(f"{label:<12} {peak / 1024:>8.0f}KiB {retained / 1024:>8.0f}KiB {seconds * 1000:>8.1f}ms")
+        self.stdout.write(f"Peak memory {whole_stats[0] / slim_stats[0]:.1f}x lower when streaming")
+
+    @staticmethod
+    def measure(decode):
+        """
+        Time ``decode``, then run it again under tracemalloc, which slows
+        allocation too much to time. Returns its result and (peak, retained, seconds).
+        """
+        started = time.perf_counter()
+        decode()
+        seconds = time.perf_counter() - started
+        tracemalloc.start()
+        try:
+            result = decode()
+            retained, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return result, (peak, retained, seconds)
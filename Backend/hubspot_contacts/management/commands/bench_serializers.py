@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from hubspot_contacts.models import Contact
+from hubspot_contacts.serializers import ContactRowSerializer, ContactSerializer
+
+
+def make_contacts(count):
+    return [
+        Contact(
+            hubspot_id=f"bench-{i}",
+            first_name=f"First{i}",
+            last_name=f"Last{i}",
+            company="ContactHub" if i % 3 else None,
+            website="https://example.com",
+            phone=f"+1 555 {i:07d}",
+            address=f"{i} Main Street",
+            state="CA",
+            zip="94105",
+            email=f"bench{i}@example.com",
+        )
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ContactSerializer(many=True) with the values_list() based "
+        "ContactRowSerializer. Rows are created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'rows':>8} {'ContactSerializer':>18} {'ContactRowSerializer':>21} {'speedup':>8}")
+        for size in options["sizes"]:
+            with transaction.atomic():
+                Contact.objects.bulk_create(make_contacts(size), batch_size=1000)
+                queryset = Contact.objects.filter(hubspot_id__startswith="bench-")
+
+                drf_time, drf_data = self.best_of(
+                    options["repeat"], lambda: ContactSerializer(queryset.all(), many=True).data
+                )
+                fast_time, fast_data = self.best_of(
+                    options["repeat"], lambda: ContactRowSerializer().serialize(queryset.all())
+                )
+                renderer = JSONRenderer()
+                if renderer.render(drf_data) != renderer.render(fast_data):
+                    raise CommandError(f"Serializer output differs at {size} rows")
+
+                transaction.set_rollback(True)
+
+            self.stdout.write(
+                f"{size:>8} {drf_time * 1000:>16.1f}ms {fast_time * 1000:>19.1f}ms "
+                f"{drf_time / fast_time:>7.1f}x"
+            )
+
+    def best_of(self, repeat, func):
+        best, result = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
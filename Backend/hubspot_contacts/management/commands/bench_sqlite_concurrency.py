@@ -0,0 +1,130 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+
+from hubspot_contacts.models import Contact
+from hubspot_contacts.serializers import ContactSerializer
+
+BENCH_PREFIX = "bench-"
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Run one sync-style writer alongside N list readers against the SQLite "
+        "database and report lock errors and latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--rows", type=int, default=5000)
+        parser.add_argument("--batch", type=int, default=100)
+        parser.add_argument(
+            "--untuned",
+            action="store_true",
+            help="Run with SQLite's default settings (rollback journal, no busy timeout) for comparison.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("This benchmark only applies to the SQLite backend.")
+
+        self.untuned = options["untuned"]
+        if self.untuned:
+            self.untune()
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.results = {"read_latency": [], "read_errors": 0, "write_latency": [], "write_errors": 0}
+
+        readers = [
+            threading.Thread(target=self.reader, daemon=True)
+            for _ in range(options["readers"])
+        ]
+        for thread in readers:
+            thread.start()
+
+        started = time.perf_counter()
+        writer = threading.Thread(target=self.writer, args=(options["rows"], options["batch"]))
+        writer.start()
+        writer.join()
+        elapsed = time.perf_counter() - started
+
+        self.stop.set()
+        for thread in readers:
+            thread.join()
+
+        Contact.objects.filter(hubspot_id__startswith=BENCH_PREFIX).delete()
+        self.report(elapsed, options)
+
+    def untune(self):
+        """Drop the configured OPTIONS for every connection this run opens."""
+        connections.settings[connection.alias]["OPTIONS"] = {"timeout": 0}
+        connection.close()
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode=DELETE")
+
+    def writer(self, rows, batch):
+        try:
+            for start in range(0, rows, batch):
+                began = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        for i in range(start, min(start + batch, rows)):
+                            Contact.objects.update_or_create(
+                                hubspot_id=f"{BENCH_PREFIX}{i}",
+                                defaults={
+                                    "first_name": f"Bench{i}",
+                                    "last_name": "Writer",
+                                    "company": "ContactHub",
+                                    "email": f"bench{i}@example.com",
+                                },
+                            )
+                except OperationalError:
+                    with self.lock:
+                        self.results["write_errors"] += 1
+                    continue
+                with self.lock:
+                    self.results["write_latency"].append(time.perf_counter() - began)
+        finally:
+            connection.close()
+
+    def reader(self):
+        try:
+            while not self.stop.is_set():
+                began = time.perf_counter()
+                try:
+                    ContactSerializer(Contact.objects.all(), many=True).data
+                except OperationalError:
+                    with self.lock:
+                        self.results["read_errors"] += 1
+                    continue
+                with self.lock:
+                    self.results["read_latency"].append(time.perf_counter() - began)
+        finally:
+            connection.close()
+
+    def report(self, elapsed, options):
+        mode = "untuned" if self.untuned else "tuned"
+        self.stdout.write(
+            f"{mode}: {options['rows']} rows in batches of {options['batch']}, "
+            f"{options['readers']} readers, {elapsed:.2f}s"
+        )
+        for kind in ("write", "read"):
+            latency = [value * 1000 for value in self.results[f"{kind}_latency"]]
+            self.stdout.write(
+                f"  {kind:5} ops={len(latency):6d} lock_errors={self.results[f'{kind}_errors']:5d} "
+                f"mean={statistics.fmean(latency) if latency else 0:8.2f}ms "
+                f"p50={percentile(latency, 50):8.2f}ms "
+                f"p95={percentile(latency, 95):8.2f}ms "
+                f"p99={percentile(latency, 99):8.2f}ms"
+            )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hubspot_contacts.dedup import CHUNK_SIZE, ScanAlreadyRunning, scan_duplicates
+
+
+class Command(BaseCommand):
+    help = "Rebuild dedup blocking keys and duplicate-contact suggestions for the whole table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            stats = scan_duplicates(chunk_size=options["chunk_size"], triggered_by="find_duplicates")
+        except ScanAlreadyRunning as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"Keyed {stats['contacts']} contacts ({stats['keys']} keys), compared {stats['pairs']} pairs "
+            f"from {stats['blocks']} blocks: {stats['suggestions']} suggestions"
+        ))
@@ -0,0 +1,36 @@
+from pathlib import Path
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from hubspot_contacts.importer import CHUNK_SIZE, run_import
+from hubspot_contacts.models import ContactImportJob
+
+
+class Command(BaseCommand):
+    help = "Import contacts from a CSV file into HubSpot and the local database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.is_file():
+            raise CommandError(f"{path} does not exist")
+
+        with path.open("rb") as fileobj:
+            job = ContactImportJob.objects.create(file=File(fileobj, name=path.name))
+
+        job = run_import(job.pk, chunk_size=options["chunk_size"])
+        job.refresh_from_db()
+        summary = (
+            f"Import {job.pk} {job.status}: {job.processed_rows} rows, {job.created_count} created, "
+            f"{job.duplicate_count} duplicates, {job.failed_count} invalid, "
+            f"{job.pending_count} awaiting HubSpot"
+        )
+        if job.status == ContactImportJob.FAILED:
+            raise CommandError(f"{summary}. {job.message}")
+        self.stdout.write(self.style.SUCCESS(summary))
+        for error in job.errors[:20]:
+            self.stdout.write(f"  line {error['line']}: {error['errors']}")
@@ -0,0 +1,291 @@
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import django
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.utils import override_settings, setup_databases, teardown_databases
+
+from hubspot_contacts import sync_jobs
+from hubspot_contacts.fake_hubspot import FakeHubSpot
+from hubspot_contacts.models import Contact
+from .bench_sqlite_concurrency import percentile
+
+DEFAULT_MIX = "list=2,search=3,detail=6,create=2,update=2,delete=1,login=1"
+PASSWORD = "Load#test1"
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class VirtualUser:
+    """One simulated client: logs in, then replays weighted actions until the deadline."""
+
+    def __init__(self, command, number):
+        self.command = command
+        self.email = f"load{number}@example.com"
+        self.random = random.Random(command.seed + number)
+        self.session = requests.Session()
+        self.samples = []
+        self.created = []
+        self.counter = 0
+
+    def request(self, label, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.command.base_url + path, timeout=60, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            response, status = None, 0
+        self.samples.append((label, status, time.perf_counter() - started))
+        return response if response is not None and status < 400 else None
+
+    def login(self):
+        response = self.request("POST /accounts/login/", "POST", "/accounts/login/",
+                                json={"email": self.email, "password": PASSWORD})
+        if response is not None:
+            self.session.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+    def list(self):
+        self.request("GET /contacts/", "GET", "/contacts/")
+
+    def search(self):
+        self.request("GET /hubspot/search/", "GET", "/hubspot/search/",
+                     params={"q": f"first{self.random.randint(1, self.command.contacts)}"})
+
+    def detail(self):
+        pk = self.random.choice(self.command.read_pks)
+        self.request("GET /contacts/<id>/", "GET", f"/contacts/{pk}/")
+
+    def create(self):
+        self.counter += 1
+        email = f"{self.email.split('@')[0]}-{self.counter}@example.com"
+        created = self.request("POST /contacts/", "POST", "/contacts/", json={
+            "first_name": "Load", "last_name": f"User{self.counter}", "email": email, "company": "ContactHub",
+        })
+        if created is None:
+            return
+        resolved = self.request("POST /contacts/resolve/", "POST", "/contacts/resolve/",
+                                json={"emails": [email], "remote": False})
+        match = resolved.json()["emails"].get(email) if resolved is not None else None
+        if match and match["id"]:
+            self.created.append(match["id"])
+
+    def update(self):
+        if not self.created:
+            return self.create()
+        pk = self.random.choice(self.created)
+        self.request("PUT /contacts/<id>/", "PUT", f"/contacts/{pk}/", json={
+            "first_name": "Load", "last_name": f"Updated{pk}", "email": f"updated{pk}@example.com",
+        })
+
+    def delete(self):
+        if not self.created:
+            return self.create()
+        pk = self.created.pop(self.random.randrange(len(self.created)))
+        self.request("DELETE /contacts/<id>/", "DELETE", f"/contacts/{pk}/")
+
+    def run(self, deadline):
+        actions, weights = zip(*self.command.mix.items())
+        self.login()
+        while time.monotonic() < deadline:
+            getattr(self, self.random.choices(actions, weights)[0])()
+
+
+class Command(BaseCommand):
+    help = (
+        "Boot the app on a throwaway database against an in-memory HubSpot, replay mixed user "
+        "scenarios over HTTP at the given concurrency, and report throughput and latency "
+        "percentiles per endpoint. Results are saved as JSON for comparison across commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=8, help="Concurrent virtual users.")
+        parser.add_argument("--duration", type=float, default=30, help="Seconds to run the scenarios for.")
+        parser.add_argument("--contacts", type=int, default=1000, help="Contacts in the fake HubSpot portal.")
+        parser.add_argument("--latency", type=float, default=50, help="Fake HubSpot response time in ms.")
+        parser.add_argument("--mix", default=DEFAULT_MIX,
+                            help=f"Action weights, e.g. '{DEFAULT_MIX}'.")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--output", help="Result file (default: loadtest-results/<time>-<commit>.json).")
+        parser.add_argument("--compare", help="Earlier result file to compare against.")
+
+    def handle(self, *args, **options):
+        self.mix = self.parse_mix(options["mix"])
+        self.seed = options["seed"]
+        self.contacts = max(options["contacts"], 1)
+        baseline = self.load(options["compare"]) if options["compare"] else None
+
+        database = None
+        if connection.vendor == "sqlite":
+            # A real file, so WAL and locking behave as in production.
+            database = Path(tempfile.mkdtemp(prefix="contacthub-load-")) / "load.sqlite3"
+            connection.settings_dict["TEST"]["NAME"] = str(database)
+        old_config = setup_databases(verbosity=0, interactive=False)
+        portal = FakeHubSpot(total=self.contacts, latency=options["latency"] / 1000)
+        try:
+            with portal.installed(), override_settings(
+                ALLOWED_HOSTS=["*"],
+                REST_FRAMEWORK=settings.REST_FRAMEWORK | {"DEFAULT_THROTTLE_RATES": {"hubspot": "1000000/min"}},
+            ):
+                results = self.run(options, portal)
+        finally:
+            connection.close()
+            teardown_databases(old_config, verbosity=0)
+            if database is not None:
+                for path in database.parent.glob("*"):
+                    path.unlink()
+                database.parent.rmdir()
+
+        self.report(results, baseline)
+        path = Path(options["output"] or settings.BASE_DIR / "loadtest-results" / (
+            f"{results['started_at'].replace(':', '')}-{results['commit'] or 'nocommit'}.json"
+        ))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(results, indent=2))
+        self.stdout.write(f"Saved {path}")
+
+    def parse_mix(self, value):
+        actions = {"list", "search", "detail", "create", "update", "delete", "login"}
+        try:
+            mix = {name.strip(): float(weight) for name, weight in (part.split("=") for part in value.split(","))}
+        except ValueError:
+            raise CommandError(f"--mix must look like '{DEFAULT_MIX}'")
+        unknown = set(mix) - actions
+        if unknown:
+            raise CommandError(f"Unknown action(s) in --mix: {', '.join(sorted(unknown))}")
+        return {name: weight for name, weight in mix.items() if weight > 0}
+
+    def load(self, path):
+        try:
+            return json.loads(Path(path).read_text())
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+
+    def run(self, options, portal):
+        User = get_user_model()
+        for number in range(options["users"]):
+            User.objects.create_user(email=f"load{number}@example.com", username=f"load{number}",
+                                     password=PASSWORD, first_name="Load", last_name=str(number))
+        sync_jobs.sync_once(triggered_by="loadtest")
+        self.read_pks = list(Contact.objects.values_list("pk", flat=True))
+        hubspot_calls_before = portal.total_calls()
+
+        server = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler)
+        server.set_app(get_wsgi_application())
+        self.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        users = [VirtualUser(self, number) for number in range(options["users"])]
+        started_at = datetime.now(timezone.utc)
+        started = time.monotonic()
+        deadline = started + options["duration"]
+        threads = [threading.Thread(target=user.run, args=(deadline,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        server.shutdown()
+        server.server_close()
+
+        samples = [sample for user in users for sample in user.samples]
+        return {
+            "commit": self.commit(),
+            "started_at": started_at.strftime("%Y%m%dT%H%M%SZ"),
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "cpus": os.cpu_count(),
+            },
+            "options": {name: options[name] for name in ("users", "duration", "contacts", "latency", "seed")}
+            | {"mix": self.mix},
+            "elapsed": round(elapsed, 3),
+            "requests": len(samples),
+            "throughput": round(len(samples) / elapsed, 2),
+            "hubspot_calls": portal.total_calls() - hubspot_calls_before,
+            "endpoints": self.summarize(samples, elapsed),
+        }
+
+    @staticmethod
+    def summarize(samples, elapsed):
+        by_label = {}
+        for label, status, seconds in samples:
+            by_label.setdefault(label, []).append((status, seconds * 1000))
+        summary = {}
+        for label, entries in sorted(by_label.items()):
+            latency = [ms for _, ms in entries]
+            summary[label] = {
+                "requests": len(entries),
+                "errors": sum(1 for status, _ in entries if not 200 <= status < 400),
+                "throughput": round(len(entries) / elapsed, 2),
+                "mean_ms": round(statistics.fmean(latency), 2),
+                "p50_ms": round(percentile(latency, 50), 2),
+                "p95_ms": round(percentile(latency, 95), 2),
+                "p99_ms": round(percentile(latency, 99), 2),
+                "max_ms": round(max(latency), 2),
+            }
+        return summary
+
+    @staticmethod
+    def commit():
+        try:
+            output = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+            dirty = subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        return f"{output}-dirty" if dirty else output
+
+    def report(self, results, baseline=None):
+        self.stdout.write(
+            f"{results['requests']} requests in {results['elapsed']:.1f}s from {results['options']['users']} users: "
+            f"{results['throughput']:.1f} req/s, {results['hubspot_calls']} HubSpot calls "
+            f"(commit {results['commit'] or 'unknown'})"
+        )
+        previous = (baseline or {}).get("endpoints", {})
+        for label, row in results["endpoints"].items():
+            line = (
+                f"  {label:26} n={row['requests']:6d} err={row['errors']:4d} {row['throughput']:8.1f}/s "
+                f"p50={row['p50_ms']:8.1f}ms p95={row['p95_ms']:8.1f}ms p99={row['p99_ms']:8.1f}ms"
+            )
+            if label in previous:
+                before = previous[label]
+                line += (
+                    f"  | p95 {self.change(before['p95_ms'], row['p95_ms'])}, "
+                    f"req/s {self.change(before['throughput'], row['throughput'])}"
+                )
+            self.stdout.write(line)
+        if baseline:
+            self.stdout.write(
+                f"Baseline {baseline.get('commit') or 'unknown'}: {baseline['throughput']:.1f} req/s overall, "
+                f"now {self.change(baseline['throughput'], results['throughput'])}"
+            )
+
+    @staticmethod
+    def change(before, after):
+        if not before:
+            return "n/a"
+        return f"{(after - before) / before:+.1%}"
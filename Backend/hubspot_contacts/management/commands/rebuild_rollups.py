@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from ContactHub.db_routers import use_primary
+from hubspot_contacts.facets import rebuild_facets
+from hubspot_contacts.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the contact statistics rollups and facet counts from the local contact table."
+
+    def handle(self, *args, **options):
+        with use_primary():
+            rollup_rows = rebuild_rollups()
+            facet_rows = rebuild_facets()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rollup_rows} rollup rows and {facet_rows} facet counters"))
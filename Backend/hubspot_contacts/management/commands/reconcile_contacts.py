@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from hubspot_contacts.sync import reconcile_deletions
+
+
+class Command(BaseCommand):
+    help = "Delete local contacts that no longer exist in HubSpot."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many local contacts are orphaned.",
+        )
+
+    def handle(self, *args, **options):
+        stats = reconcile_deletions(chunk_size=options["chunk_size"], dry_run=options["dry_run"])
+        if not stats["remote"]:
+            self.stderr.write("HubSpot returned no contacts; nothing was deleted.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Compared {stats['local']} local contacts against {stats['remote']} HubSpot vids: "
+            f"{stats['orphaned']} orphaned, {stats['deleted']} deleted"
+        ))
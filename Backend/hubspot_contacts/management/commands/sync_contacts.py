@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hubspot_contacts import sync_jobs
+from hubspot_contacts.sync import DEFAULT_CONCURRENCY
+
+
+class Command(BaseCommand):
+    help = "Run a full HubSpot contact sync into the local database."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=DEFAULT_CONCURRENCY,
+            help="Parallel profile fetches; 1 runs the serial page-by-page sync.",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue the last interrupted sync from its checkpoint (serially) instead of starting over.",
+        )
+
+    def handle(self, *args, **options):
+        job = None
+        if options["resume"]:
+            job = sync_jobs.resume(triggered_by="manage.py sync_contacts --resume")
+            if job is not None:
+                self.stdout.write(f"Resuming sync job {job.pk} after {job.pages} pages ({job.fetched} contacts).")
+            else:
+                self.stdout.write("No interrupted sync to resume; starting a full sync.")
+        if job is None:
+            job = sync_jobs.acquire(triggered_by="manage.py sync_contacts")
+        if job is None:
+            current = sync_jobs.running()
+            raise CommandError(f"Sync job {current.pk if current else '?'} is already running.")
+
+        started = time.monotonic()
+        sync_jobs.execute(job, concurrency=options["concurrency"])
+        elapsed = time.monotonic() - started
+        written = job.created_count + job.updated_count + job.skipped_count
+        self.stdout.write(self.style.SUCCESS(
+            f"Sync job {job.pk}: synced {job.fetched} contacts from {job.pages} pages in {elapsed:.1f}s: "
+            f"{job.created_count} created, {job.updated_count} updated, "
+            f"{job.skipped_count} unchanged (skip ratio {job.skipped_count / written if written else 0:.1%})"
+        ))
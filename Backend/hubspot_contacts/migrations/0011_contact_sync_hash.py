@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("hubspot_contacts", "0010_alter_contact_added_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contact",
+            name="sync_hash",
+            field=models.CharField(blank=True, default="", max_length=16),
+        ),
+    ]
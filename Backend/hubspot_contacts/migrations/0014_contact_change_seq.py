@@ -0,0 +1,44 @@
+# Generated by Django 5.1.4 on 2026-10-19 17:07
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def number_existing_contacts(apps, schema_editor):
+    """Give existing rows a feed position so ``since=0`` returns everything."""
+    Contact = apps.get_model('hubspot_contacts', 'Contact')
+    ChangeCounter = apps.get_model('hubspot_contacts', 'ChangeCounter')
+    last = Contact.objects.aggregate(last=Max('pk'))['last']
+    if last is None:
+        return
+    Contact.objects.update(change_seq=F('pk'))
+    counter, _ = ChangeCounter.objects.get_or_create(name='contacts')
+    if counter.value < last:
+        counter.value = last
+        counter.save(update_fields=['value', 'updated_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hubspot_contacts', '0013_changecounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contact_id', models.BigIntegerField()),
+                ('hubspot_id', models.CharField(max_length=255)),
+                ('change_seq', models.BigIntegerField(db_index=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(number_existing_contacts, migrations.RunPython.noop),
+    ]
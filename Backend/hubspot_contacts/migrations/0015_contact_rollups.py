@@ -0,0 +1,64 @@
+# Generated by Django 5.1.4 on 2026-10-19 17:09
+
+from collections import Counter
+from datetime import datetime
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Frozen copy of rollups.rebuild_rollups() as of this migration, so later
+# changes to the app code can't change what replaying it does.
+METRICS = {
+    'lifecycle_stage': 'lifecyclestage',
+    'created_day': 'added_at',
+    'updated_day': 'lastmodifieddate',
+}
+
+
+def _bucket(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def build_rollups(apps, schema_editor):
+    Contact = apps.get_model('hubspot_contacts', 'Contact')
+    ContactRollup = apps.get_model('hubspot_contacts', 'ContactRollup')
+    rollups = [ContactRollup(metric='total', bucket='', count=Contact.objects.count())]
+    for metric, field in METRICS.items():
+        merged = Counter()
+        for value, n in Contact.objects.order_by().values_list(field).annotate(n=Count('pk')):
+            merged[_bucket(value)] += n
+        rollups.extend(ContactRollup(metric=metric, bucket=bucket, count=n) for bucket, n in merged.items())
+    ContactRollup.objects.all().delete()
+    ContactRollup.objects.bulk_create(rollups, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hubspot_contacts', '0014_contact_change_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contact',
+            name='lifecyclestage',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.CreateModel(
+            name='ContactRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50)),
+                ('bucket', models.CharField(blank=True, default='', max_length=255)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('metric', 'bucket'), name='unique_contact_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
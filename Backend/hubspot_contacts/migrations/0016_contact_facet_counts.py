@@ -0,0 +1,73 @@
+# Generated by Django 5.1.4 on 2026-10-19 17:11
+
+import hashlib
+from collections import Counter
+from itertools import combinations
+
+from django.db import migrations, models
+
+# Frozen copy of facets.rebuild_facets() as of this migration, so later
+# changes to the app code can't change what replaying it does.
+
+
+def _filter_key(filters):
+    if not filters:
+        return ''
+    canonical = '\x1f'.join(f'{facet}={filters[facet]}' for facet in sorted(filters))
+    return hashlib.blake2b(canonical.encode(), digest_size=8).hexdigest()
+
+
+def _keys_for(row):
+    email = row['email'] or ''
+    values = {
+        'state': (row['state'] or '').strip(),
+        'company': (row['company'] or '').strip(),
+        'email_domain': email.rpartition('@')[2].strip().lower() if '@' in email else '',
+    }
+    values = {facet: value for facet, value in values.items() if value}
+    for facet, value in values.items():
+        others = [name for name in values if name != facet]
+        for size in range(len(others) + 1):
+            for subset in combinations(others, size):
+                yield facet, _filter_key({name: values[name] for name in subset}), value
+
+
+def build_facets(apps, schema_editor):
+    Contact = apps.get_model('hubspot_contacts', 'Contact')
+    ContactFacetCount = apps.get_model('hubspot_contacts', 'ContactFacetCount')
+    counts = Counter()
+    for row in Contact.objects.order_by().values('state', 'company', 'email').iterator(chunk_size=5000):
+        counts.update(_keys_for(row))
+    ContactFacetCount.objects.all().delete()
+    ContactFacetCount.objects.bulk_create(
+        (
+            ContactFacetCount(facet=facet, filter_key=key, value=value, count=count)
+            for (facet, key, value), count in counts.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hubspot_contacts', '0015_contact_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=50)),
+                ('value', models.CharField(max_length=255)),
+                ('filter_key', models.CharField(blank=True, default='', max_length=16)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['facet', 'filter_key', '-count'], name='contact_facet_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('facet', 'filter_key', 'value'), name='unique_contact_facet_value')],
+            },
+        ),
+        migrations.RunPython(build_facets, migrations.RunPython.noop),
+    ]
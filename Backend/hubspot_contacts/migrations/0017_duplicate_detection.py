@@ -0,0 +1,38 @@
+# Generated by Django 5.1.4 on 2026-10-19 17:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hubspot_contacts', '0016_contact_facet_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactBlockingKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(db_index=True, max_length=255)),
+                ('contact', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocking_keys', to='hubspot_contacts.contact')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DuplicateSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(db_index=True)),
+                ('reasons', models.JSONField(blank=True, default=list)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('dismissed', 'Dismissed'), ('merged', 'Merged')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('contact_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='hubspot_contacts.contact')),
+                ('contact_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='hubspot_contacts.contact')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('contact_a', 'contact_b'), name='unique_duplicate_pair')],
+            },
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.1.4 on 2026-10-19 17:14
+
+import os
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# Frozen copies of normalize.normalize_phone() and normalize.name_key() as of
+# this migration, so later changes to the app code can't change what
+# replaying it does. The country code stays a deployment setting.
+DEFAULT_COUNTRY_CODE = os.getenv('CONTACT_DEFAULT_COUNTRY_CODE', '1')
+
+_non_digits = re.compile(r'\D+')
+_non_alnum = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_phone(phone):
+    phone = (phone or '').strip()
+    digits = _non_digits.sub('', phone)
+    if not phone.startswith('+'):
+        if digits.startswith('00'):
+            digits = digits[2:]
+        elif len(digits) == 10 and DEFAULT_COUNTRY_CODE:
+            digits = DEFAULT_COUNTRY_CODE + digits
+    return digits if 7 <= len(digits) <= 15 else ''
+
+
+def name_token(value):
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    return _non_alnum.sub('', decomposed.encode('ascii', 'ignore').decode().lower())
+
+
+def name_key(first_name, last_name):
+    return ' '.join(token for token in (name_token(first_name), name_token(last_name)) if token)
+
+
+def fill_lookup_columns(apps, schema_editor):
+    Contact = apps.get_model('hubspot_contacts', 'Contact')
+    fields = ['id', 'email', 'phone', 'first_name', 'last_name']
+    last_pk = 0
+    while True:
+        contacts = list(Contact.objects.filter(pk__gt=last_pk).order_by('pk').only(*fields)[:2000])
+        if not contacts:
+            return
+        last_pk = contacts[-1].pk
+        for contact in contacts:
+            contact.email_lower = (contact.email or '').strip().lower()
+            contact.email_domain = contact.email_lower.rpartition('@')[2] if '@' in contact.email_lower else ''
+            contact.phone_digits = normalize_phone(contact.phone)
+            contact.name_key = name_key(contact.first_name, contact.last_name)[:255]
+        Contact.objects.bulk_update(contacts, ['email_lower', 'email_domain', 'phone_digits', 'name_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hubspot_contacts', '0017_duplicate_detection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contact',
+            name='email_domain',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=254),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='email_lower',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=254),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='name_key',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='phone_digits',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=20),
+        ),
+        migrations.RunPython(fill_lookup_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-19 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hubspot_contacts', '0018_contact_lookup_columns'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contact',
+            name='company',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='contact',
+            name='lifecyclestage',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='contact',
+            name='state',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hubspot_contacts', '0020_syncjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncjob',
+            name='cursor',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
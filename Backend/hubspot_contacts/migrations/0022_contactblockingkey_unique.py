@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-19 17:56
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def drop_duplicate_keys(apps, schema_editor):
+    # Overlapping scans could store the same key twice; keep the oldest row.
+    ContactBlockingKey = apps.get_model('hubspot_contacts', 'ContactBlockingKey')
+    keep = ContactBlockingKey.objects.values('contact_id', 'key').annotate(first=Min('id')).values('first')
+    ContactBlockingKey.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hubspot_contacts', '0021_syncjob_cursor'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='contactblockingkey',
+            constraint=models.UniqueConstraint(fields=('contact', 'key'), name='unique_contact_blocking_key'),
+        ),
+    ]
@@ -1,18 +1,266 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+
+from . import normalize
 
 class Contact(models.Model):
     hubspot_id = models.CharField(max_length=255, unique=True)
     first_name = models.CharField(max_length=255)
     last_name = models.CharField(max_length=255)
     website = models.CharField(max_length=255 , null=True , blank=True)
-    company = models.CharField(max_length=255 , null=True , blank=True)
+    company = models.CharField(max_length=255 , null=True , blank=True, db_index=True)
     address = models.CharField(max_length=255 , null=True , blank=True)
-    state = models.CharField(max_length=255 , null=True , blank=True)
+    state = models.CharField(max_length=255 , null=True , blank=True, db_index=True)
     phone = models.CharField(max_length=255 , null=True , blank=True)
     zip = models.CharField(max_length=255 , null=True , blank=True)
     email = models.EmailField(unique=True, null=True , blank=True)
     added_at = models.DateField(null=True , blank=True, auto_now_add=True)
     lastmodifieddate = models.DateField(null=True , blank=True, auto_now=True)
+    lifecyclestage = models.CharField(max_length=255, null=True, blank=True, db_index=True)
+    # Digest of the HubSpot properties last written by the sync, so unchanged
+    # contacts can be skipped without comparing every column.
+    sync_hash = models.CharField(max_length=16, blank=True, default='')
+    # Position in the change feed; reassigned from the ``contacts`` counter on
+    # every write (see receivers.py).
+    change_seq = models.BigIntegerField(default=0, db_index=True)
+    # Indexed lookup keys derived from the raw columns by set_normalized_fields().
+    email_lower = models.CharField(max_length=254, blank=True, default='', db_index=True)
+    email_domain = models.CharField(max_length=254, blank=True, default='', db_index=True)
+    phone_digits = models.CharField(max_length=20, blank=True, default='', db_index=True)
+    name_key = models.CharField(max_length=255, blank=True, default='', db_index=True)
+
+    NORMALIZED_FIELDS = ['email_lower', 'email_domain', 'phone_digits', 'name_key']
 
     def __str__(self):
         return self.first_name
+
+    def set_normalized_fields(self):
+        """Refresh the lookup keys; bulk writers must call this themselves."""
+        self.email_lower = (self.email or '').strip().lower()
+        self.email_domain = self.email_lower.rpartition('@')[2] if '@' in self.email_lower else ''
+        self.phone_digits = normalize.normalize_phone(self.phone)
+        self.name_key = normalize.name_key(self.first_name, self.last_name)[:255]
+
+    def save(self, *args, **kwargs):
+        self.set_normalized_fields()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], *self.NORMALIZED_FIELDS}
+        super().save(*args, **kwargs)
+
+
+class ContactTombstone(models.Model):
+    """Marks a deleted contact so change-feed clients can drop their copy."""
+
+    contact_id = models.BigIntegerField()
+    hubspot_id = models.CharField(max_length=255)
+    change_seq = models.BigIntegerField(db_index=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Deleted contact {self.contact_id}"
+
+
+class ContactRollup(models.Model):
+    """
+    Pre-aggregated contact counts, one row per ``(metric, bucket)``: e.g.
+    ``("lifecycle_stage", "lead")`` or ``("created_day", "2025-01-31")``.
+    Kept current by rollups.py on every contact write.
+    """
+
+    metric = models.CharField(max_length=50)
+    bucket = models.CharField(max_length=255, blank=True, default='')
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['metric', 'bucket'], name='unique_contact_rollup_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.metric}[{self.bucket}] = {self.count}"
+
+
+class ContactFacetCount(models.Model):
+    """
+    Contacts per facet value under a given combination of filters on the
+    *other* facets. ``filter_key`` identifies that combination ('' when
+    unfiltered); see facets.py.
+    """
+
+    facet = models.CharField(max_length=50)
+    value = models.CharField(max_length=255)
+    filter_key = models.CharField(max_length=16, blank=True, default='')
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'filter_key', 'value'], name='unique_contact_facet_value'),
+        ]
+        indexes = [
+            models.Index(fields=['facet', 'filter_key', '-count'], name='contact_facet_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.facet}={self.value} [{self.filter_key}] = {self.count}"
+
+
+class ContactBlockingKey(models.Model):
+    """Dedup blocking key of a contact; contacts sharing a key are compared."""
+
+    contact = models.ForeignKey(Contact, on_delete=models.CASCADE, related_name='blocking_keys')
+    key = models.CharField(max_length=255, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['contact', 'key'], name='unique_contact_blocking_key'),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class DuplicateSuggestion(models.Model):
+    PENDING = 'pending'
+    DISMISSED = 'dismissed'
+    MERGED = 'merged'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (DISMISSED, 'Dismissed'),
+        (MERGED, 'Merged'),
+    ]
+
+    # Always stored with contact_a_id < contact_b_id.
+    contact_a = models.ForeignKey(Contact, on_delete=models.CASCADE, related_name='+')
+    contact_b = models.ForeignKey(Contact, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField(db_index=True)
+    reasons = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['contact_a', 'contact_b'], name='unique_duplicate_pair'),
+        ]
+
+    def __str__(self):
+        return f"{self.contact_a_id} ~ {self.contact_b_id} ({self.score:.2f})"
+
+
+class ContactImportJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+    ]
+    # Per-row errors beyond this are only counted, not stored.
+    MAX_STORED_ERRORS = 1000
+
+    file = models.FileField(upload_to='imports/')
+    # Line count of the file, for progress; quoted multi-line cells make it an estimate.
+    total_rows = models.PositiveIntegerField(default=0)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    duplicate_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    # Pushed to HubSpot but not yet visible there; the next sync imports them.
+    pending_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Import {self.pk} ({self.status})"
+
+
+class SyncJob(models.Model):
+    """
+    One HubSpot sync run, or another whole-table job that must not overlap
+    itself (``kind``). At most one job per ``kind`` is ``running``; that row
+    is the cross-worker lock, held for as long as ``lease_expires_at`` is
+    kept in the future (see sync_jobs.py).
+    """
+
+    CONTACTS = 'contacts'
+    DUPLICATE_SCAN = 'duplicate_scan'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, default=CONTACTS)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=RUNNING)
+    # Lease token; only the worker holding it may renew or finish the job.
+    owner = models.CharField(max_length=32)
+    lease_expires_at = models.DateTimeField()
+    # Synced field subset, or null for a full sync.
+    fields = models.JSONField(null=True, blank=True)
+    triggered_by = models.CharField(max_length=255, blank=True, default='')
+    # Mirrored contact count when the job started, for progress.
+    expected_contacts = models.PositiveIntegerField(default=0)
+    pages = models.PositiveIntegerField(default=0)
+    fetched = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    # HubSpot vid-offset of the next page to sync, saved with every committed
+    # page of a serial sync; null once the sync has passed the last page.
+    cursor = models.BigIntegerField(null=True, blank=True)
+    message = models.TextField(blank=True, default='')
+    started_at = models.DateTimeField(auto_now_add=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind'], condition=models.Q(status='running'), name='one_running_sync_job',
+            ),
+        ]
+        indexes = [models.Index(fields=['kind', '-started_at'])]
+
+    def __str__(self):
+        return f"Sync {self.pk} ({self.status})"
+
+
+class ChangeCounter(models.Model):
+    """
+    Named monotonic counters. ``contacts`` advances by one per changed
+    contact; it hands out ``change_seq`` values and backs the
+    ETag/Last-Modified of the contact endpoints.
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def current(cls, name):
+        counter = cls.objects.filter(name=name).first()
+        return counter or cls(name=name)
+
+    @classmethod
+    def bump(cls, name, by=1):
+        """
+        Advance ``name`` by ``by`` and return the new value. The row stays
+        locked until the surrounding transaction commits, so values become
+        visible in the order they were handed out.
+        """
+        with transaction.atomic():
+            counter, _ = cls.objects.select_for_update().get_or_create(name=name)
+            counter.value += by
+            counter.save(update_fields=['value', 'updated_at'])
+        return counter.value
@@ -0,0 +1,90 @@
+"""
+Normalization helpers for matching contacts on email, phone and name.
+
+Everything here is pure and cheap, since it runs for every row a sync or
+import writes.
+"""
+
+import os
+import re
+import unicodedata
+
+# Prepended to 10-digit national numbers so "(415) 555-0100" and
+# "+1 415 555 0100" normalize alike. Empty disables the guess.
+DEFAULT_COUNTRY_CODE = os.getenv('CONTACT_DEFAULT_COUNTRY_CODE', '1')
+
+# Providers that ignore dots and "+tag" suffixes in the local part.
+DOTLESS_DOMAINS = {'gmail.com', 'googlemail.com'}
+
+_non_digits = re.compile(r'\D+')
+_non_alnum = re.compile(r'[^0-9a-z]+')
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'),
+    **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'),
+    'l': '4',
+    **dict.fromkeys('mn', '5'),
+    'r': '6',
+}
+
+
+def fold(value):
+    """Lowercase ASCII with accents stripped: 'Zoë Ó Brien' -> 'zoe o brien'."""
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    return decomposed.encode('ascii', 'ignore').decode().lower()
+
+
+def normalize_email(email):
+    email = (email or '').strip().lower()
+    local, at, domain = email.rpartition('@')
+    if not at or not local:
+        return ''
+    if domain == 'googlemail.com':
+        domain = 'gmail.com'
+    if domain in DOTLESS_DOMAINS:
+        local = local.split('+', 1)[0].replace('.', '')
+    return f'{local}@{domain}'
+
+
+def email_domain(email):
+    return normalize_email(email).rpartition('@')[2]
+
+
+def normalize_phone(phone):
+    """Digits-only, E.164-style (country code, no '+'); '' when implausible."""
+    phone = (phone or '').strip()
+    digits = _non_digits.sub('', phone)
+    if not phone.startswith('+'):
+        if digits.startswith('00'):
+            digits = digits[2:]
+        elif len(digits) == 10 and DEFAULT_COUNTRY_CODE:
+            digits = DEFAULT_COUNTRY_CODE + digits
+    return digits if 7 <= len(digits) <= 15 else ''
+
+
+def name_token(value):
+    return _non_alnum.sub('', fold(value))
+
+
+def name_key(first_name, last_name):
+    """Order-preserving full-name key: 'José  de-la Cruz' -> 'jose delacruz'."""
+    return ' '.join(token for token in (name_token(first_name), name_token(last_name)) if token)
+
+
+def soundex(value):
+    """American Soundex code ('Robert' -> 'R163'), '' for names without letters."""
+    letters = [char for char in fold(value) if 'a' <= char <= 'z']
+    if not letters:
+        return ''
+    code = [letters[0].upper()]
+    previous = _SOUNDEX_CODES.get(letters[0], '')
+    for char in letters[1:]:
+        digit = _SOUNDEX_CODES.get(char, '')
+        if digit and digit != previous:
+            code.append(digit)
+            if len(code) == 4:
+                break
+        if char not in 'hw':
+            previous = digit
+    return ''.join(code).ljust(4, '0')
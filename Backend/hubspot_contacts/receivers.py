@@ -0,0 +1,43 @@
+from itertools import count
+
+from django.dispatch import receiver
+
+from . import dedup, facets, rollups
+from .models import ChangeCounter, Contact, ContactTombstone
+from .signals import contacts_changed
+
+
+@receiver(contacts_changed)
+def record_contact_changes(sender, changes, **kwargs):
+    """
+    Allocate one ``change_seq`` per changed contact from the ``contacts``
+    counter, stamp it on surviving rows and leave a tombstone for deleted
+    ones. Runs in the writer's transaction, so the counter row lock keeps
+    sequence numbers committing in order.
+    """
+    last = ChangeCounter.bump('contacts', by=len(changes))
+    seq = count(last - len(changes) + 1)
+
+    updated, tombstones = [], []
+    for before, after in changes:
+        if after is not None:
+            updated.append(Contact(pk=after['id'], change_seq=next(seq)))
+        else:
+            tombstones.append(
+                ContactTombstone(contact_id=before['id'], hubspot_id=before['hubspot_id'], change_seq=next(seq))
+            )
+    if updated:
+        Contact.objects.bulk_update(updated, ['change_seq'], batch_size=500)
+    if tombstones:
+        ContactTombstone.objects.bulk_create(tombstones)
+
+
+@receiver(contacts_changed)
+def update_rollups(sender, changes, **kwargs):
+    rollups.apply_deltas(rollups.deltas_for(changes))
+    facets.apply_deltas(facets.deltas_for(changes))
+
+
+@receiver(contacts_changed)
+def refresh_duplicate_suggestions(sender, changes, **kwargs):
+    dedup.refresh_contacts(dedup.changed_rows(changes))
@@ -0,0 +1,62 @@
+"""
+Local-first resolution of emails and phone numbers to contacts.
+
+Lookups go to the indexed ``email_lower`` / ``phone_digits`` columns in one
+query; only emails that are not mirrored locally are looked up in HubSpot,
+through the batch endpoint. HubSpot has no batch phone lookup, so phone
+resolution is local only.
+"""
+
+from .hubspot_service import HubSpotService
+from .models import Contact
+from .normalize import normalize_phone
+
+HUBSPOT_BATCH_SIZE = 100
+
+
+def hubspot_email_vids(contacts):
+    """``{lowercased email: vid}`` from HubSpot contact profiles."""
+    vids = {}
+    for contact in contacts:
+        for profile in contact.get('identity-profiles', []):
+            for identity in profile.get('identities', []):
+                if identity.get('type') == 'EMAIL':
+                    vids[identity['value'].lower()] = str(contact['vid'])
+    return vids
+
+
+def resolve_emails(emails, remote=True):
+    """
+    Map each email to ``{"id", "hubspot_id", "source"}`` (``id`` is ``None``
+    for contacts only found in HubSpot), or ``None`` when unknown.
+    """
+    wanted = {email: email.strip().lower() for email in emails if email and email.strip()}
+    found = {
+        email_lower: {'id': pk, 'hubspot_id': hubspot_id, 'source': 'local'}
+        for pk, hubspot_id, email_lower in Contact.objects.filter(
+            email_lower__in=set(wanted.values())
+        ).values_list('id', 'hubspot_id', 'email_lower')
+    }
+
+    misses = sorted({email for email in wanted.values() if email not in found})
+    if remote:
+        for start in range(0, len(misses), HUBSPOT_BATCH_SIZE):
+            batch = misses[start:start + HUBSPOT_BATCH_SIZE]
+            contacts = (HubSpotService.get_contacts_by_emails(batch) or {}).values()
+            for email, vid in hubspot_email_vids(contacts).items():
+                if email in batch:
+                    found[email] = {'id': None, 'hubspot_id': vid, 'source': 'hubspot'}
+    return {email: found.get(email_lower) for email, email_lower in wanted.items()}
+
+
+def resolve_phones(phones):
+    """Map each phone number to the oldest local contact with the same digits, or ``None``."""
+    wanted = {phone: normalize_phone(phone) for phone in phones if phone}
+    found = {}
+    for pk, hubspot_id, digits in (
+        Contact.objects.filter(phone_digits__in={d for d in wanted.values() if d})
+        .order_by('-pk')
+        .values_list('id', 'hubspot_id', 'phone_digits')
+    ):
+        found[digits] = {'id': pk, 'hubspot_id': hubspot_id, 'source': 'local'}
+    return {phone: found.get(digits) if digits else None for phone, digits in wanted.items()}
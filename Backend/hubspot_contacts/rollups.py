@@ -0,0 +1,142 @@
+"""
+Locally materialized contact statistics.
+
+``ContactRollup`` holds one count per ``(metric, bucket)``. Every
+``contacts_changed`` batch is folded into per-bucket deltas (-1 for each
+``before`` snapshot, +1 for each ``after``) that are applied with a single
+``INSERT ... ON CONFLICT DO UPDATE SET count = count + excluded.count``, so
+the cost of keeping the rollups current is proportional to the number of
+distinct buckets a batch touches, not to the table size. ``rebuild_rollups``
+recomputes everything from ``Contact`` with ``GROUP BY`` for backfills and
+drift repair.
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Contact, ContactRollup
+
+TOTAL = 'total'
+LIFECYCLE_STAGE = 'lifecycle_stage'
+CREATED_DAY = 'created_day'
+UPDATED_DAY = 'updated_day'
+
+# Metric -> Contact field it buckets on (``None`` for the single total bucket).
+METRICS = {
+    TOTAL: None,
+    LIFECYCLE_STAGE: 'lifecyclestage',
+    CREATED_DAY: 'added_at',
+    UPDATED_DAY: 'lastmodifieddate',
+}
+
+
+# Rows per upsert statement, well under SQLite's bound-parameter limit.
+UPSERT_BATCH_SIZE = 300
+
+
+def _bucket(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        # Sync snapshots can carry the raw datetime HubSpot sent for a DateField.
+        value = value.date()
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def buckets_for(snapshot):
+    return [
+        (metric, '' if field is None else _bucket(snapshot.get(field)))
+        for metric, field in METRICS.items()
+    ]
+
+
+def deltas_for(changes):
+    """Net count change per ``(metric, bucket)`` for a ``contacts_changed`` batch."""
+    deltas = Counter()
+    for before, after in changes:
+        if before is not None:
+            deltas.subtract(buckets_for(before))
+        if after is not None:
+            deltas.update(buckets_for(after))
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def upsert_increments(model, key_fields, deltas):
+    """
+    Add ``deltas`` (``{key tuple: delta}``) to ``model.count``, creating rows
+    for missing keys. ``key_fields`` must be covered by a unique constraint.
+    """
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ', '.join(quote(name) for name in (*key_fields, 'count'))
+    conflict = ', '.join(quote(name) for name in key_fields)
+    placeholder = '(%s)' % ', '.join(['%s'] * (len(key_fields) + 1))
+    items = list(deltas.items())
+    with connection.cursor() as cursor:
+        for start in range(0, len(items), UPSERT_BATCH_SIZE):
+            batch = items[start:start + UPSERT_BATCH_SIZE]
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {", ".join([placeholder] * len(batch))} '
+                f'ON CONFLICT ({conflict}) DO UPDATE SET count = {table}.count + excluded.count',
+                [value for key, delta in batch for value in (*key, delta)],
+            )
+
+
+def apply_deltas(deltas):
+    """Add ``deltas`` to the stored counts, creating missing buckets."""
+    upsert_increments(ContactRollup, ('metric', 'bucket'), deltas)
+
+
+def rebuild_rollups():
+    """Recompute every rollup from the contact table."""
+    rollups = [ContactRollup(metric=TOTAL, bucket='', count=Contact.objects.count())]
+    for metric, field in METRICS.items():
+        if field is None:
+            continue
+        counts = Contact.objects.order_by().values_list(field).annotate(n=Count('pk'))
+        merged = Counter()
+        for value, n in counts:
+            merged[_bucket(value)] += n
+        rollups.extend(ContactRollup(metric=metric, bucket=bucket, count=n) for bucket, n in merged.items())
+
+    with transaction.atomic():
+        ContactRollup.objects.all().delete()
+        ContactRollup.objects.bulk_create(rollups, batch_size=500)
+    return len(rollups)
+
+
+def total_contacts():
+    """Mirrored contact count in one indexed lookup, or ``None`` before the first rebuild."""
+    return ContactRollup.objects.filter(metric=TOTAL, bucket='').values_list('count', flat=True).first()
+
+
+def _counts(metric, since=None):
+    rows = ContactRollup.objects.filter(metric=metric, count__gt=0)
+    if since is not None:
+        rows = rows.filter(bucket__gte=since.isoformat())
+    return dict(rows.order_by('bucket').values_list('bucket', 'count'))
+
+
+def lifecycle_metrics():
+    stages = _counts(LIFECYCLE_STAGE)
+    return {
+        'source': 'local',
+        'total': sum(stages.values()),
+        'stages': {stage or 'unknown': count for stage, count in stages.items()},
+    }
+
+
+def contact_statistics(days=30):
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return {
+        'source': 'local',
+        'total': _counts(TOTAL).get('', 0),
+        'days': days,
+        'created_per_day': _counts(CREATED_DAY, since),
+        'updated_per_day': _counts(UPDATED_DAY, since),
+    }
@@ -1,7 +1,141 @@
-from rest_framework import serializers
-from .models import Contact
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from django.utils import timezone
+from .models import Contact, ContactImportJob, DuplicateSuggestion, SyncJob
 
 class ContactSerializer(serializers.ModelSerializer):
+    """Pass ``fields=[...]`` to return only a subset of the declared fields."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Contact
-        fields = ['first_name', 'last_name', 'company', 'website', 'phone', 'address', 'state', 'zip', 'email','added_at' , 'lastmodifieddate']
+        fields = ['first_name', 'last_name', 'company', 'website', 'phone', 'address', 'state', 'zip', 'email','added_at' , 'lastmodifieddate', 'lifecyclestage']
+
+
+
+class ContactImportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ContactImportJob
+        fields = ['id', 'status', 'total_rows', 'processed_rows', 'progress', 'created_count',
+                  'duplicate_count', 'failed_count', 'pending_count', 'errors', 'message',
+                  'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+    def get_progress(self, job):
+        if job.status == ContactImportJob.COMPLETED:
+            return 1.0
+        if not job.total_rows:
+            return 0.0
+        return round(min(job.processed_rows / job.total_rows, 1.0), 4)
+
+
+class SyncJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+    duration = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SyncJob
+        fields = ['id', 'kind', 'status', 'fields', 'triggered_by', 'expected_contacts', 'pages', 'fetched',
+                  'progress', 'created_count', 'updated_count', 'skipped_count', 'message',
+                  'started_at', 'heartbeat_at', 'finished_at', 'lease_expires_at', 'duration']
+        read_only_fields = fields
+
+    def get_progress(self, job):
+        if job.status == SyncJob.COMPLETED:
+            return 1.0
+        if not job.expected_contacts:
+            return None
+        return round(min(job.fetched / job.expected_contacts, 1.0), 4)
+
+    def get_duration(self, job):
+        """Seconds run so far, or in total once finished."""
+        return round(((job.finished_at or timezone.now()) - job.started_at).total_seconds(), 3)
+
+
+class DuplicateSuggestionSerializer(serializers.ModelSerializer):
+    contact_a = ContactSerializer(read_only=True)
+    contact_b = ContactSerializer(read_only=True)
+
+    class Meta:
+        model = DuplicateSuggestion
+        fields = ['id', 'contact_a_id', 'contact_a', 'contact_b_id', 'contact_b', 'score', 'reasons',
+                  'status', 'created_at', 'updated_at']
+        read_only_fields = ['contact_a_id', 'contact_b_id', 'score', 'reasons', 'created_at', 'updated_at']
+
+
+def _field_converter(field):
+    """Cheapest callable that matches ``field.to_representation`` for DB values."""
+    if type(field) in (serializers.CharField, serializers.EmailField):
+        # Values read back from a CharField column are already str.
+        return None
+    if type(field) is serializers.DateField:
+        output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+        if output_format and output_format.lower() == ISO_8601:
+            return lambda value: value.isoformat()
+    return field.to_representation
+
+
+class ContactRowSerializer:
+    """
+    Read-only fast path for listing contacts.
+
+    Produces the same dicts as ``ContactSerializer(many=True).data``, but from
+    ``values_list()`` tuples with one precomputed converter per field instead
+    of model instances and the DRF field machinery.
+    """
+
+    def __init__(self, fields=None, serializer_class=ContactSerializer):
+        declared = serializer_class().fields
+        if fields is not None:
+            unknown = set(fields) - set(declared)
+            if unknown:
+                raise serializers.ValidationError(
+                    {"fields": f"Unknown field(s): {', '.join(sorted(unknown))}"}
+                )
+            declared = {name: field for name, field in declared.items() if name in fields}
+        self.names = list(declared)
+        self.sources = [field.source for field in declared.values()]
+        self.converters = [
+            (index, converter)
+            for index, converter in enumerate(_field_converter(field) for field in declared.values())
+            if converter is not None
+        ]
+
+    def to_values(self, row):
+        row = list(row)
+        for index, converter in self.converters:
+            value = row[index]
+            if value is not None:
+                row[index] = converter(value)
+        return row
+
+    def to_representation(self, row):
+        if self.converters:
+            row = self.to_values(row)
+        return dict(zip(self.names, row))
+
+    def iter_values(self, queryset, chunk_size=None):
+        rows = queryset.values_list(*self.sources)
+        if chunk_size:
+            rows = rows.iterator(chunk_size=chunk_size)
+        to_values = self.to_values
+        for row in rows:
+            yield to_values(row)
+
+    def iter_rows(self, queryset, chunk_size=None):
+        rows = queryset.values_list(*self.sources)
+        if chunk_size:
+            rows = rows.iterator(chunk_size=chunk_size)
+        to_representation = self.to_representation
+        for row in rows:
+            yield to_representation(row)
+
+    def serialize(self, queryset):
+        return list(self.iter_rows(queryset))
@@ -0,0 +1,30 @@
+"""
+``contacts_changed`` is sent inside the writing transaction whenever Contact
+rows are created, updated or deleted, whether by the HubSpot sync (one signal
+per batch) or by the API views (one per request).
+
+Receivers get ``changes``: a list of ``(before, after)`` snapshot pairs, where
+``before`` is ``None`` for a created contact and ``after`` is ``None`` for a
+deleted one. Snapshots are plain dicts of ``SNAPSHOT_FIELDS``, never model
+instances, so bulk writers can build them from ``values()`` rows.
+"""
+
+from django.dispatch import Signal
+
+from .models import Contact
+
+contacts_changed = Signal()
+
+SNAPSHOT_FIELDS = [
+    'id', 'hubspot_id', 'first_name', 'last_name', 'company', 'website', 'phone',
+    'address', 'state', 'zip', 'email', 'added_at', 'lastmodifieddate', 'lifecyclestage',
+]
+
+
+def contact_snapshot(contact):
+    return {name: getattr(contact, name) for name in SNAPSHOT_FIELDS}
+
+
+def send_contacts_changed(changes):
+    if changes:
+        contacts_changed.send(sender=Contact, changes=changes)
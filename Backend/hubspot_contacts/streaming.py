@@ -0,0 +1,121 @@
+"""
+Incremental decoding of HubSpot contact list pages.
+
+A page of ``/lists/all/contacts/all`` carries every property of every
+contact, each with its full version history, and ``response.json()`` turns
+all of it into Python objects before the sync reads a handful of values.
+``decode_contact_page`` walks the body as a stream of JSON events instead
+and builds slim contacts holding only what ``contact_defaults`` reads:
+
+    {"vid": 1, "addedAt": ..., "properties": {"firstname": {"value": "Ada"}},
+     "identity-profiles": [{"identities": [{"type": "EMAIL", "value": ...}]}]}
+
+With the optional ``ijson`` package, memory stays bounded by the chunk size
+plus the slim contacts of one page, however long the version histories are.
+Without it, the body is read whole and parsed with orjson, then slimmed, so
+only the retained page shrinks, not the peak.
+"""
+
+from ContactHub import fast_json
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover - optional dependency
+    ijson = None
+
+# Also the ijson read size. The C backend decodes a whole buffer into events
+# at a time, so larger chunks raise peak memory roughly in proportion.
+CHUNK_SIZE = 8 * 1024
+
+_CONTACT = 'contacts.item'
+_PROPERTY = 'contacts.item.properties.'
+_PROFILE = 'contacts.item.identity-profiles.item'
+_IDENTITY = 'contacts.item.identity-profiles.item.identities.item'
+
+
+class _ChunkReader:
+    """File-like ``read()`` over an iterator of byte chunks, for ijson."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def slim_contact(contact, keep=None):
+    """``contact`` reduced to the fields ``decode_contact_page`` keeps."""
+    properties = contact.get('properties') or {}
+    profiles = contact.get('identity-profiles') or []
+    slim = {
+        'vid': contact.get('vid'),
+        'properties': {
+            name: {'value': value['value']}
+            for name, value in properties.items()
+            if (keep is None or name in keep) and isinstance(value, dict) and 'value' in value
+        },
+        'identity-profiles': [
+            {'identities': [
+                {'type': 'EMAIL', 'value': identity['value']}
+                for identity in profiles[0].get('identities', []) if identity.get('type') == 'EMAIL'
+            ][:1]}
+        ] if profiles else [],
+    }
+    if 'addedAt' in contact:
+        slim['addedAt'] = contact['addedAt']
+    return slim
+
+
+def _decode_events(events, keep):
+    page = {'contacts': []}
+    contact = profiles = identity = None
+    for prefix, event, value in events:
+        if event == 'map_key':
+            continue
+        if prefix.startswith(_PROPERTY):
+            name, _, rest = prefix[len(_PROPERTY):].partition('.')
+            if rest == 'value' and (keep is None or name in keep):
+                contact['properties'][name] = {'value': value}
+        elif prefix == _CONTACT:
+            if event == 'start_map':
+                contact, profiles = {'properties': {}}, 0
+            elif event == 'end_map':
+                emails = [contact.pop('email')] if 'email' in contact else []
+                contact['identity-profiles'] = [{'identities': emails}] if profiles else []
+                page['contacts'].append(contact)
+        elif prefix == _IDENTITY and profiles == 1:
+            if event == 'start_map':
+                identity = {}
+            elif event == 'end_map' and identity.get('type') == 'EMAIL' and 'email' not in contact:
+                contact['email'] = {'type': 'EMAIL', 'value': identity.get('value')}
+        elif prefix.startswith(_IDENTITY) and profiles == 1 and event not in ('start_map', 'end_map'):
+            identity[prefix[len(_IDENTITY) + 1:]] = value
+        elif prefix == _PROFILE and event == 'start_map':
+            profiles += 1
+        elif prefix in ('contacts.item.vid', 'contacts.item.addedAt'):
+            contact[prefix[len(_CONTACT) + 1:]] = value
+        elif prefix in ('has-more', 'vid-offset'):
+            page[prefix] = value
+    return page
+
+
+def decode_contact_page(chunks, keep=None):
+    """
+    Decode a contact list page from an iterable of byte chunks. Contacts keep
+    only the current values of the ``keep`` properties (all properties when
+    ``None``), their vid, ``addedAt`` and first identity profile's email.
+    """
+    if ijson is None:
+        page = fast_json.loads(b''.join(chunks))
+        page['contacts'] = [slim_contact(contact, keep) for contact in page.get('contacts', [])]
+        return page
+    return _decode_events(ijson.parse(_ChunkReader(chunks), buf_size=CHUNK_SIZE), keep)
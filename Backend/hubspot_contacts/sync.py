@@ -0,0 +1,400 @@
+"""
+Synchronisation of HubSpot contacts into the local ``Contact`` table.
+
+``sync_contacts`` follows the HubSpot offset cursor one page at a time and
+can continue from a saved cursor.
+``sync_contacts_concurrently`` pipelines the same work: a producer walks the
+cursor asking only for vids, a bounded pool fetches the full profiles with
+``get_contacts_by_vids`` in parallel, and a single writer thread applies the
+batches to the database as they arrive through a bounded queue. Batches
+arrive out of cursor order, so the writer checkpoints the cursor of the last
+page before which every page has been written.
+
+``reconcile_deletions`` removes local contacts that no longer exist in
+HubSpot. Both sides are compared as bare integer ids, so it never loads full
+contact objects.
+"""
+
+import bisect
+import hashlib
+from array import array
+import json
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.db.models import Max
+
+from ContactHub.db_routers import primary_only
+from .hubspot_service import HubSpotService
+from .models import Contact
+from .signals import SNAPSHOT_FIELDS, contact_snapshot, send_contacts_changed
+
+DEFAULT_CONCURRENCY = int(os.getenv("HUBSPOT_SYNC_CONCURRENCY", 4))
+
+# Local field -> HubSpot contact property.
+HUBSPOT_PROPERTIES = {
+    'first_name': 'firstname',
+    'last_name': 'lastname',
+    'company': 'company',
+    'website': 'website',
+    'phone': 'phone',
+    'address': 'address',
+    'state': 'state',
+    'zip': 'zip',
+    'lifecyclestage': 'lifecyclestage',
+}
+
+# Every property contact_defaults() reads; the rest of a page is not decoded.
+MAPPED_PROPERTIES = frozenset([*HUBSPOT_PROPERTIES.values(), 'lastmodifieddate', 'createdate'])
+
+SYNCED_FIELDS = [*HUBSPOT_PROPERTIES, 'email', 'added_at', 'lastmodifieddate']
+UPDATE_FIELDS = [*SYNCED_FIELDS, 'sync_hash', *Contact.NORMALIZED_FIELDS]
+LASTMODIFIED_FIELD = Contact._meta.get_field('lastmodifieddate')
+
+
+def _timestamp_to_datetime(value):
+    return datetime.fromtimestamp(int(value) / 1000) if value else None
+
+
+def hubspot_properties_for(fields):
+    """HubSpot properties needed to fill ``fields``; ``None`` means all of them."""
+    if fields is None:
+        return None
+    properties = [HUBSPOT_PROPERTIES[field] for field in fields if field in HUBSPOT_PROPERTIES]
+    if 'lastmodifieddate' in fields or not properties:
+        # HubSpot returns every property when none is named.
+        properties.append('lastmodifieddate')
+    return properties
+
+
+def partial_fields(fields):
+    """The synced subset of ``fields``, or ``None`` when that is every synced field."""
+    if fields is None:
+        return None
+    synced = [field for field in SYNCED_FIELDS if field in fields]
+    return None if len(synced) == len(SYNCED_FIELDS) else synced
+
+
+def contact_defaults(contact, fields=None):
+    """
+    Map a HubSpot contact (list entry or batch profile) to ``Contact`` field
+    values, restricted to ``fields`` when given. Returns
+    ``(hubspot_id, defaults)``, or ``None`` for contacts without an identity
+    profile.
+    """
+    identity_profiles = contact.get('identity-profiles') or []
+    if not identity_profiles:
+        return None
+
+    properties = contact.get('properties', {})
+    email = next(
+        (identity['value'] for identity in identity_profiles[0]['identities'] if identity['type'] == 'EMAIL'),
+        None,
+    )
+    added_at = contact.get('addedAt') or properties.get('createdate', {}).get('value')
+
+    defaults = {
+        field: properties.get(name, {}).get('value', '')
+        for field, name in HUBSPOT_PROPERTIES.items()
+    }
+    defaults['email'] = email
+    defaults['added_at'] = _timestamp_to_datetime(added_at)
+    defaults['lastmodifieddate'] = _timestamp_to_datetime(properties.get('lastmodifieddate', {}).get('value'))
+    if fields is not None:
+        defaults = {field: defaults[field] for field in fields}
+    return str(contact['vid']), defaults
+
+
+def contact_hash(defaults):
+    """Compact, order-independent digest of the synced property values."""
+    payload = json.dumps(defaults, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+def new_stats():
+    return {'pages': 0, 'fetched': 0, 'created': 0, 'updated': 0, 'skipped': 0}
+
+
+def finish_stats(stats):
+    written = stats['created'] + stats['updated'] + stats['skipped']
+    stats['skip_ratio'] = round(stats['skipped'] / written, 4) if written else 0.0
+    return stats
+
+
+@primary_only
+def save_contacts(contacts, fields=None):
+    """
+    Write a batch of HubSpot contacts in a single transaction.
+
+    The stored hashes for the whole batch are read in one query; contacts
+    whose hash is unchanged are skipped, the rest are bulk created or updated.
+    A partial sync (``fields`` naming only some synced fields) compares and
+    writes just those columns, and clears the hash so the next full sync
+    rewrites the row.
+    """
+    fields = partial_fields(fields)
+    incoming = {}
+    for contact in contacts:
+        mapped = contact_defaults(contact, fields)
+        if mapped is not None:
+            hubspot_id, defaults = mapped
+            defaults['sync_hash'] = contact_hash(defaults) if fields is None else ''
+            incoming[hubspot_id] = defaults
+
+    counts = {'created': 0, 'updated': 0, 'skipped': 0}
+    if not incoming:
+        return counts
+
+    compared = ['sync_hash'] if fields is None else fields
+    update_fields = UPDATE_FIELDS if fields is None else [
+        *fields, *(name for name in ('lastmodifieddate', 'sync_hash') if name not in fields),
+        *Contact.NORMALIZED_FIELDS,
+    ]
+    to_python = {name: Contact._meta.get_field(name).to_python for name in compared}
+
+    with transaction.atomic():
+        existing = {
+            row['hubspot_id']: row
+            for row in Contact.objects.filter(
+                hubspot_id__in=incoming
+            ).values(*SNAPSHOT_FIELDS, 'sync_hash')
+        }
+
+        to_create, to_update, changes = [], [], []
+        for hubspot_id, defaults in incoming.items():
+            stored = existing.get(hubspot_id)
+            if stored is None:
+                contact = Contact(hubspot_id=hubspot_id, **defaults)
+                contact.set_normalized_fields()
+                to_create.append(contact)
+                continue
+            if all(stored[name] == to_python[name](defaults[name]) for name in compared):
+                counts['skipped'] += 1
+                continue
+            before = {name: stored[name] for name in SNAPSHOT_FIELDS}
+            contact = Contact(**(before | defaults))
+            # bulk_update() bypasses save(), so apply auto_now ourselves.
+            LASTMODIFIED_FIELD.pre_save(contact, add=False)
+            contact.set_normalized_fields()
+            to_update.append(contact)
+            changes.append((before, contact_snapshot(contact)))
+
+        Contact.objects.bulk_create(to_create)
+        Contact.objects.bulk_update(to_update, update_fields)
+        changes.extend((None, contact_snapshot(contact)) for contact in to_create)
+        send_contacts_changed(changes)
+
+    counts['created'] = len(to_create)
+    counts['updated'] = len(to_update)
+    return counts
+
+
+def sync_contacts(fields=None, on_page=None, vid_offset=None, stats=None):
+    """
+    Serially sync every HubSpot contact, one page per transaction. ``fields``
+    limits both the HubSpot properties requested and the columns written.
+
+    ``on_page(stats, cursor)`` runs inside each page's transaction, so a
+    checkpoint it records commits together with the page. ``cursor`` is the
+    vid-offset of the next page, or ``None`` after the last one. Pass a saved
+    cursor as ``vid_offset`` (and its ``stats``) to continue from there.
+    """
+    stats = new_stats() | (stats or {})
+    properties = hubspot_properties_for(partial_fields(fields))
+    pages = HubSpotService.iter_contact_pages(vid_offset=vid_offset, properties=properties, keep=MAPPED_PROPERTIES)
+    for page in pages:
+        contacts = page.get('contacts', [])
+        with transaction.atomic():
+            counts = save_contacts(contacts, fields)
+            page_stats = dict(stats, pages=stats['pages'] + 1, fetched=stats['fetched'] + len(contacts))
+            for key, value in counts.items():
+                page_stats[key] += value
+            if on_page is not None:
+                on_page(page_stats, page.get('vid-offset') if page.get('has-more') else None)
+        # Count the page only once it (and its checkpoint) committed.
+        stats = page_stats
+    return finish_stats(stats)
+
+
+class _Pipeline:
+    """State shared between the producer, the fetch pool and the writer."""
+
+    _DONE = object()
+
+    def __init__(self, concurrency, queue_size, fields=None, on_page=None):
+        self.fields = fields
+        self.on_page = on_page
+        self.properties = hubspot_properties_for(partial_fields(fields))
+        self.slots = threading.BoundedSemaphore(concurrency * 2)
+        self.batches = queue.Queue(maxsize=queue_size)
+        self.failed = threading.Event()
+        self.errors = []
+        self.stats = new_stats()
+        # Pages written ahead of the first unwritten one: seq -> (cursor, stats delta).
+        self.written = {}
+        self.next_seq = 0
+
+    def fail(self, exc):
+        self.errors.append(exc)
+        self.failed.set()
+
+    def fetch(self, seq, cursor, vids):
+        """Fetch full profiles for one page of vids and hand them to the writer."""
+        try:
+            if not self.failed.is_set():
+                profiles = HubSpotService.get_contacts_by_vids(vids, self.properties) or {}
+                self.put((seq, cursor, list(profiles.values())))
+        except Exception as exc:
+            self.fail(exc)
+        finally:
+            self.slots.release()
+
+    def put(self, item):
+        while not self.failed.is_set():
+            try:
+                self.batches.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def write(self):
+        try:
+            while True:
+                item = self.batches.get()
+                if item is self._DONE:
+                    return
+                if self.failed.is_set():
+                    continue
+                self.write_page(*item)
+        except Exception as exc:
+            self.fail(exc)
+            # Keep draining so fetch workers blocked on put() can exit.
+            while self.batches.get() is not self._DONE:
+                pass
+        finally:
+            connection.close()
+
+    def write_page(self, seq, cursor, batch):
+        """
+        Save one page and, in the same transaction, report the stats and
+        cursor of the contiguous run of written pages. ``on_page`` gets
+        ``None`` as the cursor when this page did not extend that run.
+        """
+        with transaction.atomic():
+            delta = dict(save_contacts(batch, self.fields), pages=1, fetched=len(batch))
+            written = self.written | {seq: (cursor, delta)}
+            stats, next_seq, checkpoint = dict(self.stats), self.next_seq, None
+            while next_seq in written:
+                checkpoint, delta = written.pop(next_seq)
+                for key, value in delta.items():
+                    stats[key] += value
+                next_seq += 1
+            if self.on_page is not None:
+                self.on_page(stats, checkpoint)
+        # Advance only once the page (and its checkpoint) committed.
+        self.stats, self.next_seq, self.written = stats, next_seq, written
+
+
+def sync_contacts_concurrently(concurrency=DEFAULT_CONCURRENCY, queue_size=None, fields=None, on_page=None):
+    """
+    Sync every HubSpot contact with ``concurrency`` parallel profile fetches.
+    ``on_page(stats, cursor)`` is called from the writer thread inside each
+    page's transaction, like ``sync_contacts`` does, except that ``stats`` and
+    ``cursor`` only cover the pages written without a gap from the start.
+
+    All requests go through ``HubSpotService``'s shared rate limiter, so the
+    pool never exceeds the portal's request budget however large it is.
+    """
+    pipeline = _Pipeline(concurrency, queue_size or concurrency * 2, fields, on_page)
+    writer = threading.Thread(target=pipeline.write, name='contact-sync-writer')
+    writer.start()
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='contact-sync-fetch') as pool:
+            # Only vids are needed to drive the fetch pool.
+            pages = HubSpotService.iter_contact_pages(properties=['lastmodifieddate'], keep=())
+            for seq, page in enumerate(pages):
+                vids = [contact['vid'] for contact in page.get('contacts', [])]
+                cursor = page.get('vid-offset') if page.get('has-more') else None
+                if not vids:
+                    # Nothing to fetch, but the writer still has to count the page.
+                    pipeline.put((seq, cursor, []))
+                    continue
+                while not pipeline.slots.acquire(timeout=0.5):
+                    if pipeline.failed.is_set():
+                        break
+                if pipeline.failed.is_set():
+                    break
+                pool.submit(pipeline.fetch, seq, cursor, vids)
+    except Exception as exc:
+        pipeline.fail(exc)
+    finally:
+        pipeline.batches.put(_Pipeline._DONE)
+        writer.join()
+
+    if pipeline.errors:
+        raise pipeline.errors[0]
+    return finish_stats(pipeline.stats)
+
+
+def _fetch_remote_vids():
+    """Collect every HubSpot vid into a sorted array of 64-bit ints."""
+    vids = array('q')
+    ordered = True
+    for vid in HubSpotService.iter_contact_vids():
+        if vids and vid < vids[-1]:
+            ordered = False
+        vids.append(vid)
+    if not ordered:
+        vids = array('q', sorted(vids))
+    return vids
+
+
+def _contains(sorted_ids, value):
+    index = bisect.bisect_left(sorted_ids, value)
+    return index < len(sorted_ids) and sorted_ids[index] == value
+
+
+@primary_only
+def reconcile_deletions(chunk_size=1000, dry_run=False):
+    """
+    Delete local contacts whose ``hubspot_id`` is no longer in HubSpot.
+
+    HubSpot vids are held in a sorted ``array`` (8 bytes per id) and local ids
+    are streamed with ``iterator()`` and checked by binary search. Orphans are
+    deleted in ``chunk_size`` transactions. Rows created after the HubSpot
+    scan started are left alone, as are rows without a numeric HubSpot id.
+    """
+    max_pk = Contact.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+    remote = _fetch_remote_vids()
+    stats = {'remote': len(remote), 'local': 0, 'orphaned': 0, 'deleted': 0}
+
+    if not remote:
+        # An empty portal is far more likely a bad key or an outage than a
+        # real mass deletion; refuse to wipe the table.
+        return stats
+
+    orphans = array('q')
+    local = Contact.objects.filter(pk__lte=max_pk).order_by().values_list('pk', 'hubspot_id')
+    for pk, hubspot_id in local.iterator(chunk_size=chunk_size):
+        stats['local'] += 1
+        if hubspot_id.isdigit() and not _contains(remote, int(hubspot_id)):
+            orphans.append(pk)
+    stats['orphaned'] = len(orphans)
+
+    if dry_run:
+        return stats
+
+    for start in range(0, len(orphans), chunk_size):
+        with transaction.atomic():
+            chunk = Contact.objects.filter(pk__in=orphans[start:start + chunk_size].tolist())
+            before = list(chunk.values(*SNAPSHOT_FIELDS))
+            # The total also counts cascaded rows (blocking keys, suggestions).
+            _, deleted = chunk.delete()
+            send_contacts_changed([(row, None) for row in before])
+        stats['deleted'] += deleted.get(Contact._meta.label, 0)
+    return stats
@@ -0,0 +1,234 @@
+"""
+Registry of HubSpot sync runs, with a lease lock shared by every worker.
+
+Each run is a ``SyncJob`` row, and a partial unique index allows only one
+``running`` row per kind. Starting a sync is therefore an INSERT that either
+takes the lock or fails with ``IntegrityError``. No worker or cache needs to
+agree on anything beyond the database.
+
+The holder renews its lease after every page, using an UPDATE filtered on
+its token. A worker that dies stops renewing. The next caller marks its job
+failed and takes over. A holder whose lease was taken over gets
+``SyncLeaseLost`` on its next renewal and stops writing.
+
+Syncs also checkpoint the HubSpot vid-offset and the counters on that
+renewal, in the page's own transaction. A concurrent sync writes pages out of
+order, so it checkpoints the last page with no unwritten page before it.
+After a crash or deploy, ``resume()`` reopens the failed job and
+``execute()`` continues it serially from that checkpoint. Replaying a page is
+harmless because ``save_contacts`` matches on ``hubspot_id`` and skips
+unchanged hashes.
+
+Callers that lose the race attach to the running job instead of starting a
+second sync. They wait up to ``SYNC_ATTACH_TIMEOUT`` seconds for it to finish
+and then read what it wrote. ``SYNC_FRESH_SECONDS`` lets a sync that completed
+that recently stand in for a new one.
+"""
+
+import os
+import secrets
+import time
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from ContactHub.db_routers import primary_only
+from .models import SyncJob
+from .rollups import total_contacts
+from .sync import partial_fields, sync_contacts, sync_contacts_concurrently
+
+LEASE_SECONDS = int(os.getenv('SYNC_LEASE_SECONDS', 120))
+ATTACH_TIMEOUT = float(os.getenv('SYNC_ATTACH_TIMEOUT', 30))
+FRESH_SECONDS = int(os.getenv('SYNC_FRESH_SECONDS', 0))
+POLL_INTERVAL = 0.5
+
+
+class SyncLeaseLost(Exception):
+    """The job's lease expired and another worker took over."""
+
+
+def running(kind=SyncJob.CONTACTS):
+    return SyncJob.objects.filter(kind=kind, status=SyncJob.RUNNING).first()
+
+
+def latest(kind=SyncJob.CONTACTS):
+    return SyncJob.objects.filter(kind=kind).order_by('-started_at', '-pk').first()
+
+
+def _expire_leases(kind, now):
+    SyncJob.objects.filter(kind=kind, status=SyncJob.RUNNING, lease_expires_at__lt=now).update(
+        status=SyncJob.FAILED, finished_at=now, message='Lease expired; the worker stopped renewing it.',
+    )
+
+
+@primary_only
+def acquire(kind=SyncJob.CONTACTS, fields=None, triggered_by=''):
+    """Start a job holding the lease, or return ``None`` if one is already running."""
+    now = timezone.now()
+    _expire_leases(kind, now)
+    try:
+        with transaction.atomic():
+            return SyncJob.objects.create(
+                kind=kind,
+                owner=secrets.token_hex(16),
+                lease_expires_at=now + timedelta(seconds=LEASE_SECONDS),
+                fields=fields,
+                triggered_by=triggered_by[:255],
+                expected_contacts=total_contacts() or 0,
+            )
+    except IntegrityError:
+        return None
+
+
+@primary_only
+def resume(kind=SyncJob.CONTACTS, triggered_by=''):
+    """
+    Take over the most recent job if it failed part-way, and return it ready
+    for ``execute()`` to continue from its checkpoint. Returns ``None`` when
+    there is nothing to resume or another job holds the lock.
+    """
+    now = timezone.now()
+    _expire_leases(kind, now)
+    job = latest(kind)
+    if job is None or job.status != SyncJob.FAILED or job.cursor is None:
+        return None
+    owner = secrets.token_hex(16)
+    try:
+        with transaction.atomic():
+            taken = SyncJob.objects.filter(pk=job.pk, status=SyncJob.FAILED).update(
+                status=SyncJob.RUNNING, owner=owner, lease_expires_at=now + timedelta(seconds=LEASE_SECONDS),
+                finished_at=None, message=f'Resumed by {triggered_by}' if triggered_by else 'Resumed',
+            )
+    except IntegrityError:
+        return None
+    if not taken:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def _progress(stats):
+    return {
+        'pages': stats['pages'],
+        'fetched': stats['fetched'],
+        'created_count': stats['created'],
+        'updated_count': stats['updated'],
+        'skipped_count': stats['skipped'],
+    }
+
+
+@primary_only
+def heartbeat(job, stats=None, cursor=None):
+    """
+    Record progress (sync ``stats``, if given), checkpoint ``cursor`` if
+    given, and renew the lease. Raises ``SyncLeaseLost`` if the lease is gone,
+    which also rolls back the page being committed with it.
+    """
+    now = timezone.now()
+    values = _progress(stats) if stats is not None else {}
+    if cursor is not None:
+        values['cursor'] = cursor
+    renewed = SyncJob.objects.filter(pk=job.pk, owner=job.owner, status=SyncJob.RUNNING).update(
+        lease_expires_at=now + timedelta(seconds=LEASE_SECONDS), heartbeat_at=now, **values,
+    )
+    if not renewed:
+        raise SyncLeaseLost(f"Sync job {job.pk} lost its lease")
+
+
+@primary_only
+def release(job, status, stats=None, message=''):
+    """Finish the job and free the lock for the next sync."""
+    values = {'status': status, 'finished_at': timezone.now(), 'message': message}
+    if stats is not None:
+        values.update(_progress(stats))
+    if status == SyncJob.COMPLETED:
+        values['cursor'] = None
+    SyncJob.objects.filter(pk=job.pk, owner=job.owner, status=SyncJob.RUNNING).update(**values)
+    job.refresh_from_db()
+
+
+def execute(job, concurrency=1):
+    """
+    Run the sync for a job this worker holds, then release it. A job with a
+    checkpoint continues serially from it, keeping its counters.
+    """
+    def on_page(stats, cursor):
+        heartbeat(job, stats, cursor)
+
+    try:
+        if job.cursor is not None:
+            checkpoint = {
+                'pages': job.pages, 'fetched': job.fetched, 'created': job.created_count,
+                'updated': job.updated_count, 'skipped': job.skipped_count,
+            }
+            stats = sync_contacts(fields=job.fields, on_page=on_page, vid_offset=job.cursor, stats=checkpoint)
+        elif concurrency > 1:
+            stats = sync_contacts_concurrently(concurrency=concurrency, fields=job.fields, on_page=on_page)
+        else:
+            stats = sync_contacts(fields=job.fields, on_page=on_page)
+    except Exception as exc:
+        release(job, SyncJob.FAILED, message=str(exc) or type(exc).__name__)
+        raise
+    release(job, SyncJob.COMPLETED, stats)
+    return job
+
+
+@primary_only
+def attach(job, timeout=ATTACH_TIMEOUT):
+    """Wait up to ``timeout`` seconds for a running job to finish; returns it refreshed."""
+    deadline = time.monotonic() + timeout
+    while job.status == SyncJob.RUNNING and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        job.refresh_from_db()
+    return job
+
+
+def _fresh(kind, fields):
+    if FRESH_SECONDS <= 0:
+        return None
+    since = timezone.now() - timedelta(seconds=FRESH_SECONDS)
+    job = SyncJob.objects.filter(kind=kind, status=SyncJob.COMPLETED, finished_at__gte=since).order_by('-finished_at').first()
+    # A full sync covers any field subset; a partial one only the same subset.
+    if job is not None and job.fields in (None, fields):
+        return job
+    return None
+
+
+@primary_only
+def claim(fields=None, triggered_by='', kind=SyncJob.CONTACTS):
+    """
+    ``sync_once`` without the waiting, for callers that run the sync in the
+    background. Returns ``(job, True)`` when a new job was acquired for the
+    caller to ``execute()``. Otherwise returns the fresh or running job, or
+    the latest one, with ``False``.
+    """
+    fields = partial_fields(fields)
+    job = _fresh(kind, fields)
+    if job is not None:
+        return job, False
+    job = acquire(kind, fields, triggered_by)
+    if job is not None:
+        return job, True
+    return running(kind) or latest(kind), False
+
+
+@primary_only
+def sync_once(fields=None, triggered_by='', concurrency=1, kind=SyncJob.CONTACTS):
+    """
+    Sync unless another worker already is: run a new job under the lease, or
+    attach to the running one (or reuse a fresh result) and return that.
+    """
+    fields = partial_fields(fields)
+    job = _fresh(kind, fields)
+    if job is not None:
+        return job
+    job = acquire(kind, fields, triggered_by)
+    if job is not None:
+        try:
+            return execute(job, concurrency)
+        except SyncLeaseLost:
+            # Another worker took over; what this one committed stays valid.
+            return job
+    current = running(kind)
+    return attach(current) if current is not None else latest(kind)
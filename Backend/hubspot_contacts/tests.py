@@ -1,3 +1,1392 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import tempfile
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ContactHub.middleware import brotli
+from ContactHub import fast_json, profiling
+from ContactHub.db_routers import PrimaryReplicaRouter, use_primary, primary_only
+from ContactHub.fast_json import ORJSONParser, ORJSONRenderer
+from ContactHub.profiling import RequestProfile
+from ContactHub.query_budget import QueryBudgetMixin
+from .events import ChangeBroadcaster, contact_events
+from .importer import run_import
+from .bulk import delete_contacts
+from .dedup import ScanAlreadyRunning, scan_duplicates
+from .facets import rebuild_facets
+from .fake_hubspot import FakeHubSpot
+from .hubspot_service import HubSpotService
+from . import streaming, sync_jobs
+from .models import (
+    Contact, ContactBlockingKey, ContactFacetCount, ContactImportJob, ContactRollup, DuplicateSuggestion, SyncJob,
+)
+from .resolver import resolve_emails
+from .normalize import name_key, normalize_email, normalize_phone, soundex
+from .rollups import rebuild_rollups
+from .serializers import ContactRowSerializer, ContactSerializer
+from .sync import (
+    MAPPED_PROPERTIES, contact_defaults, reconcile_deletions, sync_contacts, sync_contacts_concurrently,
+)
+
+# The suite runs on SQLite by default. To run it against a local Postgres
+# (with the replica alias mirrored onto the test database) use:
+#
+#   DATABASE_ENGINE=postgres DATABASE_REPLICA_HOST=localhost \
+#   DATABASE_NAME=contacthub DATABASE_USER=postgres python manage.py test
+
+
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        patcher = mock.patch("ContactHub.db_routers.replica_available", return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(self.router.db_for_read(Contact), "replica")
+
+    def test_only_contact_mirror_reads_go_to_replica(self):
+        self.assertEqual(self.router.db_for_read(get_user_model()), "default")
+        self.assertEqual(self.router.db_for_read(SyncJob), "default")
+        self.assertEqual(self.router.db_for_read(ContactRollup), "replica")
+
+    def test_writes_go_to_primary(self):
+        self.assertEqual(self.router.db_for_write(Contact), "default")
+
+    def test_use_primary_pins_reads(self):
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Contact), "default")
+        self.assertEqual(self.router.db_for_read(Contact), "replica")
+
+    def test_primary_only_decorator(self):
+        seen = primary_only(lambda: self.router.db_for_read(Contact))()
+        self.assertEqual(seen, "default")
+
+    def test_migrations_only_run_on_primary(self):
+        self.assertTrue(self.router.allow_migrate("default", "hubspot_contacts"))
+        self.assertFalse(self.router.allow_migrate("replica", "hubspot_contacts"))
+
+
+class RouterWithoutReplicaTests(TestCase):
+    def test_reads_fall_back_to_primary(self):
+        self.assertEqual(PrimaryReplicaRouter().db_for_read(Contact), "default")
+
+
+@skipUnless(connection.vendor == "sqlite", "SQLite tuning")
+class SQLitePragmaTests(SimpleTestCase):
+    def test_configured_pragmas_reach_new_connections(self):
+        # The test database is in memory, where WAL does not apply, so open
+        # the configured settings against a file instead.
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = connection.settings_dict | {"NAME": f"{directory.name}/pragmas.sqlite3"}
+        wrapper = type(connections["default"])(settings_dict, alias="pragmas")
+        self.addCleanup(wrapper.close)
+
+        with wrapper.cursor() as cursor:
+            pragmas = {}
+            for name in ("journal_mode", "busy_timeout", "synchronous"):
+                cursor.execute(f"PRAGMA {name}")
+                pragmas[name] = cursor.fetchone()[0]
+        self.assertEqual(pragmas, {
+            "journal_mode": "wal",
+            "busy_timeout": settings_dict["OPTIONS"]["timeout"] * 1000,
+            # NORMAL
+            "synchronous": 1,
+        })
+
+
+def hubspot_contact(vid, **properties):
+    properties.setdefault("firstname", f"First{vid}")
+    properties.setdefault("lastname", f"Last{vid}")
+    properties.setdefault("lastmodifieddate", "1736000000000")
+    return {
+        "vid": vid,
+        "addedAt": 1736000000000,
+        "properties": {name: {"value": value} for name, value in properties.items()},
+        "identity-profiles": [
+            {"identities": [{"type": "EMAIL", "value": f"contact{vid}@example.com"}]}
+        ],
+    }
+
+
+class FakeHubSpotPages:
+    """Serves ``total`` contacts in pages of ``page_size`` like the v1 list API."""
+
+    def __init__(self, total, page_size=10):
+        self.contacts = [hubspot_contact(vid) for vid in range(1, total + 1)]
+        self.page_size = page_size
+
+    def only(self, contacts, properties):
+        if properties is None:
+            return contacts
+        return [
+            contact | {"properties": {name: value for name, value in contact["properties"].items()
+                                      if name in properties}}
+            for contact in contacts
+        ]
+
+    def iter_contact_pages(self, vid_offset=None, count=None, properties=None, keep=None):
+        self.requested_properties = properties
+        self.requested_offsets = getattr(self, "requested_offsets", []) + [vid_offset]
+        for start in range(vid_offset or 0, len(self.contacts), self.page_size):
+            yield {
+                "contacts": self.only(self.contacts[start:start + self.page_size], properties),
+                "has-more": start + self.page_size < len(self.contacts),
+                "vid-offset": start + self.page_size,
+            }
+
+    def get_contacts_by_vids(self, vids, properties=None):
+        return {str(c["vid"]): c for c in self.only(self.contacts, properties) if c["vid"] in set(vids)}
+
+    def iter_contact_vids(self, count=None):
+        for page in self.iter_contact_pages():
+            for contact in page["contacts"]:
+                yield contact["vid"]
+
+    def patch(self, testcase):
+        for name in ("iter_contact_pages", "iter_contact_vids", "get_contacts_by_vids"):
+            patcher = mock.patch(f"hubspot_contacts.sync.HubSpotService.{name}", getattr(self, name))
+            patcher.start()
+            testcase.addCleanup(patcher.stop)
+
+
+class SyncTests(TestCase):
+    def test_serial_sync_follows_every_page(self):
+        FakeHubSpotPages(25).patch(self)
+        stats = sync_contacts()
+        self.assertEqual(stats["pages"], 3)
+        self.assertEqual(Contact.objects.count(), 25)
+        self.assertEqual(Contact.objects.get(hubspot_id="7").email, "contact7@example.com")
+
+    def test_unchanged_contacts_are_skipped(self):
+        pages = FakeHubSpotPages(20)
+        pages.patch(self)
+        sync_contacts()
+        pages.contacts[3] = hubspot_contact(4, firstname="Renamed")
+
+        with CaptureQueriesContext(connection) as queries:
+            stats = sync_contacts()
+
+        statements = [
+            query["sql"].split()[0] for query in queries.captured_queries
+            if '"hubspot_contacts_contact"' in query["sql"].split(" WHERE ")[0]
+        ]
+        # One hash lookup per page, and writes (the row, then its change_seq)
+        # only for the changed contact.
+        self.assertEqual(statements.count("SELECT"), 2)
+        self.assertEqual(statements.count("UPDATE"), 2)
+        self.assertNotIn("INSERT", statements)
+
+        self.assertEqual((stats["created"], stats["updated"], stats["skipped"]), (0, 1, 19))
+        self.assertEqual(stats["skip_ratio"], 0.95)
+        self.assertEqual(Contact.objects.get(hubspot_id="4").first_name, "Renamed")
+
+
+class StreamingDecodeTests(TestCase):
+    def page_body(self, total, history):
+        portal = FakeHubSpot(total=total, history=history)
+        return portal.request("GET", f"{HubSpotService.BASE_URL}/lists/all/contacts/all", params={"count": total})
+
+    def assert_maps_like_full_decode(self, response):
+        full = response.json()
+        slim = streaming.decode_contact_page(response.iter_content(1000), MAPPED_PROPERTIES)
+        self.assertEqual((slim["has-more"], slim["vid-offset"]), (full["has-more"], full["vid-offset"]))
+        self.assertEqual(
+            [contact_defaults(contact) for contact in slim["contacts"]],
+            [contact_defaults(contact) for contact in full["contacts"]],
+        )
+        self.assertNotIn("versions", json.dumps(slim))
+
+    @skipUnless(streaming.ijson, "ijson is not installed")
+    def test_incremental_decode_maps_like_full_decode(self):
+        self.assert_maps_like_full_decode(self.page_body(30, history=3))
+
+    def test_fallback_decode_maps_like_full_decode(self):
+        with mock.patch.object(streaming, "ijson", None):
+            self.assert_maps_like_full_decode(self.page_body(30, history=3))
+
+    def test_contacts_without_identity_profiles_are_kept_unmapped(self):
+        body = json.dumps({
+            "contacts": [
+                {"vid": 1, "properties": {"firstname": {"value": "Ada"}}, "identity-profiles": []},
+                {"vid": 2, "properties": {}, "identity-profiles": [
+                    {"identities": [{"type": "LEAD_GUID", "value": "g"}]},
+                    {"identities": [{"type": "EMAIL", "value": "second@example.com"}]},
+                ]},
+            ],
+            "has-more": False,
+            "vid-offset": 2,
+        }).encode()
+        page = streaming.decode_contact_page([body[:17], body[17:]], MAPPED_PROPERTIES)
+        self.assertIsNone(contact_defaults(page["contacts"][0]))
+        self.assertIsNone(contact_defaults(page["contacts"][1])[1]["email"])
+
+    def test_sync_streams_every_page(self):
+        portal = FakeHubSpot(total=250, history=2)
+        with portal.installed(), mock.patch.object(portal, "request", wraps=portal.request) as request:
+            stats = sync_contacts()
+        self.assertEqual((stats["pages"], stats["created"]), (3, 250))
+        self.assertTrue(all(call.kwargs.get("stream") for call in request.call_args_list))
+        self.assertEqual(Contact.objects.get(hubspot_id="7").email, "contact7@example.com")
+
+    @skipUnless(streaming.ijson, "ijson is not installed")
+    def test_peak_memory_is_an_order_of_magnitude_lower(self):
+        response = self.page_body(100, history=20)
+
+        def peak(decode):
+            tracemalloc.start()
+            try:
+                decode()
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        full = peak(lambda: fast_json.loads(b"".join(response.iter_content(streaming.CHUNK_SIZE))))
+        slim = peak(lambda: streaming.decode_contact_page(response.iter_content(streaming.CHUNK_SIZE),
+                                                          MAPPED_PROPERTIES))
+        self.assertGreater(full / slim, 10)
+
+
+class ReconcileDeletionsTests(TestCase):
+    def setUp(self):
+        self.pages = FakeHubSpotPages(30)
+        self.pages.patch(self)
+        sync_contacts()
+
+    def test_orphans_are_deleted_in_chunks(self):
+        del self.pages.contacts[5:12]
+        stats = reconcile_deletions(chunk_size=3)
+        self.assertEqual((stats["orphaned"], stats["deleted"]), (7, 7))
+        self.assertEqual(Contact.objects.count(), 23)
+        self.assertFalse(Contact.objects.filter(hubspot_id="6").exists())
+
+    def test_dry_run_keeps_rows(self):
+        del self.pages.contacts[:4]
+        stats = reconcile_deletions(dry_run=True)
+        self.assertEqual((stats["orphaned"], stats["deleted"]), (4, 0))
+        self.assertEqual(Contact.objects.count(), 30)
+
+    def test_empty_portal_deletes_nothing(self):
+        self.pages.contacts = []
+        reconcile_deletions()
+        self.assertEqual(Contact.objects.count(), 30)
+
+
+class ContactRowSerializerTests(TestCase):
+    def test_output_matches_contact_serializer(self):
+        Contact.objects.create(hubspot_id="1", first_name="Ada", last_name="Lovelace", email="ada@example.com")
+        Contact.objects.create(hubspot_id="2", first_name="Alan", last_name="", company=None, zip="12345")
+        contacts = Contact.objects.order_by("pk")
+
+        renderer = JSONRenderer()
+        self.assertEqual(
+            renderer.render(ContactRowSerializer().serialize(contacts)),
+            renderer.render(ContactSerializer(contacts, many=True).data),
+        )
+
+
+class ContactExportTests(TestCase):
+    def setUp(self):
+        for i in range(3):
+            Contact.objects.create(hubspot_id=str(i), first_name=f"First{i}", last_name="Doe",
+                                   email=f"contact{i}@example.com", company="Acme, Inc.")
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(pk=1, email="staff@example.com"))
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_ndjson_export_with_field_selection(self):
+        response = self.client.get("/contacts/export/", {"fields": "email,first_name"})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = self.body(response).splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[0]), {"first_name": "First0", "email": "contact0@example.com"})
+
+    def test_gzipped_csv_export(self):
+        response = self.client.get("/contacts/export/", {"output": "csv", "compress": "gzip"})
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        rows = list(csv.reader(gzip.decompress(self.body(response)).decode().splitlines()))
+        self.assertEqual(rows[0], ContactRowSerializer().names)
+        self.assertEqual(rows[1][2], "Acme, Inc.")
+        self.assertEqual(len(rows), 4)
+
+    def test_gzip_follows_accept_encoding_quality(self):
+        response = self.client.get("/contacts/export/", HTTP_ACCEPT_ENCODING="gzip;q=0.5")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.body(response)
+
+        response = self.client.get("/contacts/export/", HTTP_ACCEPT_ENCODING="gzip;q=0, identity")
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(len(self.body(response).splitlines()), 3)
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get("/contacts/export/", {"fields": "email,password"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ContactImportTests(TestCase):
+    CSV = (
+        "First Name,Last Name,Email,Company\n"
+        "Ada,Lovelace,ADA@example.com,Analytical\n"
+        "Ada,Lovelace,ada@example.com,Duplicate in file\n"
+        "Grace,,grace@example.com,Missing last name\n"
+        "Alan,Turing,not-an-email,\n"
+        "Existing,Person,existing@example.com,\n"
+        "Linus,Torvalds,linus@example.com,\n"
+    )
+
+    def setUp(self):
+        Contact.objects.create(hubspot_id="900", first_name="Existing", last_name="Person",
+                               email="existing@example.com")
+        self.pushed = []
+        patches = [
+            mock.patch("hubspot_contacts.importer.HubSpotService.create_or_update_contacts",
+                       side_effect=self.pushed.extend),
+            mock.patch("hubspot_contacts.importer.HubSpotService.get_contacts_by_emails",
+                       side_effect=self.lookup),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def lookup(self, emails):
+        # Linus has not shown up in HubSpot yet.
+        return {
+            str(index): hubspot_contact(index)
+            | {"identity-profiles": [{"identities": [{"type": "EMAIL", "value": email}]}]}
+            for index, email in enumerate(emails, start=100)
+            if email != "linus@example.com"
+        }
+
+    def test_import_validates_dedupes_and_batches(self):
+        job = ContactImportJob.objects.create(file=SimpleUploadedFile("contacts.csv", self.CSV.encode()))
+        run_import(job.pk, chunk_size=4)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, ContactImportJob.COMPLETED)
+        self.assertEqual(job.processed_rows, 6)
+        self.assertEqual(job.created_count, 1)
+        self.assertEqual(job.duplicate_count, 2)
+        self.assertEqual(job.failed_count, 2)
+        self.assertEqual(job.pending_count, 1)
+        self.assertEqual([error["line"] for error in job.errors], [4, 5])
+        self.assertEqual([contact["email"] for contact in self.pushed], ["ada@example.com", "linus@example.com"])
+        self.assertEqual(Contact.objects.get(email="ada@example.com").company, "Analytical")
+
+    def test_only_columns_in_the_file_are_sent_to_hubspot(self):
+        csv_file = SimpleUploadedFile("contacts.csv", b"First Name,Last Name,Email\nAda,Lovelace,ada@example.com\n")
+        run_import(ContactImportJob.objects.create(file=csv_file).pk)
+
+        properties = {item["property"]: item["value"] for item in self.pushed[0]["properties"]}
+        self.assertEqual(properties, {"firstname": "Ada", "lastname": "Lovelace"})
+
+    def test_missing_columns_fail_the_job(self):
+        job = ContactImportJob.objects.create(file=SimpleUploadedFile("contacts.csv", b"email\na@example.com\n"))
+        run_import(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ContactImportJob.FAILED)
+        self.assertIn("first_name", job.message)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.pages = FakeHubSpotPages(5)
+        self.pages.patch(self)
+        sync_contacts()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(pk=1, email="staff@example.com"))
+
+    def test_list_narrows_response_and_hubspot_properties(self):
+        self.pages.contacts[0] = hubspot_contact(1, firstname="Renamed", company="Ignored Inc")
+        response = self.client.get("/contacts/", {"fields": "first_name,email"})
+
+        self.assertEqual(self.pages.requested_properties, ["firstname"])
+        self.assertEqual(response.data[0], {"first_name": "Renamed", "email": "contact1@example.com"})
+        # Only the requested columns were written.
+        self.assertEqual(Contact.objects.get(hubspot_id="1").company, "")
+
+    def test_detail_returns_requested_fields(self):
+        pk = Contact.objects.get(hubspot_id="2").pk
+        # The change-counter lookup for the ETag, then the narrowed row.
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/contacts/{pk}/", {"fields": "last_name"})
+        self.assertEqual(response.data, {"last_name": "Last2"})
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get("/contacts/", {"fields": "hubspot_id"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.pages = FakeHubSpotPages(5)
+        self.pages.patch(self)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(pk=1, email="staff@example.com"))
+
+    def run_inline(self):
+        patcher = mock.patch("hubspot_contacts.views.start_background_job",
+                             side_effect=lambda target, *args, **kwargs: target(*args))
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def test_list_revalidates_with_etag(self):
+        self.run_inline()
+        first = self.client.get("/contacts/")
+        self.assertEqual(first["Cache-Control"], "private, no-cache")
+        self.assertIn("Last-Modified", first)
+
+        again = self.client.get("/contacts/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+
+        # The 304 doesn't wait for HubSpot; the background sync it starts
+        # brings the change in for the next revalidation.
+        self.pages.contacts[0] = hubspot_contact(1, firstname="Renamed")
+        self.assertEqual(self.client.get("/contacts/", HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+        changed = self.client.get("/contacts/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], first["ETag"])
+
+    def test_list_304_makes_no_hubspot_call(self):
+        etag = self.client.get("/contacts/")["ETag"]
+        with mock.patch("hubspot_contacts.sync.HubSpotService.iter_contact_pages") as remote, \
+                mock.patch("hubspot_contacts.views.start_background_job") as start:
+            response = self.client.get("/contacts/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        remote.assert_not_called()
+        start.assert_called_once()
+        self.assertEqual(response["X-Sync-Status"], SyncJob.RUNNING)
+
+    def test_field_selection_has_its_own_etag(self):
+        full = self.client.get("/contacts/")
+        narrow = self.client.get("/contacts/", {"fields": "email"}, HTTP_IF_NONE_MATCH=full["ETag"])
+        self.assertEqual(narrow.status_code, 200)
+
+    def test_detail_304_skips_the_row_query(self):
+        sync_contacts()
+        pk = Contact.objects.get(hubspot_id="3").pk
+        etag = self.client.get(f"/contacts/{pk}/")["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/contacts/{pk}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_local_write_changes_etag(self):
+        sync_contacts()
+        contact = Contact.objects.get(hubspot_id="3")
+        etag = self.client.get(f"/contacts/{contact.pk}/")["ETag"]
+        with mock.patch("hubspot_contacts.views.HubSpotService.delete_contact"):
+            self.client.delete(f"/contacts/{Contact.objects.get(hubspot_id='4').pk}/")
+        response = self.client.get(f"/contacts/{contact.pk}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionTests(TestCase):
+    def setUp(self):
+        FakeHubSpotPages(20).patch(self)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(pk=1, email="staff@example.com"))
+
+    def test_gzip_when_accepted(self):
+        response = self.client.get("/contacts/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertTrue(response["ETag"].startswith("W/"))
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 20)
+
+    @skipUnless(brotli, "brotli is not installed")
+    def test_brotli_preferred(self):
+        response = self.client.get("/contacts/", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(len(json.loads(brotli.decompress(response.content))), 20)
+
+    def test_weak_etag_still_revalidates(self):
+        etag = self.client.get("/contacts/", HTTP_ACCEPT_ENCODING="gzip")["ETag"]
+        with mock.patch("hubspot_contacts.views.start_background_job"):
+            response = self.client.get("/contacts/", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_small_and_unaccepted_responses_are_untouched(self):
+        self.assertNotIn("Content-Encoding", self.client.get("/contacts/"))
+        with override_settings(COMPRESSION_MIN_SIZE=10 ** 6):
+            response = self.client.get("/contacts/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertNotIn("Content-Encoding", response)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overrides = override_settings(PROFILE_DIR=directory.name, PROFILE_HEADER_ENABLED=True)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        FakeHubSpotPages(20).patch(self)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(pk=1, email="staff@example.com", is_staff=True))
+
+    def test_only_requested_profiles_are_recorded(self):
+        self.assertNotIn("Server-Timing", self.client.get("/contacts/"))
+
+        response = self.client.get("/contacts/", HTTP_X_PROFILE="1")
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", hubspot;dur=')
+        report = self.client.get(f"/profiles/{response['X-Profile-Id']}/").json()
+        self.assertEqual((report["path"], report["status"]), ("/contacts/", 200))
+        self.assertEqual(report["db"]["count"], len(report["queries"]))
+        self.assertTrue(report["top_functions"])
+        # The sync is batched: no query shape repeats per contact.
+        self.assertEqual(report["n_plus_one"], [])
+
+        artifact = self.client.get(f"/profiles/{response['X-Profile-Id']}/", {"artifact": "prof"})
+        self.assertEqual(artifact.status_code, 200)
+        self.assertEqual(self.client.get("/profiles/not-a-profile/").status_code, 404)
+
+    def test_concurrent_request_is_served_unprofiled(self):
+        # As if another thread were already profiling a request.
+        with profiling._profiling:
+            response = self.client.get("/contacts/", HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+
+    def test_header_is_ignored_unless_enabled(self):
+        with override_settings(PROFILE_HEADER_ENABLED=False):
+            response = self.client.get("/contacts/", HTTP_X_PROFILE="1")
+        self.assertNotIn("Server-Timing", response)
+        self.assertNotIn("X-Profile-Id", response)
+
+    def test_repeated_query_shapes_are_flagged(self):
+        sync_contacts()
+        profile = RequestProfile(mock.Mock(method="GET", get_full_path=lambda: "/"))
+        with connection.execute_wrapper(profile):
+            for pk in Contact.objects.values_list("pk", flat=True)[:6]:
+                Contact.objects.filter(pk=pk).exists()
+            Contact.objects.filter(pk__in=[1, 2, 3]).exists()
+            Contact.objects.filter(pk__in=[4, 5]).exists()
+        suspects = profile.n_plus_one(threshold=5)
+        self.assertEqual([suspect["count"] for suspect in suspects], [6])
+        self.assertTrue(suspects[0]["callers"][0].startswith("hubspot_contacts/tests.py:"))
+        self.assertEqual(len(profile.n_plus_one(threshold=2)), 2)
+
+    def test_hubspot_calls_are_timed(self):
+        session = mock.Mock()
+        session.request.return_value = mock.Mock(status_code=200, content=b'{"contacts": []}')
+        with mock.patch("hubspot_contacts.hubspot_service.HubSpotService._session", return_value=session):
+            response = self.client.get("/hubspot/search/", {"q": "ann"}, HTTP_X_PROFILE="1")
+        self.assertIn('desc="1 calls"', response["Server-Timing"])
+        report = self.client.get(f"/profiles/{response['X-Profile-Id']}/").json()
+        self.assertEqual([(call["method"], call["status"]) for call in report["external"]], [("GET", 200)])
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.pages = FakeHubSpotPages(6)
+        self.pages.patch(self)
+        sync_contacts()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(pk=1, email="staff@example.com"))
+
+    def changes(self, **params):
+        response = self.client.get("/contacts/changes/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_bootstrap_pages_through_every_contact(self):
+        first = self.changes(since=0, limit=4)
+        self.assertTrue(first["has_more"])
+        rest = self.changes(since=first["cursor"], limit=4)
+        self.assertFalse(rest["has_more"])
+        ids = [row["id"] for row in first["contacts"] + rest["contacts"]]
+        self.assertCountEqual(ids, Contact.objects.values_list("id", flat=True))
+
+    def test_only_changes_after_cursor_are_returned(self):
+        cursor = self.changes()["cursor"]
+        self.pages.contacts[1] = hubspot_contact(2, firstname="Renamed")
+        sync_contacts()
+        gone = Contact.objects.get(hubspot_id="5")
+        with mock.patch("hubspot_contacts.views.HubSpotService.delete_contact"):
+            self.client.delete(f"/contacts/{gone.pk}/")
+
+        page = self.changes(since=cursor, fields="first_name")
+        self.assertEqual(page["contacts"], [{"id": Contact.objects.get(hubspot_id="2").pk, "first_name": "Renamed"}])
+        self.assertEqual(page["deleted"], [gone.pk])
+        self.assertEqual(self.changes(since=page["cursor"])["contacts"], [])
+
+    def test_updated_contact_moves_to_the_end(self):
+        contact = Contact.objects.get(hubspot_id="1")
+        self.pages.contacts[0] = hubspot_contact(1, firstname="Renamed")
+        sync_contacts()
+        self.assertEqual(self.changes()["contacts"][-1]["id"], contact.pk)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/contacts/changes/", {"since": "abc"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ContactEventsTests(TransactionTestCase):
+    def setUp(self):
+        self.pages = FakeHubSpotPages(3)
+        self.pages.patch(self)
+        sync_contacts()
+        user = get_user_model().objects.create_user(
+            email="staff@example.com", username="staff", password="secret", first_name="S", last_name="T"
+        )
+        self.token = str(AccessToken.for_user(user))
+        self.broadcaster = ChangeBroadcaster(poll_interval=3600)
+
+    async def open_stream(self, query):
+        self.sent, self.inbox = [], asyncio.Queue()
+
+        async def send(message):
+            self.sent.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/contacts/stream/",
+                 "query_string": query.encode(), "headers": []}
+        self.task = asyncio.ensure_future(
+            contact_events(scope, self.inbox.get, send, broadcaster=self.broadcaster)
+        )
+        while self.broadcaster.cursor is None:
+            await asyncio.sleep(0.01)
+
+    async def close_stream(self):
+        await self.inbox.put({"type": "http.disconnect"})
+        await self.task
+        self.broadcaster._task.cancel()
+
+    def events(self):
+        bodies = b"".join(m.get("body", b"") for m in self.sent if m["type"] == "http.response.body")
+        return [
+            json.loads(block.split(b"data: ")[1])
+            for block in bodies.split(b"\n\n")
+            if block.startswith(b"id: ")
+        ]
+
+    async def test_requires_token(self):
+        self.sent = []
+
+        async def send(message):
+            self.sent.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/contacts/stream/", "query_string": b"", "headers": []}
+        await contact_events(scope, None, send, broadcaster=self.broadcaster)
+        self.assertEqual(self.sent[0]["status"], 401)
+
+    async def test_catch_up_then_batched_push(self):
+        await self.open_stream(f"token={self.token}&since=0")
+        self.assertEqual(self.sent[0]["status"], 200)
+        self.assertEqual(len(self.events()[0]["contacts"]), 3)
+
+        self.pages.contacts[0] = hubspot_contact(1, firstname="A")
+        self.pages.contacts[1] = hubspot_contact(2, firstname="B")
+        await sync_to_async(sync_contacts)()
+        await self.broadcaster.poll()
+        await asyncio.sleep(0.01)
+        await self.close_stream()
+
+        pushed = self.events()[-1]
+        ids = await sync_to_async(lambda: sorted(Contact.objects.filter(hubspot_id__in=["1", "2"])
+                                                 .values_list("id", flat=True)))()
+        self.assertEqual(sorted(pushed["contacts"]), ids)
+        self.assertEqual(pushed["since"] + 2, pushed["cursor"])
+
+    async def test_large_bursts_are_truncated(self):
+        await self.open_stream(f"token={self.token}")
+        self.pages.contacts = [hubspot_contact(vid, firstname="X") for vid in range(1, 4)]
+        await sync_to_async(sync_contacts)()
+        with mock.patch("hubspot_contacts.events.MAX_IDS", 2):
+            await self.broadcaster.poll()
+        await asyncio.sleep(0.01)
+        await self.close_stream()
+        self.assertEqual(self.events(), [{"since": 3, "cursor": 6, "truncated": True}])
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.pages = FakeHubSpotPages(4)
+        for vid, stage in ((1, "lead"), (2, "lead"), (3, "customer")):
+            self.pages.contacts[vid - 1] = hubspot_contact(vid, lifecyclestage=stage)
+        self.pages.patch(self)
+        sync_contacts()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(pk=1, email="staff@example.com"))
+
+    def stored(self):
+        return set(ContactRollup.objects.filter(count__gt=0).values_list("metric", "bucket", "count"))
+
+    def test_incremental_rollups_match_rebuild(self):
+        self.pages.contacts[0] = hubspot_contact(1, lifecyclestage="customer")
+        sync_contacts()
+        with mock.patch("hubspot_contacts.views.HubSpotService.delete_contact"):
+            self.client.delete(f"/contacts/{Contact.objects.get(hubspot_id='2').pk}/")
+
+        incremental = self.stored()
+        self.assertIn(("lifecycle_stage", "customer", 2), incremental)
+        self.assertIn(("total", "", 3), incremental)
+        rebuild_rollups()
+        self.assertEqual(self.stored(), incremental)
+
+    def test_edit_without_lifecycle_stage_keeps_it_in_hubspot(self):
+        contact = Contact.objects.get(hubspot_id="1")
+        with mock.patch("hubspot_contacts.views.HubSpotService.update_contact") as update:
+            response = self.client.put(f"/contacts/{contact.pk}/", {
+                "first_name": "Ada", "last_name": "Lovelace", "email": "contact1@example.com",
+            }, format="json")
+        self.assertEqual(response.status_code, 200)
+        sent = [item["property"] for item in update.call_args.args[1]["properties"]]
+        self.assertIn("firstname", sent)
+        self.assertNotIn("lifecyclestage", sent)
+        self.assertEqual(Contact.objects.get(pk=contact.pk).lifecyclestage, "lead")
+
+    def test_lifecycle_metrics_served_locally(self):
+        with mock.patch("hubspot_contacts.views.HubSpotService.get_lifecycle_stage_metrics") as remote:
+            with self.assertNumQueries(1):
+                response = self.client.get("/hubspot/lifecycle_metrics/")
+        remote.assert_not_called()
+        self.assertEqual(response.data["stages"], {"customer": 1, "lead": 2, "unknown": 1})
+        self.assertEqual(response.data["total"], 4)
+
+    def test_contact_statistics_and_hubspot_override(self):
+        response = self.client.get("/hubspot/contact_statistics/", {"days": 7})
+        self.assertEqual(response.data["total"], 4)
+        self.assertEqual(sum(response.data["created_per_day"].values()), 4)
+
+        with mock.patch("hubspot_contacts.views.HubSpotService.get_contact_statistics",
+                        return_value={"contacts": 99}) as remote:
+            response = self.client.get("/hubspot/contact_statistics/", {"source": "hubspot"})
+        remote.assert_called_once()
+        self.assertEqual(response.data, {"contacts": 99})
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        self.pages = FakeHubSpotPages(0)
+        people = [("CA", "Acme", "acme.com"), ("CA", "Acme", "gmail.com"), ("CA", "Initech", "initech.com"),
+                  ("NY", "Acme", "acme.com"), ("NY", "", "gmail.com")]
+        for vid, (state, company, domain) in enumerate(people, start=1):
+            contact = hubspot_contact(vid, state=state, company=company)
+            contact["identity-profiles"][0]["identities"][0]["value"] = f"person{vid}@{domain.upper()}"
+            self.pages.contacts.append(contact)
+        self.pages.patch(self)
+        sync_contacts()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(pk=1, email="staff@example.com"))
+
+    def facets(self, **params):
+        response = self.client.get("/contacts/facets/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def counts(self, data, facet):
+        return {row["value"]: row["count"] for row in data["facets"][facet]}
+
+    def test_unfiltered_counts(self):
+        data = self.facets()
+        self.assertEqual(data["total"], 5)
+        self.assertEqual(self.counts(data, "state"), {"CA": 3, "NY": 2})
+        self.assertEqual(self.counts(data, "email_domain"), {"acme.com": 2, "gmail.com": 2, "initech.com": 1})
+
+    def test_combined_filters_and_top(self):
+        data = self.facets(state="CA", company="Acme", top=1)
+        self.assertEqual(data["total"], 2)
+        self.assertEqual(data["facets"]["email_domain"], [{"value": "acme.com", "count": 1}])
+        # A facet's own filter does not narrow it.
+        self.assertEqual(self.counts(self.facets(state="CA"), "state"), {"CA": 3, "NY": 2})
+
+    def test_counts_follow_updates_and_deletes(self):
+        self.pages.contacts[4] = hubspot_contact(5, state="CA")
+        sync_contacts()
+        with mock.patch("hubspot_contacts.views.HubSpotService.delete_contact"):
+            self.client.delete(f"/contacts/{Contact.objects.get(hubspot_id='3').pk}/")
+
+        incremental = set(ContactFacetCount.objects.filter(count__gt=0).values_list(
+            "facet", "filter_key", "value", "count"))
+        self.assertEqual(self.counts(self.facets(company="Acme"), "state"), {"CA": 2, "NY": 1})
+        rebuild_facets()
+        self.assertEqual(set(ContactFacetCount.objects.values_list("facet", "filter_key", "value", "count")),
+                         incremental)
+
+    def test_one_query_per_facet(self):
+        with self.assertNumQueries(2):
+            self.client.get("/contacts/facets/", {"facets": "company", "state": "NY"})
+
+
+class NormalizeTests(SimpleTestCase):
+    def test_email_phone_and_names(self):
+        self.assertEqual(normalize_email(" John.Doe+news@GoogleMail.com "), "johndoe@gmail.com")
+        self.assertEqual(normalize_email("Ann.Lee+x@Example.com"), "ann.lee+x@example.com")
+        self.assertEqual(normalize_phone("(415) 555-0100"), normalize_phone("+1 415.555.0100"))
+        self.assertEqual(normalize_phone("0044 20 7946 0958"), "442079460958")
+        self.assertEqual(normalize_phone("ext. 12"), "")
+        self.assertEqual(name_key(" José", "de-la Cruz"), "jose delacruz")
+        self.assertEqual([soundex(n) for n in ("Robert", "Rupert", "Tymczak", "Pfister")],
+                         ["R163", "R163", "T522", "P236"])
+
+
+class DuplicateDetectionTests(TestCase):
+    def setUp(self):
+        self.pages = FakeHubSpotPages(0)
+        people = [
+            # Same person, different email, differently formatted phone.
+            dict(firstname="Jon", lastname="Smith", phone="(415) 555-0100", zip="94105"),
+            dict(firstname="Jon", lastname="Smith", phone="+1 415 555 0100", zip="94105"),
+            # Same phonetic last name and zip, but a different person.
+            dict(firstname="Jane", lastname="Smyth", phone="212 555 0199", zip="94105"),
+            dict(firstname="Ann", lastname="Lee", phone="", zip="10001"),
+        ]
+        self.pages.contacts = [hubspot_contact(vid, **props) for vid, props in enumerate(people, start=1)]
+        self.pages.patch(self)
+
+    def suggested_pairs(self):
+        return {
+            (a.hubspot_id, b.hubspot_id)
+            for a, b in (
+                (s.contact_a, s.contact_b)
+                for s in DuplicateSuggestion.objects.select_related("contact_a", "contact_b")
+            )
+        }
+
+    def test_sync_suggests_incrementally(self):
+        sync_contacts()
+        self.assertEqual(self.suggested_pairs(), {("1", "2")})
+        suggestion = DuplicateSuggestion.objects.get()
+        self.assertEqual(set(suggestion.reasons), {"phone", "name", "zip"})
+
+        self.pages.contacts.append(hubspot_contact(5, firstname="Ann", lastname="Lee", zip="10001", company="X"))
+        self.pages.contacts[3] = hubspot_contact(4, firstname="Ann", lastname="Lee", zip="10001", company="X")
+        sync_contacts()
+        self.assertEqual(self.suggested_pairs(), {("1", "2"), ("4", "5")})
+
+    def test_full_scan_matches_incremental_and_keeps_dismissals(self):
+        sync_contacts()
+        DuplicateSuggestion.objects.update(status=DuplicateSuggestion.DISMISSED)
+        stats = scan_duplicates(chunk_size=2)
+        self.assertEqual(stats["contacts"], 4)
+        self.assertEqual(DuplicateSuggestion.objects.get().status, DuplicateSuggestion.DISMISSED)
+
+    def test_only_one_scan_runs_at_a_time(self):
+        sync_contacts()
+        client = APIClient()
+        client.force_authenticate(get_user_model()(pk=1, email="staff@example.com"))
+        with mock.patch("hubspot_contacts.views.start_background_job") as start:
+            first = client.post("/contacts/duplicates/")
+            second = client.post("/contacts/duplicates/")
+        self.assertEqual((first.status_code, second.status_code), (202, 200))
+        self.assertEqual(second.data, {"status": "running", "job": first.data["job"]})
+        start.assert_called_once()
+        with self.assertRaises(ScanAlreadyRunning):
+            scan_duplicates()
+
+        job = SyncJob.objects.get(pk=first.data["job"])
+        stats = scan_duplicates(job=job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, SyncJob.COMPLETED)
+        self.assertEqual(ContactBlockingKey.objects.count(), stats["keys"])
+        self.assertEqual(self.suggested_pairs(), {("1", "2")})
+
+    def test_oversized_blocks_are_skipped(self):
+        sync_contacts()
+        with mock.patch("hubspot_contacts.dedup.MAX_BLOCK_SIZE", 1):
+            scan_duplicates()
+        self.assertFalse(DuplicateSuggestion.objects.exists())
+
+    def test_api_lists_and_dismisses(self):
+        sync_contacts()
+        client = APIClient()
+        client.force_authenticate(get_user_model()(pk=1, email="staff@example.com"))
+        listed = client.get("/contacts/duplicates/").data
+        self.assertEqual(len(listed), 1)
+        self.assertEqual(listed[0]["contact_a"]["first_name"], "Jon")
+
+        response = client.patch(f"/contacts/duplicates/{listed[0]['id']}/", {"status": "dismissed"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get("/contacts/duplicates/").data, [])
+
+        response = client.patch("/contacts/duplicates/999999/", {"status": "dismissed"}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+
+class LocalFirstResolverTests(TestCase):
+    def setUp(self):
+        pages = FakeHubSpotPages(2)
+        pages.contacts[0] = hubspot_contact(1, phone="(415) 555-0100", firstname="Zoë", lastname="O'Brien")
+        pages.patch(self)
+        sync_contacts()
+
+    def test_lookup_columns_are_maintained(self):
+        contact = Contact.objects.get(hubspot_id="1")
+        self.assertEqual(
+            (contact.email_lower, contact.email_domain, contact.phone_digits, contact.name_key),
+            ("contact1@example.com", "example.com", "14155550100", "zoe obrien"),
+        )
+        contact.email = "New@Example.ORG"
+        contact.save(update_fields=["email"])
+        contact.refresh_from_db()
+        self.assertEqual((contact.email_lower, contact.email_domain), ("new@example.org", "example.org"))
+
+    def test_only_misses_go_to_hubspot(self):
+        remote = {"99": hubspot_contact(99) | {"vid": 99}}
+        remote["99"]["identity-profiles"][0]["identities"][0]["value"] = "Remote@Example.com"
+        with mock.patch("hubspot_contacts.resolver.HubSpotService.get_contacts_by_emails",
+                        return_value=remote) as lookup:
+            with self.assertNumQueries(1):
+                resolved = resolve_emails(["CONTACT2@example.com", "remote@example.com", "nobody@example.com"])
+
+        lookup.assert_called_once_with(["nobody@example.com", "remote@example.com"])
+        self.assertEqual(resolved["CONTACT2@example.com"]["source"], "local")
+        self.assertEqual(resolved["remote@example.com"], {"id": None, "hubspot_id": "99", "source": "hubspot"})
+        self.assertIsNone(resolved["nobody@example.com"])
+
+    def test_api_resolves_phones_locally(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model()(pk=1, email="staff@example.com"))
+        with mock.patch("hubspot_contacts.resolver.HubSpotService.get_contacts_by_emails") as lookup:
+            response = client.post("/contacts/resolve/", {"phones": ["+1 415 555 0100", "555"],
+                                                          "emails": ["x@example.com"], "remote": False},
+                                   format="json")
+        lookup.assert_not_called()
+        self.assertEqual(response.data["phones"]["+1 415 555 0100"]["hubspot_id"], "1")
+        self.assertIsNone(response.data["phones"]["555"])
+        self.assertIsNone(response.data["emails"]["x@example.com"])
+
+    def test_api_rejects_a_body_that_is_not_an_object(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model()(pk=1, email="staff@example.com"))
+        for body in (["x@example.com"], "x@example.com"):
+            response = client.post("/contacts/resolve/", body, format="json")
+            self.assertEqual(response.status_code, 400)
+
+
+class ContactAdminTests(TestCase):
+    def setUp(self):
+        pages = FakeHubSpotPages(0)
+        for vid, (first, state) in enumerate([("Ann", "CA"), ("Anna", "NY"), ("Bob", "CA")], start=1):
+            pages.contacts.append(hubspot_contact(vid, firstname=first, lastname="Lee", state=state))
+        pages.patch(self)
+        sync_contacts()
+        admin_user = get_user_model().objects.create_superuser(
+            email="admin@example.com", username="admin", password="secret", first_name="A", last_name="D"
+        )
+        self.client.force_login(admin_user)
+        self.url = "/admin/hubspot_contacts/contact/"
+
+    def listed(self, response):
+        return sorted(contact.first_name for contact in response.context["cl"].result_list)
+
+    def test_changelist_avoids_full_counts_and_like_scans(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["cl"].result_count, 3)
+        contact_sql = [q["sql"] for q in queries.captured_queries if '"hubspot_contacts_contact"' in q["sql"]]
+        self.assertFalse([sql for sql in contact_sql if "DISTINCT" in sql or "LIKE" in sql])
+
+    def test_prefix_search_and_facet_filter(self):
+        self.assertEqual(self.listed(self.client.get(self.url, {"q": "ann"})), ["Ann", "Anna"])
+        self.assertEqual(self.listed(self.client.get(self.url, {"q": "Ann Lee"})), ["Ann"])
+        self.assertEqual(self.listed(self.client.get(self.url, {"q": "contact3@"})), ["Bob"])
+        self.assertEqual(self.listed(self.client.get(self.url, {"state": "CA"})), ["Ann", "Bob"])
+
+    def test_facet_filter_matches_unstripped_values(self):
+        Contact.objects.filter(first_name="Bob").update(state=" CA ")
+        rebuild_facets()
+        response = self.client.get(self.url, {"state": "CA"})
+        state_filter = next(f for f in response.context["cl"].filter_specs if f.parameter_name == "state")
+        self.assertIn(("CA", "CA (2)"), state_filter.lookup_choices)
+        self.assertEqual(self.listed(response), ["Ann", "Bob"])
+
+    def test_contacts_are_read_only_in_admin(self):
+        contact = Contact.objects.get(first_name="Ann")
+        change_url = f"{self.url}{contact.pk}/change/"
+        self.assertEqual(self.client.get(change_url).status_code, 200)
+        response = self.client.post(change_url, {"first_name": "Changed", "last_name": "Lee", "hubspot_id": "1"})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get(f"{self.url}add/").status_code, 403)
+        self.assertEqual(self.client.post(f"{self.url}{contact.pk}/delete/", {"post": "yes"}).status_code, 403)
+        self.assertEqual(Contact.objects.get(pk=contact.pk).first_name, "Ann")
+
+    def test_bulk_actions_run_in_background(self):
+        pks = list(Contact.objects.filter(state="CA").values_list("pk", flat=True))
+        response = self.client.get(self.url)
+        self.assertNotIn("delete_selected", response.context["cl"].model_admin.get_actions(response.wsgi_request))
+        with mock.patch("hubspot_contacts.admin.start_background_job") as start:
+            self.client.post(self.url, {"action": "delete_in_background", "_selected_action": pks})
+        job, selected = start.call_args.args
+        self.assertIs(job, delete_contacts)
+        self.assertEqual(sorted(selected), sorted(pks))
+
+        with mock.patch("hubspot_contacts.bulk.HubSpotService.delete_contact") as remote:
+            stats = delete_contacts(selected)
+        self.assertEqual(remote.call_count, 2)
+        self.assertEqual(stats, {"deleted": 2, "failed": 0})
+        self.assertEqual(list(Contact.objects.values_list("first_name", flat=True)), ["Anna"])
+
+
+@override_settings(
+    REST_FRAMEWORK=settings.REST_FRAMEWORK | {
+        "DEFAULT_THROTTLE_RATES": {"hubspot": "5/min", "hubspot.advanced.search": "2/min"},
+    },
+    HUBSPOT_THROTTLE_USER_RATES={"power@example.com": "100/min"},
+)
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        FakeHubSpotPages(250).patch(self)
+        sync_contacts()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(pk=1, email="staff@example.com"))
+
+    def search(self):
+        with mock.patch("hubspot_contacts.views.HubSpotService.search_contacts", return_value=[]):
+            return self.client.get("/hubspot/search/", {"q": "ann"})
+
+    def test_per_action_bucket_with_headers(self):
+        first = self.search()
+        self.assertEqual((first["RateLimit-Limit"], first["RateLimit-Remaining"]), ("2", "1"))
+        self.search()
+        blocked = self.search()
+        self.assertEqual(blocked.status_code, 429)
+        self.assertEqual(blocked["RateLimit-Remaining"], "0")
+        self.assertGreater(int(blocked["Retry-After"]), 0)
+
+    def test_list_costs_one_unit_per_hubspot_page(self):
+        response = self.client.get("/contacts/")
+        # 250 mirrored contacts -> 3 pages of 100.
+        self.assertEqual(response["RateLimit-Remaining"], "2")
+        self.assertEqual(self.client.get("/contacts/").status_code, 429)
+
+    def test_local_calls_are_free_and_users_can_be_raised(self):
+        self.client.get("/contacts/")
+        pk = Contact.objects.values_list("pk", flat=True).first()
+        response = self.client.get(f"/contacts/{pk}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("RateLimit-Limit", response)
+
+        self.client.force_authenticate(get_user_model()(pk=2, email="power@example.com"))
+        self.assertEqual(self.client.get("/contacts/")["RateLimit-Limit"], "100")
+
+
+class SyncJobTests(TestCase):
+    def setUp(self):
+        self.pages = FakeHubSpotPages(30)
+        self.pages.patch(self)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(pk=1, email="staff@example.com"))
+
+    def test_list_records_a_completed_job(self):
+        response = self.client.get("/contacts/")
+        job = SyncJob.objects.get()
+        self.assertEqual((response["X-Sync-Job"], response["X-Sync-Status"]), (str(job.pk), "completed"))
+        self.assertEqual((job.pages, job.fetched, job.created_count), (3, 30, 30))
+        self.assertEqual(job.triggered_by, "staff@example.com")
+
+        status_response = self.client.get(f"/contacts/sync/{job.pk}/").json()
+        self.assertEqual(status_response["progress"], 1.0)
+        self.assertGreaterEqual(status_response["duration"], 0)
+        self.assertEqual([row["id"] for row in self.client.get("/contacts/sync/").json()], [job.pk])
+
+    def test_only_one_job_runs_and_later_requests_attach(self):
+        running = sync_jobs.acquire()
+        self.assertIsNone(sync_jobs.acquire())
+
+        with mock.patch.object(sync_jobs, "ATTACH_TIMEOUT", 0), \
+                mock.patch("hubspot_contacts.sync.HubSpotService.iter_contact_pages") as remote:
+            response = self.client.get("/contacts/")
+        remote.assert_not_called()
+        self.assertEqual((response["X-Sync-Job"], response["X-Sync-Status"]), (str(running.pk), "running"))
+
+        started = self.client.post("/contacts/sync/")
+        self.assertEqual((started.status_code, started.json()["id"]), (200, running.pk))
+        self.assertEqual(SyncJob.objects.count(), 1)
+
+    def test_expired_lease_is_taken_over(self):
+        stale = sync_jobs.acquire()
+        SyncJob.objects.filter(pk=stale.pk).update(lease_expires_at=stale.started_at - timedelta(seconds=1))
+
+        fresh = sync_jobs.acquire()
+        self.assertIsNotNone(fresh)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, SyncJob.FAILED)
+        with self.assertRaises(sync_jobs.SyncLeaseLost):
+            sync_jobs.heartbeat(stale, {"pages": 1, "fetched": 0, "created": 0, "updated": 0, "skipped": 0})
+
+    def test_recent_result_is_reused(self):
+        first = sync_jobs.sync_once()
+        with mock.patch.object(sync_jobs, "FRESH_SECONDS", 60):
+            self.assertEqual(sync_jobs.sync_once(fields=["email"]).pk, first.pk)
+        self.assertNotEqual(sync_jobs.sync_once().pk, first.pk)
+
+
+class ResumableSyncTests(TestCase):
+    def setUp(self):
+        self.pages = FakeHubSpotPages(45)
+        self.pages.patch(self)
+
+    def interrupted_job(self, after_pages):
+        """A job whose worker died while writing page ``after_pages + 1``."""
+        job = sync_jobs.acquire()
+        calls = []
+
+        def crash(stats, cursor):
+            calls.append(cursor)
+            if len(calls) > after_pages:
+                raise RuntimeError("worker killed")
+            sync_jobs.heartbeat(job, stats, cursor)
+
+        with self.assertRaises(RuntimeError):
+            sync_contacts(on_page=crash)
+        sync_jobs.release(job, SyncJob.FAILED, message="worker killed")
+        return job
+
+    def test_checkpoint_commits_with_each_page(self):
+        job = self.interrupted_job(after_pages=2)
+        # The crashed page rolled back along with its checkpoint.
+        self.assertEqual((job.cursor, job.pages, job.fetched, job.created_count), (20, 2, 20, 20))
+        self.assertEqual(Contact.objects.count(), 20)
+
+    def test_resume_continues_from_the_checkpoint(self):
+        job = self.interrupted_job(after_pages=2)
+        out = io.StringIO()
+        call_command("sync_contacts", "--resume", concurrency=4, stdout=out)
+
+        self.assertEqual(self.pages.requested_offsets[-1], 20)
+        job.refresh_from_db()
+        self.assertEqual(job.status, SyncJob.COMPLETED)
+        self.assertIsNone(job.cursor)
+        self.assertEqual((job.pages, job.fetched, job.created_count), (5, 45, 45))
+        self.assertEqual(Contact.objects.count(), 45)
+        self.assertIn(f"Resuming sync job {job.pk} after 2 pages", out.getvalue())
+
+    def test_replaying_a_page_is_harmless(self):
+        job = self.interrupted_job(after_pages=3)
+        # Pretend the last checkpoint was lost: the third page runs again.
+        SyncJob.objects.filter(pk=job.pk).update(cursor=20)
+        job = sync_jobs.execute(sync_jobs.resume())
+        self.assertEqual(Contact.objects.count(), 45)
+        self.assertEqual(job.skipped_count, 10)
+
+    def test_lost_lease_rolls_back_the_page(self):
+        job = sync_jobs.acquire()
+        SyncJob.objects.filter(pk=job.pk).update(owner="someone-else")
+        with self.assertRaises(sync_jobs.SyncLeaseLost):
+            sync_contacts(on_page=lambda stats, cursor: sync_jobs.heartbeat(job, stats, cursor))
+        self.assertEqual(Contact.objects.count(), 0)
+
+
+def endpoint_scenarios():
+    """``(url name, label, call)`` for every route in urls.py; ``call(client, ctx)`` makes the request."""
+    contact_row = {"first_name": "Ann", "last_name": "Lee", "email": "ann.lee@example.com", "state": "CA"}
+    return [
+        ("contact-list", "GET /contacts/", lambda client, ctx: client.get("/contacts/")),
+        ("contact-list", "GET /contacts/?fields=", lambda client, ctx: client.get("/contacts/", {"fields": "email,state"})),
+        ("contact-list", "POST /contacts/", lambda client, ctx: client.post("/contacts/", contact_row, format="json")),
+        ("sync-job-list", "GET /contacts/sync/", lambda client, ctx: client.get("/contacts/sync/")),
+        ("sync-job-list", "POST /contacts/sync/", lambda client, ctx: client.post("/contacts/sync/")),
+        ("sync-job-detail", "GET /contacts/sync/<id>/",
+         lambda client, ctx: client.get(f"/contacts/sync/{ctx['sync_job']}/")),
+        ("contact-changes", "GET /contacts/changes/", lambda client, ctx: client.get("/contacts/changes/")),
+        ("contact-facets", "GET /contacts/facets/",
+         lambda client, ctx: client.get("/contacts/facets/", {"state": "CA"})),
+        ("contact-resolve", "POST /contacts/resolve/", lambda client, ctx: client.post(
+            "/contacts/resolve/",
+            {"emails": ["contact1@example.com", "contact2@example.com", "nobody@example.com"],
+             "phones": ["+1 555 0000001"]},
+            format="json",
+        )),
+        ("duplicate-list", "GET /contacts/duplicates/", lambda client, ctx: client.get("/contacts/duplicates/")),
+        ("duplicate-list", "POST /contacts/duplicates/", lambda client, ctx: client.post("/contacts/duplicates/")),
+        ("duplicate-detail", "PATCH /contacts/duplicates/<id>/", lambda client, ctx: client.patch(
+            f"/contacts/duplicates/{ctx['suggestion']}/", {"status": "dismissed"}, format="json",
+        )),
+        ("contact-export", "GET /contacts/export/", lambda client, ctx: client.get("/contacts/export/")),
+        ("contact-export", "GET /contacts/export/?output=csv",
+         lambda client, ctx: client.get("/contacts/export/", {"output": "csv"})),
+        ("contact-import", "POST /contacts/import/", lambda client, ctx: client.post(
+            "/contacts/import/",
+            {"file": SimpleUploadedFile("contacts.csv", b"First Name,Last Name,Email\nAnn,Lee,ann@example.com\n")},
+            format="multipart",
+        )),
+        ("contact-import-job", "GET /contacts/import/<id>/",
+         lambda client, ctx: client.get(f"/contacts/import/{ctx['import_job']}/")),
+        ("contact-detail", "GET /contacts/<id>/", lambda client, ctx: client.get(f"/contacts/{ctx['contact']}/")),
+        ("contact-detail", "PUT /contacts/<id>/",
+         lambda client, ctx: client.put(f"/contacts/{ctx['contact']}/", contact_row, format="json")),
+        ("contact-detail", "DELETE /contacts/<id>/",
+         lambda client, ctx: client.delete(f"/contacts/{ctx['contact']}/")),
+        *[
+            ("hubspot-advanced", f"GET /hubspot/{action}/{query}",
+             lambda client, ctx, action=action, query=query: client.get(f"/hubspot/{action}/{query}"))
+            for action, query in [
+                ("recently_updated", ""), ("recently_created", ""), ("search", "?q=first1"),
+                ("lifecycle_metrics", ""), ("lifecycle_metrics", "?source=hubspot"),
+                ("contact_statistics", ""), ("contact_statistics", "?source=hubspot"),
+            ]
+        ],
+    ]
+
+
+@override_settings(REST_FRAMEWORK=settings.REST_FRAMEWORK | {"DEFAULT_THROTTLE_RATES": {"hubspot": "100000/min"}})
+class EndpointQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Every endpoint makes the same number of queries and HubSpot calls at any
+    table size, plus at most a fixed number per HubSpot page it reads.
+    """
+
+    budget_page_size = HubSpotService.PAGE_SIZE
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overrides = override_settings(MEDIA_ROOT=media.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.portal = FakeHubSpot()
+        installed = self.portal.installed()
+        installed.__enter__()
+        self.addCleanup(installed.__exit__, None, None, None)
+        # Measure the request, not the background job it starts.
+        patcher = mock.patch("hubspot_contacts.views.start_background_job")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = get_user_model().objects.create_user(
+            email="owner@example.com", username="owner", password="x", first_name="O", last_name="W",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def seed(self, size):
+        self.portal.reset(size)
+        job = sync_jobs.sync_once()
+        first, second = Contact.objects.order_by("pk")[:2]
+        suggestion = DuplicateSuggestion.objects.create(contact_a=first, contact_b=second, score=0.9)
+        import_job = ContactImportJob.objects.create(file="imports/seed.csv", created_by=self.user)
+        return {"contact": first.pk, "suggestion": suggestion.pk, "sync_job": job.pk, "import_job": import_job.pk}
+
+    def test_every_route_has_a_scenario(self):
+        from .urls import urlpatterns
+
+        covered = {name for name, _, _ in endpoint_scenarios()}
+        self.assertEqual({pattern.name for pattern in urlpatterns} - covered, set())
+
+    def test_round_trips_do_not_grow_with_the_data(self):
+        for _, label, call in endpoint_scenarios():
+            with self.subTest(label):
+                self.assertConstantCost(
+                    self.seed, lambda ctx, call=call: call(self.client, ctx), label, hubspot=self.portal,
+                )
+
+    def test_failures_list_the_offending_queries(self):
+        def per_row(ctx):
+            for pk in Contact.objects.values_list("pk", flat=True):
+                Contact.objects.filter(pk=pk).exists()
+            return self.client.get("/contacts/sync/")
+
+        with self.assertRaisesRegex(AssertionError, r"(?s)not O\(1\).*2 -> 20 .*Queries at size 20:"):
+            self.assertConstantCost(self.seed, per_row, "per-row loop", sizes=(2, 20))
+
+    def test_paged_work_may_grow_per_page_but_not_per_row(self):
+        def per_page(ctx):
+            for _ in range(-(-Contact.objects.count() // HubSpotService.PAGE_SIZE)):
+                Contact.objects.exists()
+            return self.client.get("/contacts/sync/")
+
+        self.assertConstantCost(self.seed, per_page, "per-page loop", sizes=(60, 150, 250))
+
+        def per_row_over_pages(ctx):
+            for pk in Contact.objects.values_list("pk", flat=True)[HubSpotService.PAGE_SIZE:]:
+                Contact.objects.filter(pk=pk).exists()
+            return self.client.get("/contacts/sync/")
+
+        with self.assertRaisesRegex(AssertionError, r"not O\(1\) per HubSpot page"):
+            self.assertConstantCost(self.seed, per_row_over_pages, "per-row loop", sizes=(60, 150, 250))
+
+
+class ORJSONTests(SimpleTestCase):
+    def test_renderer_matches_drf(self):
+        data = {
+            "dates": [date(2025, 1, 31), datetime(2025, 1, 31, 8, 30, tzinfo=timezone.utc)],
+            "amount": Decimal("12.50"),
+            "separator": "\u2028",
+            7: None,
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_parser_rejects_invalid_json(self):
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"email": '))
+
+
+class ConcurrentSyncTests(TransactionTestCase):
+    def test_concurrent_sync_matches_serial_sync(self):
+        FakeHubSpotPages(95).patch(self)
+        stats = sync_contacts_concurrently(concurrency=4)
+        self.assertEqual(stats["pages"], 10)
+        self.assertEqual(stats["created"], 95)
+        self.assertEqual(Contact.objects.count(), 95)
+
+    def test_default_sync_can_be_killed_and_resumed(self):
+        pages = FakeHubSpotPages(45)
+        pages.patch(self)
+        heartbeat = sync_jobs.heartbeat
+        checkpoints = []
+
+        def killed_at_second_checkpoint(job, stats=None, cursor=None):
+            if cursor is not None and checkpoints:
+                raise RuntimeError("worker killed")
+            heartbeat(job, stats, cursor)
+            if cursor is not None:
+                checkpoints.append(cursor)
+
+        with mock.patch("hubspot_contacts.sync_jobs.heartbeat", killed_at_second_checkpoint):
+            with self.assertRaises(RuntimeError):
+                call_command("sync_contacts", stdout=io.StringIO())
+        job = sync_jobs.latest()
+        self.assertEqual(job.status, SyncJob.FAILED)
+        # The checkpoint covers only pages with no unwritten page before them.
+        self.assertEqual(job.cursor, checkpoints[0])
+        self.assertEqual(job.fetched, job.cursor)
+        checkpoint = job.cursor
+
+        out = io.StringIO()
+        call_command("sync_contacts", "--resume", stdout=out)
+        self.assertIn(f"Resuming sync job {job.pk}", out.getvalue())
+        self.assertEqual(pages.requested_offsets[-1], checkpoint)
+        job.refresh_from_db()
+        self.assertEqual(job.status, SyncJob.COMPLETED)
+        self.assertEqual((job.pages, job.fetched), (5, 45))
+        self.assertEqual(Contact.objects.count(), 45)
+
+    def test_fetch_errors_stop_the_pipeline(self):
+        pages = FakeHubSpotPages(50)
+        pages.patch(self)
+        with mock.patch(
+            "hubspot_contacts.sync.HubSpotService.get_contacts_by_vids",
+            side_effect=RuntimeError("HubSpot unavailable"),
+        ):
+            with self.assertRaises(RuntimeError):
+                sync_contacts_concurrently(concurrency=2)
@@ -0,0 +1,122 @@
+"""
+Per-user throttling in units of HubSpot API calls.
+
+Every throttled view names an *action* (``contacts.list``,
+``advanced.search``, ...) and a cost: the number of HubSpot requests the
+call is expected to make. A user's requests draw from a sliding-window
+budget of those units, so a full-list sync that pages through 50 HubSpot
+pages weighs 50 times a single lookup. Local-only calls cost 0 and are never
+throttled.
+
+Rates come from ``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']``: the
+``hubspot`` scope is the default budget and a ``hubspot.<action>`` scope
+gives an action its own bucket. ``HUBSPOT_THROTTLE_USER_RATES`` overrides
+the default budget for individual users. Responses carry ``RateLimit-Limit``,
+``RateLimit-Remaining`` and ``RateLimit-Reset`` (seconds), and 429s carry
+``Retry-After``.
+"""
+
+import math
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from .hubspot_service import HubSpotService
+from .rollups import total_contacts
+
+DEFAULT_SCOPE = 'hubspot'
+
+
+def sync_cost():
+    """HubSpot pages a full sync reads, from the locally mirrored total."""
+    total = total_contacts() or 0
+    return max(1, math.ceil(total / HubSpotService.PAGE_SIZE))
+
+
+class HubSpotQuotaThrottle(SimpleRateThrottle):
+    """
+    Views opt in with ``throttle_classes = [HubSpotQuotaThrottle]`` and a
+    ``hubspot_usage(request)`` method returning ``(action, cost)``.
+    """
+
+    scope = DEFAULT_SCOPE
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+
+    def __init__(self):
+        # Rates are resolved per request, once the user and action are known.
+        pass
+
+    def rate_for(self, request, action):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        scoped = f'{DEFAULT_SCOPE}.{action}'
+        if scoped in rates:
+            return scoped, rates[scoped]
+        user_rates = getattr(settings, 'HUBSPOT_THROTTLE_USER_RATES', {})
+        return DEFAULT_SCOPE, user_rates.get(getattr(request.user, 'email', None), rates.get(DEFAULT_SCOPE))
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': request.user.pk or self.get_ident(request)}
+
+    def allow_request(self, request, view):
+        action, cost = view.hubspot_usage(request)
+        self.scope, self.rate = self.rate_for(request, action)
+        if self.rate is None or cost <= 0:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        self.key = self.get_cache_key(request, view)
+        self.now = self.timer()
+        # Entries are (timestamp, cost), newest first.
+        self.history = [entry for entry in self.cache.get(self.key, []) if entry[0] > self.now - self.duration]
+        used = sum(entry[1] for entry in self.history)
+        # A call costing more than the whole budget may still run on an idle budget.
+        allowed = used + cost <= self.num_requests or not self.history
+        self.pending = 0 if allowed else cost
+        if allowed:
+            self.history.insert(0, (self.now, cost))
+            self.cache.set(self.key, self.history, self.duration)
+            used += cost
+        request.rate_limit = self.headers(used, self.pending)
+        return allowed
+
+    def headers(self, used, pending):
+        """RateLimit-* headers; ``pending`` is the cost of a rejected call."""
+        return {
+            'RateLimit-Limit': str(self.num_requests),
+            'RateLimit-Remaining': str(max(self.num_requests - used, 0)),
+            'RateLimit-Reset': str(math.ceil(self.free_after(pending or 1))),
+        }
+
+    def free_after(self, needed):
+        """Seconds until ``needed`` units (at most the whole budget) are free."""
+        needed = min(needed, self.num_requests)
+        available = self.num_requests - sum(cost for _, cost in self.history)
+        for timestamp, cost in reversed(self.history):
+            if available >= needed:
+                break
+            available += cost
+            if available >= needed:
+                return max(timestamp + self.duration - self.now, 0)
+        return 0
+
+    def wait(self):
+        return self.free_after(self.pending)
+
+
+class HubSpotQuotaMixin:
+    """
+    For views that call HubSpot: applies ``HubSpotQuotaThrottle`` and copies
+    its RateLimit-* headers onto the response. Override ``hubspot_usage``.
+    """
+
+    throttle_classes = [HubSpotQuotaThrottle]
+
+    def hubspot_usage(self, request):
+        return type(self).__name__, 0
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        for name, value in getattr(request, 'rate_limit', {}).items():
+            response[name] = value
+        return response
@@ -1,8 +1,32 @@
 from django.urls import path
-from .views import ContactListView, ContactDetailView, HubSpotAdvancedView
+from .views import (
+    ContactListView,
+    ContactChangesView,
+    SyncJobListView,
+    SyncJobDetailView,
+    ContactFacetsView,
+    ContactResolveView,
+    DuplicateSuggestionListView,
+    DuplicateSuggestionDetailView,
+    ContactDetailView,
+    ContactExportView,
+    ContactImportView,
+    ContactImportJobView,
+    HubSpotAdvancedView,
+)
 
 urlpatterns = [
     path('contacts/', ContactListView.as_view(), name='contact-list'),
+    path('contacts/sync/', SyncJobListView.as_view(), name='sync-job-list'),
+    path('contacts/sync/<int:pk>/', SyncJobDetailView.as_view(), name='sync-job-detail'),
+    path('contacts/changes/', ContactChangesView.as_view(), name='contact-changes'),
+    path('contacts/facets/', ContactFacetsView.as_view(), name='contact-facets'),
+    path('contacts/resolve/', ContactResolveView.as_view(), name='contact-resolve'),
+    path('contacts/duplicates/', DuplicateSuggestionListView.as_view(), name='duplicate-list'),
+    path('contacts/duplicates/<int:pk>/', DuplicateSuggestionDetailView.as_view(), name='duplicate-detail'),
+    path('contacts/export/', ContactExportView.as_view(), name='contact-export'),
+    path('contacts/import/', ContactImportView.as_view(), name='contact-import'),
+    path('contacts/import/<int:pk>/', ContactImportJobView.as_view(), name='contact-import-job'),
     path('contacts/<int:pk>/', ContactDetailView.as_view(), name='contact-detail'),
     path('hubspot/<str:action>/', HubSpotAdvancedView.as_view(), name='hubspot-advanced'),
 ]
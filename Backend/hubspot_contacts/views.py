@@ -1,52 +1,118 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Contact
-from .serializers import ContactSerializer
+from .models import Contact, ContactImportJob, ChangeCounter, DuplicateSuggestion, SyncJob
+from .signals import contact_snapshot, send_contacts_changed
+from .serializers import (
+    ContactSerializer,
+    ContactRowSerializer,
+    ContactImportJobSerializer,
+    DuplicateSuggestionSerializer,
+    SyncJobSerializer,
+)
 from .hubspot_service import HubSpotService
 from rest_framework.permissions import IsAuthenticated
-from datetime import datetime
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+import math
+import zlib
+from .changes import DEFAULT_LIMIT, MAX_LIMIT, contact_changes
+from .dedup import scan_duplicates
+from .resolver import HUBSPOT_BATCH_SIZE, resolve_emails, resolve_phones
+from .throttling import HubSpotQuotaMixin, sync_cost
+from .exporters import EXPORT_FORMATS, export_contacts
+from .importer import HUBSPOT_BATCH_SIZE as IMPORT_BATCH_SIZE, count_lines, run_import
+from . import facets, rollups, sync_jobs
+from .jobs import start_background_job
+from rest_framework.parsers import MultiPartParser
+from ContactHub.db_routers import primary_only
+from ContactHub.middleware import accepted_encodings
 
 
-class ContactListView(APIView):
+def contacts_validators(*parts):
+    """
+    ETag and Last-Modified for contact responses, taken from the ``contacts``
+    change counter (one indexed lookup) instead of the payload. ``parts``
+    distinguishes representations of the same data, e.g. the field selection.
+    """
+    counter = ChangeCounter.current('contacts')
+    etag = quote_etag('-'.join(str(part) for part in (counter.value, *parts)))
+    last_modified = int(counter.updated_at.timestamp()) if counter.updated_at else None
+    return etag, last_modified
+
+
+def conditional(request, response_factory, etag, last_modified):
+    """Return 304 when the client's validators match, else the built response."""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = response_factory()
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        # Let clients keep a copy but revalidate it on every request.
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def fields_key(names):
+    return format(zlib.crc32(','.join(names).encode()), 'x')
+
+
+def requested_fields(request):
+    """Parse ``?fields=a,b`` into a list of field names, or ``None`` for all."""
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    return [name.strip() for name in fields.split(',') if name.strip()]
+
+
+class ContactListView(HubSpotQuotaMixin, APIView):
     permission_classes = [IsAuthenticated]
 
+    def hubspot_usage(self, request):
+        if request.method == 'GET':
+            # Joining a sync that is already running costs nothing.
+            return 'contacts.list', 0 if sync_jobs.running() else sync_cost()
+        return 'contacts.create', 1
+
     def get(self, request):
-        """Get all contacts and sync with the local database."""
-        hubspot_contacts = HubSpotService.get_all_contacts()
-        for contact in hubspot_contacts:
-            identity_profile = contact['identity-profiles'][0] if contact['identity-profiles'] else None
-            if identity_profile:
-                email = next(
-                    (identity['value'] for identity in identity_profile['identities'] if identity['type'] == 'EMAIL'),
-                    None,
-                )
-                added_at_timestamp = contact.get('addedAt')
-                modified_at_timestamp = contact['properties']['lastmodifieddate']['value']
-
-                added_at = datetime.fromtimestamp(added_at_timestamp / 1000) if added_at_timestamp else None
-                lastmodifieddate = datetime.fromtimestamp(int(modified_at_timestamp) / 1000) if modified_at_timestamp else None
-
-                Contact.objects.update_or_create(
-                    hubspot_id=contact['vid'],
-                    defaults={
-                        'first_name': contact['properties'].get('firstname', {}).get('value', ''),
-                        'last_name': contact['properties'].get('lastname', {}).get('value', ''),
-                        'company': contact['properties'].get('company', {}).get('value', ''),
-                        'website': contact['properties'].get('website', {}).get('value', ''),
-                        'phone': contact['properties'].get('phone', {}).get('value', ''),
-                        'address': contact['properties'].get('address', {}).get('value', ''),
-                        'state': contact['properties'].get('state', {}).get('value', ''),
-                        'zip': contact['properties'].get('zip', {}).get('value', ''),
-                        'email': email,
-                        'added_at': added_at,
-                        'lastmodifieddate': lastmodifieddate,
-                        },
-                )
-        contacts = Contact.objects.all()
-        serializer = ContactSerializer(contacts, many=True)
-        return Response(serializer.data)
+        """
+        Get all contacts and sync with the local database. ``?fields=`` narrows
+        the response, the DB query and the HubSpot properties fetched. While
+        another request's sync is running this one waits for it instead of
+        starting its own; ``X-Sync-Job`` names the job either way.
 
+        A client whose copy still matches the mirror gets its 304 straight
+        away, and the sync runs in the background; its changes show up on the
+        client's next revalidation.
+        """
+        fields = requested_fields(request)
+        serializer = ContactRowSerializer(fields=fields)
+        triggered_by = getattr(request.user, 'email', '') or ''
+        etag, last_modified = contacts_validators(fields_key(serializer.names))
+        if get_conditional_response(request, etag=etag, last_modified=last_modified) is not None:
+            response = conditional(request, None, etag, last_modified)
+            job, acquired = sync_jobs.claim(fields=serializer.names, triggered_by=triggered_by)
+            if acquired:
+                start_background_job(sync_jobs.execute, job, name=f"contact-sync-{job.pk}")
+        else:
+            job = sync_jobs.sync_once(fields=serializer.names, triggered_by=triggered_by)
+            etag, last_modified = contacts_validators(fields_key(serializer.names))
+            response = conditional(
+                request,
+                lambda: Response(serializer.serialize(Contact.objects.all())),
+                etag,
+                last_modified,
+            )
+        if job is not None:
+            response['X-Sync-Job'] = str(job.pk)
+            response['X-Sync-Status'] = job.status
+        return response
+
+    @primary_only
     def post(self, request):
         """Create a new contact."""
         serializer = ContactSerializer(data=request.data)
@@ -64,18 +130,281 @@ class ContactListView(APIView):
                     {"property": "zip", "value": serializer.validated_data.get('zip', '')},
             ]
             }
+            if 'lifecyclestage' in serializer.validated_data:
+                # Clients that don't send it must not clear the stage in HubSpot.
+                hubspot_data["properties"].append(
+                    {"property": "lifecyclestage", "value": serializer.validated_data['lifecyclestage']}
+                )
             hubspot_response = HubSpotService.create_contact(hubspot_data)
-            serializer.save(hubspot_id=hubspot_response['vid'])
+            with transaction.atomic():
+                contact = serializer.save(hubspot_id=hubspot_response['vid'])
+                send_contacts_changed([(None, contact_snapshot(contact))])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ContactDetailView(APIView):
+class SyncJobListView(HubSpotQuotaMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def hubspot_usage(self, request):
+        if request.method == 'POST' and not sync_jobs.running():
+            return 'contacts.sync', sync_cost()
+        return 'contacts.sync', 0
+
+    def get(self, request):
+        """Recent sync jobs, newest first (``?limit=``, default 20)."""
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            limit = 20
+        jobs = SyncJob.objects.filter(kind=SyncJob.CONTACTS).order_by('-started_at', '-pk')[:limit]
+        return Response(SyncJobSerializer(jobs, many=True).data)
+
+    @primary_only
+    def post(self, request):
+        """
+        Start a full sync in the background. If one is already running, return
+        that job instead of starting another.
+        """
+        job = sync_jobs.acquire(triggered_by=getattr(request.user, 'email', '') or '')
+        if job is None:
+            current = sync_jobs.running() or sync_jobs.latest()
+            return Response(SyncJobSerializer(current).data, status=status.HTTP_200_OK)
+        start_background_job(sync_jobs.execute, job, name=f"contact-sync-{job.pk}")
+        return Response(SyncJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class SyncJobDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @primary_only
     def get(self, request, pk):
-        contact = Contact.objects.get(pk=pk)
-        serializer = ContactSerializer(contact)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        """Status, progress and duration of one sync job."""
+        try:
+            job = SyncJob.objects.get(pk=pk)
+        except SyncJob.DoesNotExist:
+            return Response({"error": "Sync job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(SyncJobSerializer(job).data)
+
+
+class ContactChangesView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Contacts created, updated or deleted after ``?since=<cursor>``, oldest
+        first. Pass the returned ``cursor`` back to get the next page; deleted
+        contacts are listed by id under ``deleted``. Does not sync from HubSpot.
+        """
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            return Response({"error": "since and limit must be integers"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if since < 0 or not 0 < limit <= MAX_LIMIT:
+            return Response({"error": f"since must be >= 0 and limit between 1 and {MAX_LIMIT}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(contact_changes(since, limit, requested_fields(request)))
+
+
+class ContactFacetsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Top ``?top=`` values (default 10) per facet with contact counts, for
+        contacts matching the ``?state=``, ``?company=`` and
+        ``?email_domain=`` filters. ``?facets=`` limits which facets are counted.
+        """
+        filters = {facet: request.query_params.get(facet) for facet in facets.FACETS}
+        selected = None
+        names = request.query_params.get('facets')
+        if names:
+            selected = [name.strip() for name in names.split(',') if name.strip()]
+            unknown = set(selected) - set(facets.FACETS)
+            if unknown:
+                return Response({"facets": f"Unknown facet(s): {', '.join(sorted(unknown))}"},
+                                status=status.HTTP_400_BAD_REQUEST)
+        try:
+            top = int(request.query_params.get('top', facets.DEFAULT_TOP))
+        except ValueError:
+            top = 0
+        if not 0 < top <= facets.MAX_TOP:
+            return Response({"error": f"top must be between 1 and {facets.MAX_TOP}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(facets.facet_counts(filters, selected, top))
+
+
+class DuplicateSuggestionListView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Pending duplicate suggestions, best match first (``?limit=``, default 50)."""
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 500)
+        except ValueError:
+            limit = 50
+        suggestions = (
+            DuplicateSuggestion.objects.filter(status=DuplicateSuggestion.PENDING)
+            .select_related('contact_a', 'contact_b')
+            .order_by('-score', 'pk')[:limit]
+        )
+        return Response(DuplicateSuggestionSerializer(suggestions, many=True).data)
+
+    @primary_only
+    def post(self, request):
+        """
+        Rescan the whole table for duplicates in the background, unless a scan
+        is already running; ``job`` is the scan's ``SyncJob`` either way.
+        """
+        job = sync_jobs.acquire(SyncJob.DUPLICATE_SCAN, triggered_by=getattr(request.user, 'email', '') or '')
+        if job is None:
+            current = sync_jobs.running(SyncJob.DUPLICATE_SCAN)
+            return Response({"status": "running", "job": current.pk if current else None}, status=status.HTTP_200_OK)
+        start_background_job(scan_duplicates, job=job, name=f"duplicate-scan-{job.pk}")
+        return Response({"status": "started", "job": job.pk}, status=status.HTTP_202_ACCEPTED)
+
+
+class DuplicateSuggestionDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @primary_only
+    def patch(self, request, pk):
+        """Mark a suggestion ``dismissed`` or ``merged``."""
+        try:
+            suggestion = DuplicateSuggestion.objects.select_related('contact_a', 'contact_b').get(pk=pk)
+        except DuplicateSuggestion.DoesNotExist:
+            return Response({"error": "Duplicate suggestion not found"}, status=status.HTTP_404_NOT_FOUND)
+        serializer = DuplicateSuggestionSerializer(suggestion, data=request.data, partial=True)
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ContactResolveView(HubSpotQuotaMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    MAX_LOOKUPS = 1000
+
+    def hubspot_usage(self, request):
+        # Runs before post() validates the body, which may not be an object.
+        data = request.data if isinstance(request.data, dict) else {}
+        emails = data.get('emails') if data.get('remote', True) is not False else None
+        lookups = len(emails) if isinstance(emails, list) else 0
+        return 'contacts.resolve', math.ceil(lookups / HUBSPOT_BATCH_SIZE)
+
+    def post(self, request):
+        """
+        Resolve ``{"emails": [...], "phones": [...]}`` to contacts, answering
+        from the local mirror first. Emails not held locally are looked up in
+        HubSpot unless ``"remote": false``.
+        """
+        if not isinstance(request.data, dict):
+            return Response({"error": "Expected a JSON object"}, status=status.HTTP_400_BAD_REQUEST)
+        emails = request.data.get('emails') or []
+        phones = request.data.get('phones') or []
+        if not isinstance(emails, list) or not isinstance(phones, list):
+            return Response({"error": "emails and phones must be lists"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(emails) + len(phones) > self.MAX_LOOKUPS:
+            return Response({"error": f"At most {self.MAX_LOOKUPS} lookups per request"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "emails": resolve_emails([str(email) for email in emails], remote=request.data.get('remote', True) is not False),
+            "phones": resolve_phones([str(phone) for phone in phones]),
+        })
+
+
+class ContactExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Stream the local contact table without syncing from HubSpot.
+
+        Query params: ``output`` (``ndjson`` or ``csv``), ``fields`` (comma
+        separated serializer fields) and ``compress=gzip``; gzip is also used
+        when ``Accept-Encoding`` accepts it (``q=0`` refuses it).
+        """
+        export_format = request.query_params.get('output', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response({"error": "output must be one of: " + ", ".join(EXPORT_FORMATS)},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        fields = requested_fields(request)
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING'))
+        gzip = request.query_params.get('compress') == 'gzip' or 'gzip' in accepted or '*' in accepted
+
+        content_type, filename = EXPORT_FORMATS[export_format]
+        chunks = export_contacts(Contact.objects.all(), export_format, fields, gzip)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        if gzip:
+            response['Content-Encoding'] = 'gzip'
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+
+class ContactImportView(HubSpotQuotaMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def hubspot_usage(self, request):
+        # One batch upsert and one batch lookup per 100 rows.
+        upload = request.FILES.get('file')
+        rows = count_lines(upload) if upload is not None else 0
+        return 'contacts.import', 2 * math.ceil(rows / IMPORT_BATCH_SIZE)
+
+    @primary_only
+    def post(self, request):
+        """Upload a CSV file and import it in the background."""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"file": ["No file was submitted."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = ContactImportJob.objects.create(file=upload, created_by=request.user)
+        start_background_job(run_import, job.pk, name=f"contact-import-{job.pk}")
+        return Response(ContactImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class ContactImportJobView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @primary_only
+    def get(self, request, pk):
+        """Report the progress and per-row errors of an import."""
+        try:
+            job = ContactImportJob.objects.get(pk=pk, created_by=request.user)
+        except ContactImportJob.DoesNotExist:
+            return Response({"error": "Import not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ContactImportJobSerializer(job).data)
+
+
+class ContactDetailView(HubSpotQuotaMixin, APIView):
+    def hubspot_usage(self, request):
+        if request.method in ('PUT', 'DELETE'):
+            return f'contacts.{request.method.lower()}', 1
+        return 'contacts.detail', 0
+
+    def get(self, request, pk):
+        fields = requested_fields(request)
+        # Validates the selection before touching the DB.
+        names = ContactRowSerializer(fields=fields).names
+        etag, last_modified = contacts_validators(pk, fields_key(names))
+
+        def build():
+            contacts = Contact.objects.all()
+            if fields is not None:
+                contacts = contacts.only(*names)
+            serializer = ContactSerializer(contacts.get(pk=pk), fields=fields)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        return conditional(request, build, etag, last_modified)
     
+    @primary_only
     def put(self, request, pk):
         """Update an existing contact."""
         contact = Contact.objects.get(pk=pk)
@@ -94,32 +423,65 @@ class ContactDetailView(APIView):
                     {"property": "zip", "value": serializer.validated_data.get('zip', '')},
                 ]
             }
+            if 'lifecyclestage' in serializer.validated_data:
+                # Clients that don't send it must not clear the stage in HubSpot.
+                hubspot_data["properties"].append(
+                    {"property": "lifecyclestage", "value": serializer.validated_data['lifecyclestage']}
+                )
             HubSpotService.update_contact(contact.hubspot_id, hubspot_data)
-            serializer.save()
+            before = contact_snapshot(contact)
+            with transaction.atomic():
+                # The HubSpot copy changed too; force the next sync to rewrite the row.
+                contact = serializer.save(sync_hash="")
+                send_contacts_changed([(before, contact_snapshot(contact))])
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @primary_only
     def delete(self, request, pk):
         """Delete a contact."""
         contact = Contact.objects.get(pk=pk)
         HubSpotService.delete_contact(contact.hubspot_id)
-        contact.delete()
+        before = contact_snapshot(contact)
+        with transaction.atomic():
+            contact.delete()
+            send_contacts_changed([(before, None)])
         return Response("Contact Deleted Successfully",status=status.HTTP_204_NO_CONTENT)
 
 
-class HubSpotAdvancedView(APIView):
+class HubSpotAdvancedView(HubSpotQuotaMixin, APIView):
     permission_classes = [IsAuthenticated]
 
+    def hubspot_usage(self, request):
+        action = self.kwargs.get('action')
+        local = action in ('lifecycle_metrics', 'contact_statistics') and request.query_params.get('source') != 'hubspot'
+        return f'advanced.{action}', 0 if local else 1
+
     def get(self, request, action):
-        """Handle advanced HubSpot services."""
+        """
+        Handle advanced HubSpot services. ``lifecycle_metrics`` and
+        ``contact_statistics`` are served from the local rollups unless
+        ``?source=hubspot`` is given.
+        """
+        from_hubspot = request.query_params.get('source') == 'hubspot'
         if action == 'recently_updated':
             contacts = HubSpotService.get_recently_updated_contacts()
         elif action == 'recently_created':
             contacts = HubSpotService.get_recently_created_contacts()
         elif action == 'lifecycle_metrics':
-            contacts = HubSpotService.get_lifecycle_stage_metrics()
+            contacts = HubSpotService.get_lifecycle_stage_metrics() if from_hubspot else rollups.lifecycle_metrics()
         elif action == 'contact_statistics':
-            contacts = HubSpotService.get_contact_statistics()
+            if from_hubspot:
+                contacts = HubSpotService.get_contact_statistics()
+            else:
+                try:
+                    days = int(request.query_params.get('days', 30))
+                except ValueError:
+                    days = 0
+                if not 0 < days <= 366:
+                    return Response({"error": "days must be between 1 and 366"},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                contacts = rollups.contact_statistics(days)
         elif action == 'search':
             query = request.query_params.get('q', '')
             contacts = HubSpotService.search_contacts(query)